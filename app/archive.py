@@ -0,0 +1,262 @@
+"""Retention of finished executions: Redis TTLs and a SQLite archive.
+
+Executions enter the ``wf:finished`` sorted set, scored by finish time, when
+they turn COMPLETED or FAILED. ``python -m app.archive`` drains entries older
+than ``ARCHIVE_DELAY`` seconds. The delay lets stragglers of a failed workflow
+settle first. With ``ARCHIVE_PATH`` set, each execution is copied into a SQLite
+file and its Redis keys are deleted. Otherwise its keys get an
+``EXECUTION_TTL``; a TTL of 0 keeps them forever. The status and results
+endpoints fall back to the archive, so Redis holds only in-flight and recently
+finished work.
+
+An archived row holds the params, node statuses, outputs and node timings,
+serialized and compressed as one blob. Offloaded outputs are inlined, so the row does not
+depend on the blob store. Definitions are stored once per digest, like the
+Redis registry.
+
+Retiring an execution also releases its blob references: at once when it is
+archived, when its keys expire otherwise. Each pass then deletes blobs that
+have had no references for ``BLOB_GRACE_PERIOD`` seconds. Completions that
+arrive after retirement write nothing.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from app import state
+from app.blobstore import compress, decompress, get_blob_store
+from app.config import settings
+from app.graph import definition_digest
+from app.models import NodeStatus, WorkflowDefinition, WorkflowStatus
+from app.serialization import decode, encode
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS definitions (
+    definition_id TEXT PRIMARY KEY,
+    definition TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS executions (
+    execution_id TEXT PRIMARY KEY,
+    definition_id TEXT NOT NULL REFERENCES definitions (definition_id),
+    status TEXT NOT NULL,
+    error TEXT,
+    finished_at REAL NOT NULL,
+    state BLOB NOT NULL
+);
+"""
+
+
+@dataclass
+class ArchivedExecution:
+    execution_id: str
+    definition: str
+    status: WorkflowStatus
+    error: str | None
+    finished_at: float
+    params: dict[str, Any]
+    node_statuses: dict[str, NodeStatus]
+    outputs: dict[str, Any]
+    timings: dict[str, list[float]] = field(default_factory=dict)
+
+
+class ExecutionArchive:
+    """Finished executions in one SQLite file (WAL mode, one connection per call)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def store(self, execution: ArchivedExecution) -> None:
+        blob = compress(
+            encode(
+                {
+                    "params": execution.params,
+                    "node_statuses": {
+                        node_id: status.value
+                        for node_id, status in execution.node_statuses.items()
+                    },
+                    "outputs": execution.outputs,
+                    "timings": execution.timings,
+                }
+            ),
+            settings.blob_compression,
+        )
+        definition_id = definition_digest(execution.definition)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO definitions VALUES (?, ?)",
+                (definition_id, execution.definition),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO executions VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    execution.execution_id,
+                    definition_id,
+                    execution.status.value,
+                    execution.error,
+                    execution.finished_at,
+                    blob,
+                ),
+            )
+
+    def load(self, execution_id: str) -> ArchivedExecution | None:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT d.definition, e.status, e.error, e.finished_at, e.state"
+                " FROM executions e JOIN definitions d USING (definition_id)"
+                " WHERE e.execution_id = ?",
+                (execution_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        definition, status, error, finished_at, blob = row
+        archived = decode(decompress(blob))
+        return ArchivedExecution(
+            execution_id=execution_id,
+            definition=definition,
+            status=WorkflowStatus(status),
+            error=error,
+            finished_at=finished_at,
+            params=archived["params"],
+            node_statuses={
+                node_id: NodeStatus(value)
+                for node_id, value in archived["node_statuses"].items()
+            },
+            outputs=archived["outputs"],
+            timings=archived.get("timings", {}),
+        )
+
+
+_archive: ExecutionArchive | None = None
+
+
+def get_archive() -> ExecutionArchive | None:
+    """The configured archive, or None when ``ARCHIVE_PATH`` is unset."""
+    global _archive
+    if not settings.archive_path:
+        return None
+    if _archive is None or _archive.path != settings.archive_path:
+        _archive = ExecutionArchive(settings.archive_path)
+    return _archive
+
+
+def load_archived_execution(execution_id: str) -> ArchivedExecution | None:
+    archive = get_archive()
+    return archive.load(execution_id) if archive is not None else None
+
+
+def snapshot_execution(
+    execution_id: str, definition: WorkflowDefinition, finished_at: float
+) -> ArchivedExecution | None:
+    status = state.get_workflow_status(execution_id)
+    if status is None:
+        return None
+    return ArchivedExecution(
+        execution_id=execution_id,
+        definition=definition.model_dump_json(),
+        status=status,
+        error=state.get_error(execution_id),
+        finished_at=finished_at,
+        params=state.get_params(execution_id),
+        node_statuses=state.list_node_statuses(execution_id, definition),
+        outputs=state.get_all_outputs(execution_id, definition),
+        timings=state.get_node_timings(execution_id),
+    )
+
+
+def retire_finished_executions(now: float | None = None) -> int:
+    """Archive or expire up to ``ARCHIVE_BATCH_SIZE`` finished executions.
+
+    An execution leaves the finished index only after its keys were handled,
+    so a crash mid-batch repeats work instead of leaking keys.
+    """
+    now = time.time() if now is None else now
+    finished = state.finished_executions(
+        now - settings.archive_delay, settings.archive_batch_size
+    )
+    archive = get_archive()
+    for execution_id, finished_at in finished:
+        definition = state.get_workflow_definition(execution_id)
+        if definition is None:
+            state.forget_finished_execution(execution_id)
+            continue
+        if archive is not None:
+            snapshot = snapshot_execution(execution_id, definition, finished_at)
+            if snapshot is not None:
+                archive.store(snapshot)
+            state.delete_execution_state(execution_id, definition)
+            state.release_execution_blobs(execution_id, now)
+        elif settings.execution_ttl > 0:
+            state.expire_execution_state(
+                execution_id, definition, settings.execution_ttl
+            )
+            state.release_execution_blobs(execution_id, now + settings.execution_ttl)
+        state.forget_finished_execution(execution_id)
+    return len(finished)
+
+
+def sweep_orphaned_blobs(now: float | None = None) -> int:
+    """Delete blobs unreferenced for ``BLOB_GRACE_PERIOD``; returns how many.
+
+    A blob stored again within the grace period (``put`` refreshes its mtime)
+    is kept and checked again on a later pass.
+    """
+    now = time.time() if now is None else now
+    cutoff = now - settings.blob_grace_period
+    store = get_blob_store()
+    reused = []
+    deleted = 0
+    for digest in state.claim_orphaned_blobs(cutoff, settings.archive_batch_size):
+        if store.delete(digest, older_than=cutoff):
+            deleted += 1
+        else:
+            reused.append(digest)
+    state.orphan_blobs(reused, now)
+    return deleted
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        try:
+            retired = retire_finished_executions()
+        except Exception:
+            logger.exception("Retention pass failed")
+            retired = 0
+        if retired:
+            logger.info("Retired %d finished executions", retired)
+        try:
+            swept = sweep_orphaned_blobs()
+        except Exception:
+            logger.exception("Blob sweep failed")
+            swept = 0
+        if swept:
+            logger.info("Deleted %d unreferenced blobs", swept)
+        if retired < settings.archive_batch_size:
+            time.sleep(settings.archive_interval)
+
+
+if __name__ == "__main__":
+    main()
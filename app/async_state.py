@@ -0,0 +1,179 @@
+"""Asyncio counterparts of the `app.state` reads/writes used by the HTTP API.
+
+Key names, layouts and payload encoding all come from `app.state`; only the I/O
+differs, so both modules always agree on the schema.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import redis.asyncio as aioredis
+
+from app import state
+from app.config import settings
+from app.graph import WorkflowGraph, compile_definition, definition_digest, graph_cache
+from app.models import NodeStatus, WorkflowDefinition, WorkflowStatus
+
+_redis_client: aioredis.Redis | None = None
+_payload_client: aioredis.Redis | None = None
+
+
+def get_redis() -> aioredis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = aioredis.Redis.from_pool(
+            aioredis.BlockingConnectionPool.from_url(
+                settings.redis_url, decode_responses=True, **state.pool_options()
+            )
+        )
+    return _redis_client
+
+
+def get_payload_redis() -> aioredis.Redis:
+    global _payload_client
+    if _payload_client is None:
+        _payload_client = aioredis.Redis.from_pool(
+            aioredis.BlockingConnectionPool.from_url(
+                settings.redis_url, **state.pool_options()
+            )
+        )
+    return _payload_client
+
+
+async def close() -> None:
+    global _redis_client, _payload_client
+    for client in (_redis_client, _payload_client):
+        if client is not None:
+            await client.aclose()
+    _redis_client = _payload_client = None
+
+
+async def _read_node_values(
+    kind: str, execution_id: str, node_ids: list[str], client: aioredis.Redis
+) -> list[Any]:
+    pipe = client.pipeline()
+    state._queue_node_reads(pipe, kind, execution_id, node_ids)
+    values, missing = state._unpack_node_values(node_ids, await pipe.execute())
+    if not missing:
+        return values
+    pipe = client.pipeline()
+    state._queue_legacy_node_reads(pipe, kind, execution_id, missing)
+    return state._merge_legacy_values(node_ids, values, missing, await pipe.execute())
+
+
+async def set_workflow_definition(
+    execution_id: str, definition: WorkflowDefinition
+) -> str:
+    raw = definition.model_dump_json()
+    definition_id = definition_digest(raw)
+    pipe = get_redis().pipeline()
+    pipe.set(state.registered_definition_key(definition_id), raw, nx=True)
+    pipe.set(
+        state.workflow_definition_key(execution_id),
+        state.definition_ref(definition_id),
+    )
+    await pipe.execute()
+    return definition_id
+
+
+async def register_definition(definition: WorkflowDefinition) -> str:
+    raw = definition.model_dump_json()
+    definition_id = definition_digest(raw)
+    await get_redis().set(state.registered_definition_key(definition_id), raw, nx=True)
+    return definition_id
+
+
+async def get_registered_definition_raw(definition_id: str) -> str | None:
+    return await get_redis().get(state.registered_definition_key(definition_id))
+
+
+async def set_execution_definition(execution_id: str, definition_id: str) -> None:
+    await get_redis().set(
+        state.workflow_definition_key(execution_id),
+        state.definition_ref(definition_id),
+    )
+
+
+async def load_registered_graph(definition_id: str) -> WorkflowGraph | None:
+    graph = graph_cache.get(definition_id)
+    if graph is not None:
+        return graph
+    raw = await get_registered_definition_raw(definition_id)
+    if not raw:
+        return None
+    return compile_definition(definition_id, raw)
+
+
+async def load_workflow_graph(execution_id: str) -> WorkflowGraph | None:
+    pointer = await get_redis().get(state.workflow_definition_key(execution_id))
+    if not pointer:
+        return None
+    graph, definition_id = state.cached_graph(pointer)
+    if graph is not None:
+        return graph
+    raw = await get_registered_definition_raw(definition_id)
+    return compile_definition(definition_id, raw) if raw else None
+
+
+async def set_workflow_status(execution_id: str, status: WorkflowStatus) -> None:
+    pipe = get_redis().pipeline()
+    state.queue_workflow_status(pipe, execution_id, status)
+    await pipe.execute()
+
+
+async def get_workflow_status(execution_id: str) -> WorkflowStatus | None:
+    raw = await get_redis().get(state.workflow_status_key(execution_id))
+    return WorkflowStatus(raw) if raw else None
+
+
+async def get_error(execution_id: str) -> str | None:
+    return await get_redis().get(state.errors_key(execution_id))
+
+
+async def list_node_statuses(
+    execution_id: str, definition: WorkflowDefinition
+) -> dict[str, NodeStatus]:
+    node_ids = [node.id for node in definition.dag.nodes]
+    raw_statuses = await _read_node_values(
+        "status", execution_id, node_ids, get_redis()
+    )
+    return {
+        node_id: NodeStatus(raw) if raw else NodeStatus.PENDING
+        for node_id, raw in zip(node_ids, raw_statuses)
+    }
+
+
+async def get_node_timings(execution_id: str) -> dict[str, list[float]]:
+    raw = await get_redis().hgetall(state.node_timings_key(execution_id))
+    return {node_id: state.decode_timing(timing) for node_id, timing in raw.items()}
+
+
+async def get_all_outputs(
+    execution_id: str, definition: WorkflowDefinition
+) -> dict[str, Any]:
+    node_ids = [node.id for node in definition.dag.nodes]
+    raw_outputs = await _read_node_values(
+        "output", execution_id, node_ids, get_payload_redis()
+    )
+    split = [
+        node_id
+        for node_id, raw in zip(node_ids, raw_outputs)
+        if state.is_split_output(raw)
+    ]
+    stored: dict[str, Any] = {}
+    if split:
+        pipe = get_payload_redis().pipeline(transaction=False)
+        for node_id in split:
+            pipe.hgetall(state.node_output_fields_key(execution_id, node_id))
+        stored = dict(zip(split, await pipe.execute()))
+    # Offloaded blobs are read from local disk; small enough to do inline.
+    return {
+        node_id: (
+            state.join_split_output(raw, stored[node_id])
+            if node_id in stored
+            else state.decode_payload(raw)
+        )
+        for node_id, raw in zip(node_ids, raw_outputs)
+        if raw
+    }
@@ -0,0 +1,76 @@
+"""Per-process event loop for running async node handlers (``WORKER_MODE=asyncio``).
+
+Celery has no asyncio pool, so these workers run with ``--pool=solo``. The task
+body hands an async node to the loop thread and returns. Orchestration callbacks
+run on a small thread pool once the handler finishes, because the state layer
+uses the blocking Redis client. ``ASYNC_MAX_IN_FLIGHT`` bounds the nodes one
+process holds; once it is reached ``submit`` blocks, which in turn stops the
+solo worker from taking more messages off the broker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncNodeRunner:
+    def __init__(self, max_in_flight: int) -> None:
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            thread_name_prefix="node-callbacks"
+        )
+        self._in_flight: set[concurrent.futures.Future] = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="node-loop", daemon=True
+                ).start()
+            return self._loop
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def submit(self, coroutine: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Schedule a coroutine, blocking while the process is at capacity."""
+        loop = self._ensure_loop()
+        self._slots.acquire()
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        self._in_flight.add(future)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: concurrent.futures.Future) -> None:
+        self._in_flight.discard(future)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Async node failed", exc_info=future.exception())
+
+    async def offload(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking call (Redis, broker publish) off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Wait for in-flight nodes; returns False if some are still running."""
+        _, pending = concurrent.futures.wait(list(self._in_flight), timeout=timeout)
+        return not pending
+
+
+node_runner = AsyncNodeRunner(settings.async_max_in_flight)
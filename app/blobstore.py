@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from app.config import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Redis values starting with this marker hold a blob digest instead of a payload.
+BLOB_MARKER = b"B"
+
+_CODECS = {b"z": "zlib", b"s": "zstd"}
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for payloads too large to keep in Redis."""
+
+    @abstractmethod
+    def put(self, data: bytes) -> str: ...
+
+    @abstractmethod
+    def get(self, digest: str) -> bytes: ...
+
+    @abstractmethod
+    def delete(self, digest: str, older_than: float | None = None) -> bool:
+        """Delete a blob unless it was stored again after ``older_than``."""
+
+
+class LocalBlobStore(BlobStore):
+    """Stores compressed blobs as ``<root>/<digest[:2]>/<digest>`` files."""
+
+    def __init__(self, root: str, compression: str = "zlib") -> None:
+        self.root = Path(root)
+        self.compression = compression
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if path.exists():
+            # Marks the blob as reused, so a concurrent sweep keeps it.
+            os.utime(path)
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(compress(data, self.compression))
+        os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return decompress(self._path(digest).read_bytes())
+
+    def delete(self, digest: str, older_than: float | None = None) -> bool:
+        path = self._path(digest)
+        try:
+            if older_than is not None and path.stat().st_mtime > older_than:
+                return False
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        return True
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError("zstd compression requires the zstandard package")
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        _require_zstandard()
+        return b"s" + zstandard.ZstdCompressor().compress(data)
+    if codec == "zlib":
+        return b"z" + zlib.compress(data)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def decompress(blob: bytes) -> bytes:
+    codec = _CODECS.get(blob[:1])
+    if codec == "zstd":
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().decompress(blob[1:])
+    if codec == "zlib":
+        return zlib.decompress(blob[1:])
+    raise ValueError("Unknown blob codec marker")
+
+
+_blob_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = LocalBlobStore(
+            settings.blob_store_path, settings.blob_compression
+        )
+    return _blob_store
+
+
+def offload(payload: bytes) -> bytes:
+    """Swap a serialized payload above the size threshold for a blob reference."""
+    threshold = settings.blob_offload_threshold
+    if threshold <= 0 or len(payload) <= threshold:
+        return payload
+    return BLOB_MARKER + get_blob_store().put(payload).encode()
+
+
+def is_blob_reference(raw: bytes | str) -> bool:
+    if isinstance(raw, str):
+        raw = raw.encode()
+    return raw[:1] == BLOB_MARKER
+
+
+def blob_digest(raw: bytes | str) -> str | None:
+    """The digest a stored value refers to, or None for an inline payload."""
+    if not raw or not is_blob_reference(raw):
+        return None
+    return (raw.decode() if isinstance(raw, bytes) else raw)[1:]
+
+
+def resolve(raw: bytes | str) -> bytes | str:
+    """Return the stored payload, fetching it from the blob store if offloaded."""
+    if not is_blob_reference(raw):
+        return raw
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    return get_blob_store().get(raw[1:])
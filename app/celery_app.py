@@ -4,9 +4,12 @@ from celery import Celery
 from kombu import Exchange, Queue
 
 from app.config import settings
+from app.handlers import HANDLER_QUEUES
+from app.serialization import get_serializer
 
 broker_url = settings.celery_broker_url
 result_backend = settings.celery_result_backend
+serializer = get_serializer().celery_name
 
 celery_app = Celery(
     "workflow_engine",
@@ -20,17 +23,33 @@ celery_app.conf.task_default_queue = "workflow"
 celery_app.conf.task_default_exchange = default_exchange.name
 celery_app.conf.task_default_exchange_type = default_exchange.type
 celery_app.conf.task_default_routing_key = "workflow"
-celery_app.conf.task_queues = (
-    Queue("workflow", exchange=default_exchange, routing_key="workflow"),
+# Nodes go to their handler's queue (see app.handlers); "workflow" takes nodes
+# with unknown handlers and anything sent before queues were split.
+celery_app.conf.task_queues = tuple(
+    Queue(name, exchange=default_exchange, routing_key=name)
+    for name in ("workflow", *HANDLER_QUEUES)
 )
 
+# Nodes carry a message priority from their longest downstream path (see
+# WorkflowGraph.priorities). Redis serves all ten levels, lowest number first;
+# AMQP queues are declared with x-max-priority and serve the highest first.
+celery_app.conf.broker_transport_options = {"priority_steps": list(range(10))}
+celery_app.conf.task_queue_max_priority = 10
+_LOWEST_FIRST = broker_url.split(":", 1)[0] in {"redis", "rediss", "sentinel"}
+
+
+def message_priority(urgency: int) -> int:
+    """Celery priority for an urgency from 0 to 9, where 9 is most urgent."""
+    return 9 - urgency if _LOWEST_FIRST else urgency
+
+
 celery_app.conf.update(
     task_routes={
         "app.tasks.execute_node": {"queue": "workflow", "routing_key": "workflow"}
     },
-    task_serializer="json",
-    result_serializer="json",
-    accept_content=["json"],
+    task_serializer=serializer,
+    result_serializer=serializer,
+    accept_content=sorted({"json", serializer}),
     broker_connection_retry_on_startup=True,
 )
 
@@ -9,6 +9,55 @@ class Settings:
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     celery_broker_url: str = os.getenv("CELERY_BROKER_URL", redis_url)
     celery_result_backend: str = os.getenv("CELERY_RESULT_BACKEND", celery_broker_url)
+    redis_pool_size: int = int(os.getenv("REDIS_POOL_SIZE", "50"))
+    redis_pool_timeout: float = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+    redis_connect_timeout: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "5"))
+    redis_health_check_interval: int = int(
+        os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")
+    )
+    state_layout: str = os.getenv("STATE_LAYOUT", "keys")
+    serializer: str = os.getenv("SERIALIZER", "json")
+    blob_store_path: str = os.getenv("BLOB_STORE_PATH", "/tmp/workflow-blobs")
+    blob_offload_threshold: int = int(os.getenv("BLOB_OFFLOAD_THRESHOLD", "65536"))
+    blob_compression: str = os.getenv("BLOB_COMPRESSION", "zlib")
+    blob_grace_period: float = float(os.getenv("BLOB_GRACE_PERIOD", "600"))
+    output_field_threshold: int = int(os.getenv("OUTPUT_FIELD_THRESHOLD", "4096"))
+    publish_events: bool = os.getenv("PUBLISH_EVENTS", "1") == "1"
+    bulk_chunk_size: int = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+    graph_cache_size: int = int(os.getenv("GRAPH_CACHE_SIZE", "256"))
+    fuse_chains: bool = os.getenv("FUSE_CHAINS", "1") == "1"
+    inline_max_depth: int = int(os.getenv("INLINE_MAX_DEPTH", "16"))
+    worker_mode: str = os.getenv("WORKER_MODE", "prefork")
+    async_max_in_flight: int = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "1000"))
+    async_drain_timeout: float = float(os.getenv("ASYNC_DRAIN_TIMEOUT", "30"))
+    memo_max_bytes: int = int(os.getenv("MEMO_MAX_BYTES", str(256 * 1024 * 1024)))
+    memo_lock_ttl: float = float(os.getenv("MEMO_LOCK_TTL", "30"))
+    node_lease_ttl: float = float(os.getenv("NODE_LEASE_TTL", "60"))
+    node_dispatch_ttl: float = float(os.getenv("NODE_DISPATCH_TTL", "3600"))
+    node_heartbeat_interval: float = float(os.getenv("NODE_HEARTBEAT_INTERVAL", "10"))
+    node_max_attempts: int = int(os.getenv("NODE_MAX_ATTEMPTS", "3"))
+    node_retry_backoff: float = float(os.getenv("NODE_RETRY_BACKOFF", "1"))
+    node_retry_backoff_max: float = float(os.getenv("NODE_RETRY_BACKOFF_MAX", "60"))
+    reaper_interval: float = float(os.getenv("REAPER_INTERVAL", "1"))
+    reaper_batch_size: int = int(os.getenv("REAPER_BATCH_SIZE", "100"))
+    execution_ttl: int = int(os.getenv("EXECUTION_TTL", str(7 * 24 * 3600)))
+    archive_path: str = os.getenv("ARCHIVE_PATH", "")
+    archive_delay: float = float(os.getenv("ARCHIVE_DELAY", "60"))
+    archive_interval: float = float(os.getenv("ARCHIVE_INTERVAL", "5"))
+    archive_batch_size: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+    node_metrics: bool = os.getenv("NODE_METRICS", "1") == "1"
+    metrics_flush_interval: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+    dispatch_priority: str = os.getenv("DISPATCH_PRIORITY", "depth")
+    priority_refresh_interval: float = float(
+        os.getenv("PRIORITY_REFRESH_INTERVAL", "60")
+    )
+    # JSON object of handler name -> HandlerLimits fields, overriding the
+    # limits a handler registered with.
+    handler_limits: str = os.getenv("HANDLER_LIMITS", "")
+    # JSON object of handler name -> seconds to memoize its results, overriding
+    # the cache_ttl a handler registered with.
+    handler_cache_ttl: str = os.getenv("HANDLER_CACHE_TTL", "")
 
 
 settings = Settings()
@@ -0,0 +1,148 @@
+"""Fan-out of execution state transitions to streaming HTTP clients.
+
+State writes publish JSON events on ``wf:{execution_id}:events``. Each API
+process holds a single pub/sub connection, subscribes to an execution's channel
+while at least one client is watching it, and copies every message into the
+per-client queues. If the connection fails, the reader drops it and resubscribes
+every watched channel on a new one, backing off between attempts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator
+from typing import Any
+
+from app import async_state, state
+from app.models import WorkflowStatus
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {WorkflowStatus.COMPLETED.value, WorkflowStatus.FAILED.value}
+# Seconds before the first reconnect attempt, doubling up to the maximum.
+RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30.0
+
+
+class EventHub:
+    def __init__(self, queue_size: int = 1000) -> None:
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._pubsub: Any = None
+        self._reader: asyncio.Task | None = None
+
+    async def subscribe(self, execution_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        channel = state.events_channel(execution_id)
+        listeners = self._subscribers.setdefault(channel, set())
+        listeners.add(queue)
+        try:
+            if self._pubsub is None:
+                await self._connect()
+            elif len(listeners) == 1:
+                await self._pubsub.subscribe(channel)
+        except Exception:
+            # The reader reconnects and resubscribes this channel with the rest.
+            logger.exception("Subscribing to %s failed", channel)
+            await self._disconnect()
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, execution_id: str, queue: asyncio.Queue) -> None:
+        channel = state.events_channel(execution_id)
+        listeners = self._subscribers.get(channel, set())
+        listeners.discard(queue)
+        if not listeners and channel in self._subscribers:
+            del self._subscribers[channel]
+            if self._pubsub is not None:
+                await self._pubsub.unsubscribe(channel)
+
+    def publish_local(self, channel: str, data: str) -> None:
+        event = json.loads(data)
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                # A stalled client loses its oldest event rather than stalling
+                # every other watcher of the execution.
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _connect(self) -> None:
+        """Open a new pub/sub connection subscribed to every watched channel."""
+        self._pubsub = async_state.get_redis().pubsub()
+        if self._subscribers:
+            await self._pubsub.subscribe(*self._subscribers)
+
+    async def _disconnect(self) -> None:
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                logger.debug("Closing the event subscription failed", exc_info=True)
+
+    async def _read(self) -> None:
+        delay = RECONNECT_DELAY
+        while self._subscribers:
+            try:
+                if self._pubsub is None:
+                    await self._connect()
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except Exception:
+                logger.exception(
+                    "Event subscription failed; reconnecting in %.1fs", delay
+                )
+                await self._disconnect()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            delay = RECONNECT_DELAY
+            if message and message["type"] == "message":
+                self.publish_local(message["channel"], message["data"])
+
+
+hub = EventHub()
+
+
+async def stream_execution(
+    execution_id: str, keepalive_seconds: float = 15.0
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield a status snapshot, then live transitions until the workflow ends."""
+    queue = await hub.subscribe(execution_id)
+    try:
+        graph = await async_state.load_workflow_graph(execution_id)
+        if graph is None:
+            return
+        status_value = (
+            await async_state.get_workflow_status(execution_id)
+            or WorkflowStatus.PENDING
+        )
+        node_statuses = await async_state.list_node_statuses(
+            execution_id, graph.definition
+        )
+        yield {
+            "type": "snapshot",
+            "status": status_value.value,
+            "node_statuses": {key: value.value for key, value in node_statuses.items()},
+        }
+        if status_value.value in TERMINAL_STATUSES:
+            return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield {"type": "keepalive"}
+                continue
+            yield event
+            if event["type"] == "workflow" and event["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        await hub.unsubscribe(execution_id, queue)
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -1,7 +1,154 @@
 from __future__ import annotations
 
+import hashlib
+import math
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, chain
+from collections.abc import Callable, Iterator, Mapping
 
+from app.config import settings
 from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition
+from app.utils import TemplatePlan, compile_templates
+
+
+class CompactGraph:
+    """Integer-indexed DAG with CSR (offset + index ``array``) adjacency.
+
+    Node ``i`` is the i-th node of the definition. Its children are
+    ``children[child_offsets[i]:child_offsets[i + 1]]`` and its parents are laid
+    out the same way, so a 100k-node graph costs a few flat arrays instead of
+    a list per node. Construction runs Kahn's algorithm iteratively, rejects
+    missing dependencies and cycles, and records a topological order and
+    each node's depth (longest path from a root, in edges).
+    """
+
+    __slots__ = (
+        "ids",
+        "index",
+        "child_offsets",
+        "children",
+        "parent_offsets",
+        "parents",
+        "order",
+        "depth",
+    )
+
+    def __init__(self, dag: DAGDefinition) -> None:
+        self.ids: list[str] = [node.id for node in dag.nodes]
+        self.index: dict[str, int] = {node_id: i for i, node_id in enumerate(self.ids)}
+        # Built as lists (cheaper to index from Python), then packed into arrays.
+        parent_lists = [self._parent_list(node) for node in dag.nodes]
+        child_lists: list[list[int]] = [[] for _ in self.ids]
+        for child, parents in enumerate(parent_lists):
+            for parent in parents:
+                child_lists[parent].append(child)
+        self.parent_offsets, self.parents = _csr(parent_lists)
+        self.child_offsets, self.children = _csr(child_lists)
+        order, depth = self._topological_order(parent_lists, child_lists)
+        self.order = array("I", order)
+        self.depth = array("I", depth)
+
+    def _parent_list(self, node: NodeDefinition) -> list[int]:
+        try:
+            return [self.index[dep] for dep in node.dependencies]
+        except KeyError as exc:
+            raise ValueError(
+                f"Node {node.id} references missing dependency {exc.args[0]}"
+            ) from None
+
+    def _topological_order(
+        self, parent_lists: list[list[int]], child_lists: list[list[int]]
+    ) -> tuple[list[int], list[int]]:
+        remaining = [len(parents) for parents in parent_lists]
+        depth = [0] * len(remaining)
+        # The order doubles as Kahn's FIFO queue.
+        order = [node for node, count in enumerate(remaining) if count == 0]
+        for node in order:
+            next_depth = depth[node] + 1
+            for child in child_lists[node]:
+                if depth[child] < next_depth:
+                    depth[child] = next_depth
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    order.append(child)
+        if len(order) < len(remaining):
+            # Walk unfinished parents back from a stuck node until one repeats;
+            # that node lies on a cycle rather than just downstream of one.
+            node = next(i for i, count in enumerate(remaining) if count)
+            seen: set[int] = set()
+            while node not in seen:
+                seen.add(node)
+                node = next(p for p in parent_lists[node] if remaining[p])
+            raise ValueError(f"Cycle detected involving node {self.ids[node]}")
+        return order, depth
+
+    def schedule(self, durations: list[float]) -> tuple[list[float], list[float]]:
+        """Earliest and latest start of every node for per-node ``durations``.
+
+        Latest starts keep the longest path's length, so ``latest - earliest``
+        is a node's slack and the zero-slack nodes form the critical path.
+        """
+        earliest = [0.0] * len(self.ids)
+        finish = [0.0] * len(self.ids)
+        for node in self.order:
+            start = max((finish[p] for p in self.parent_indices(node)), default=0.0)
+            earliest[node] = start
+            finish[node] = start + durations[node]
+        length = max(finish, default=0.0)
+        latest = [0.0] * len(self.ids)
+        for node in reversed(self.order):
+            end = min((latest[c] for c in self.child_indices(node)), default=length)
+            latest[node] = end - durations[node]
+        return earliest, latest
+
+    def bottom_levels(self, durations: list[float]) -> list[float]:
+        """Per node, the longest path from its start to the end of a sink."""
+        levels = [0.0] * len(self.ids)
+        for node in reversed(self.order):
+            below = max((levels[c] for c in self.child_indices(node)), default=0.0)
+            levels[node] = durations[node] + below
+        return levels
+
+    def child_indices(self, node: int) -> array:
+        return self.children[self.child_offsets[node] : self.child_offsets[node + 1]]
+
+    def parent_indices(self, node: int) -> array:
+        return self.parents[self.parent_offsets[node] : self.parent_offsets[node + 1]]
+
+
+def _csr(lists: list[list[int]]) -> tuple[array, array]:
+    """Pack per-node index lists into (offsets, flat indices) arrays."""
+    offsets = array("I", accumulate(map(len, lists), initial=0))
+    return offsets, array("I", chain.from_iterable(lists))
+
+
+class _Neighbors(Mapping[str, list[str]]):
+    """Read-only ``{node_id: [neighbour ids]}`` view over one CSR direction."""
+
+    __slots__ = ("_graph", "_indices")
+
+    def __init__(self, graph: CompactGraph, indices: Callable[[int], array]) -> None:
+        self._graph = graph
+        self._indices = indices
+
+    def __getitem__(self, node_id: str) -> list[str]:
+        ids = self._graph.ids
+        return [ids[i] for i in self._indices(self._graph.index[node_id])]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph.ids)
+
+    def __len__(self) -> int:
+        return len(self._graph.ids)
+
+
+# Dispatch priorities run from 0 to PRIORITY_LEVELS - 1, most urgent last.
+PRIORITY_LEVELS = 10
+# Priority levels per doubling of a node's remaining path (in nodes, or seconds
+# when weighted by duration); paths of 2**6 - 1 = 63 or more get the top level.
+PRIORITY_SCALE = 1.5
 
 
 class WorkflowGraph:
@@ -10,53 +157,188 @@ class WorkflowGraph:
         self.nodes: dict[str, NodeDefinition] = {
             node.id: node for node in definition.dag.nodes
         }
-        self.adjacency: dict[str, list[str]] = {node_id: [] for node_id in self.nodes}
-        self.parents: dict[str, list[str]] = {node_id: [] for node_id in self.nodes}
-        self.in_degree: dict[str, int] = {node_id: 0 for node_id in self.nodes}
-        self._build()
-
-    def _build(self) -> None:
-        for node in self.definition.dag.nodes:
-            for dep in node.dependencies:
-                self.adjacency.setdefault(dep, []).append(node.id)
-                self.parents[node.id].append(dep)
-                self.in_degree[node.id] += 1
+        self.compact = CompactGraph(definition.dag)
+        self.adjacency: Mapping[str, list[str]] = _Neighbors(
+            self.compact, self.compact.child_indices
+        )
+        self.parents: Mapping[str, list[str]] = _Neighbors(
+            self.compact, self.compact.parent_indices
+        )
+        self.roots: list[str] = [
+            self.compact.ids[i]
+            for i in range(len(self.compact.ids))
+            if not self.compact.parent_indices(i)
+        ]
+        self.plans: dict[str, TemplatePlan] = {
+            node.id: compile_templates(node.config) for node in definition.dag.nodes
+        }
+        self.chains: dict[str, list[str]] = self._find_chains()
+        self.priorities: dict[str, int] = self._priorities([1.0] * len(self.nodes))
+        self._weighted: tuple[Mapping[str, float], dict[str, int]] | None = None
 
     @property
-    def roots(self) -> list[str]:
-        return [node_id for node_id, degree in self.in_degree.items() if degree == 0]
+    def topological_order(self) -> list[str]:
+        return [self.compact.ids[i] for i in self.compact.order]
+
+    def depth(self, node_id: str) -> int:
+        """Longest path from a root to the node, in edges."""
+        return self.compact.depth[self.compact.index[node_id]]
+
+    def _find_chains(self) -> dict[str, list[str]]:
+        """Map the head of every straight-line run of 2+ nodes to the run.
+
+        Each link is the parent's only child and the child's only parent, so
+        the run can execute in one task with no readiness checks in between.
+        """
+        compact = self.compact
+
+        def fused_child(node: int) -> int | None:
+            children = compact.child_indices(node)
+            if len(children) == 1 and len(compact.parent_indices(children[0])) == 1:
+                return children[0]
+            return None
+
+        chains: dict[str, list[str]] = {}
+        for node in range(len(compact.ids)):
+            parents = compact.parent_indices(node)
+            if len(parents) == 1 and fused_child(parents[0]) == node:
+                continue
+            chain = [node]
+            while (child := fused_child(chain[-1])) is not None:
+                chain.append(child)
+            if len(chain) > 1:
+                chains[compact.ids[node]] = [compact.ids[i] for i in chain]
+        return chains
+
+    def _priorities(self, durations: list[float]) -> dict[str, int]:
+        """Map each node's longest downstream path onto the priority levels.
+
+        Nodes heading longer remaining paths get higher priority, so under
+        contention they run before nodes with slack. The scale is absolute
+        (logarithmic and capped), not relative to this graph's longest path, so
+        levels compare across executions of different sizes.
+        """
+        levels = self.compact.bottom_levels(durations)
+        top = PRIORITY_LEVELS - 1
+        return {
+            node_id: min(top, round(PRIORITY_SCALE * math.log2(1 + level)))
+            for node_id, level in zip(self.compact.ids, levels)
+        }
+
+    def weighted_priorities(
+        self, handler_seconds: Mapping[str, float]
+    ) -> dict[str, int]:
+        """Priorities with each node weighted by its handler's mean duration.
+
+        Handlers without history weigh the mean of the known ones. The result
+        is kept until a different ``handler_seconds`` mapping is passed.
+        """
+        cached = self._weighted
+        if cached is not None and cached[0] is handler_seconds:
+            return cached[1]
+        known = [
+            handler_seconds[node.handler]
+            for node in self.nodes.values()
+            if node.handler in handler_seconds
+        ]
+        default = sum(known) / len(known) if known else 1.0
+        priorities = self._priorities(
+            [
+                handler_seconds.get(self.nodes[node_id].handler, default)
+                for node_id in self.compact.ids
+            ]
+        )
+        self._weighted = (handler_seconds, priorities)
+        return priorities
+
+    def referenced_parents(self, node_id: str) -> list[str]:
+        """Parents whose outputs the node's config templates read."""
+        roots = self.plans[node_id].roots
+        return [parent for parent in self.parents[node_id] if parent in roots]
+
+    def parent_fields(self, node_id: str) -> dict[str, frozenset[str] | None]:
+        """Top-level output fields read from each referenced parent.
+
+        ``None`` means the template uses the parent's whole output.
+        """
+        plan = self.plans[node_id]
+        fields: dict[str, frozenset[str] | None] = {}
+        for parent in self.referenced_parents(node_id):
+            paths = plan.fields(parent)
+            fields[parent] = None if () in paths else frozenset(p[0] for p in paths)
+        return fields
 
 
 def validate_workflow(definition: WorkflowDefinition) -> WorkflowGraph:
-    _ensure_dependencies_exist(definition.dag)
-    graph = WorkflowGraph(definition)
-    _ensure_acyclic(graph)
-    return graph
+    """Build the graph; raises ValueError on missing dependencies or cycles."""
+    return WorkflowGraph(definition)
+
+
+def definition_digest(raw_definition: str | bytes) -> str:
+    if isinstance(raw_definition, str):
+        raw_definition = raw_definition.encode()
+    return hashlib.sha256(raw_definition).hexdigest()
 
 
-def _ensure_dependencies_exist(dag: DAGDefinition) -> None:
-    node_ids: set[str] = {node.id for node in dag.nodes}
-    for node in dag.nodes:
-        for dep in node.dependencies:
-            if dep not in node_ids:
-                raise ValueError(f"Node {node.id} references missing dependency {dep}")
+class GraphCache:
+    """Bounded per-process LRU of validated graphs keyed by definition digest.
 
+    Digests are SHA-256 over the definition JSON, so entries never go stale: a
+    changed definition has a different digest. ``invalidate`` only frees memory.
+    """
 
-def _ensure_acyclic(graph: WorkflowGraph) -> None:
-    visited: set[str] = set()
-    stack: set[str] = set()
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, WorkflowGraph] = OrderedDict()
+        self._lock = threading.Lock()
 
-    def dfs(node_id: str) -> None:
-        if node_id in stack:
-            raise ValueError(f"Cycle detected involving node {node_id}")
-        if node_id in visited:
+    def get(self, digest: str) -> WorkflowGraph | None:
+        with self._lock:
+            graph = self._entries.get(digest)
+            if graph is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return graph
+
+    def put(self, digest: str, graph: WorkflowGraph) -> None:
+        if self.maxsize <= 0:
             return
-        visited.add(node_id)
-        stack.add(node_id)
-        for child in graph.adjacency.get(node_id, []):
-            dfs(child)
-        stack.remove(node_id)
-
-    for node_id in graph.nodes:
-        if node_id not in visited:
-            dfs(node_id)
+        with self._lock:
+            self._entries[digest] = graph
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, digest: str) -> None:
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+graph_cache = GraphCache(settings.graph_cache_size)
+
+
+def compile_definition(digest: str, raw_definition: str | bytes) -> WorkflowGraph:
+    """Parse and validate a stored definition, caching the graph under its digest."""
+    definition = WorkflowDefinition.model_validate_json(raw_definition)
+    graph = validate_workflow(definition)
+    graph_cache.put(digest, graph)
+    return graph
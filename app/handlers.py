@@ -1,39 +1,301 @@
+"""Node handler registry.
+
+Handlers register with ``@register_handler`` or through the
+``workflow_engine.handlers`` entry-point group, so a package can ship handlers
+without touching this module. Each handler declares the Celery queue it runs on
+(``cpu``, ``io`` or ``llm``), an optional timeout in seconds, and free-form
+resource hints that are used to size the worker pool serving each queue.
+Cheap synchronous handlers can be flagged ``inline``; the orchestrator then runs
+them in-process instead of publishing a task. Deterministic handlers can set
+``cache_ttl``, or be listed in ``HANDLER_CACHE_TTL``, to reuse results across
+executions (see ``app.memo``); bump ``version`` when a handler's output for the
+same config changes. Handlers that
+call rate-limited services can cap their nodes in flight and their starts per
+second across all workers (see ``app.limits``).
+"""
+
 from __future__ import annotations
 
+import asyncio
+import inspect
+import json
+import logging
+import math
 import random
 import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import partial
+from importlib.metadata import entry_points
 from typing import Any
 
-from app import state
+from app import memo, state
+from app.config import settings
 
+logger = logging.getLogger(__name__)
 
-def execute_handler(
-    execution_id: str, node_id: str, handler: str, config: dict[str, Any], graph
+HANDLER_QUEUES = ("cpu", "io", "llm")
+ENTRY_POINT_GROUP = "workflow_engine.handlers"
+
+
+@dataclass(frozen=True)
+class HandlerLimits:
+    """Caps shared by every worker: nodes in flight and starts per second.
+
+    ``burst`` is the token bucket's size (default: one second of
+    ``rate_limit``). With ``per_host`` each host of the node's ``url`` config
+    gets its own caps.
+    """
+
+    max_in_flight: int | None = None
+    rate_limit: float | None = None
+    burst: int | None = None
+    per_host: bool = False
+
+    def __post_init__(self) -> None:
+        if self.max_in_flight is not None and self.max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if self.rate_limit is not None and self.rate_limit <= 0:
+            raise ValueError("rate_limit must be positive")
+        if self.burst is not None and self.burst < 1:
+            raise ValueError("burst must be at least 1")
+
+    @property
+    def active(self) -> bool:
+        return bool(self.max_in_flight or self.rate_limit)
+
+    @property
+    def bucket_size(self) -> int:
+        return self.burst or max(1, math.ceil(self.rate_limit or 0))
+
+
+@dataclass(frozen=True)
+class HandlerSpec:
+    name: str
+    function: Callable[..., Any]
+    queue: str = "cpu"
+    timeout: float | None = None
+    inline: bool = False
+    hints: dict[str, Any] = field(default_factory=dict)
+    version: str = "1"
+    cache_ttl: float | None = None
+    limits: HandlerLimits | None = None
+
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.function)
+
+
+def _parse_json_object(raw: str, setting: str) -> dict[str, Any]:
+    try:
+        parsed = json.loads(raw) if raw else {}
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"{setting} is not valid JSON: {exc}") from exc
+    if not isinstance(parsed, dict):
+        raise ValueError(f"{setting} must be a JSON object")
+    return parsed
+
+
+def parse_handler_limits(raw: str) -> dict[str, HandlerLimits]:
+    """Parse ``HANDLER_LIMITS``: a JSON object of handler name -> limit fields."""
+    parsed = _parse_json_object(raw, "HANDLER_LIMITS")
+    overrides: dict[str, HandlerLimits] = {}
+    for name, fields in parsed.items():
+        if not isinstance(fields, dict):
+            raise ValueError(f"HANDLER_LIMITS[{name!r}] must be a JSON object")
+        try:
+            overrides[name] = HandlerLimits(**fields)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"HANDLER_LIMITS[{name!r}]: {exc}") from exc
+    return overrides
+
+
+def parse_handler_cache_ttls(raw: str) -> dict[str, float]:
+    """Parse ``HANDLER_CACHE_TTL``: a JSON object of handler name -> seconds."""
+    parsed = _parse_json_object(raw, "HANDLER_CACHE_TTL")
+    for name, ttl in parsed.items():
+        if isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0:
+            raise ValueError(f"HANDLER_CACHE_TTL[{name!r}] must be positive seconds")
+    return {name: float(ttl) for name, ttl in parsed.items()}
+
+
+HANDLERS: dict[str, HandlerSpec] = {}
+_entry_points_loaded = False
+# Parsed once, so bad overrides fail the API and workers at startup.
+_limit_overrides = parse_handler_limits(settings.handler_limits)
+_cache_ttl_overrides = parse_handler_cache_ttls(settings.handler_cache_ttl)
+
+
+def register_handler(
+    name: str,
+    *,
+    queue: str = "cpu",
+    timeout: float | None = None,
+    inline: bool = False,
+    version: str = "1",
+    cache_ttl: float | None = None,
+    max_in_flight: int | None = None,
+    rate_limit: float | None = None,
+    burst: int | None = None,
+    per_host: bool = False,
+    **hints: Any,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Register ``function(execution_id, node_id, config, graph)`` as a handler."""
+    if queue not in HANDLER_QUEUES:
+        raise ValueError(f"Unknown handler queue: {queue}")
+    limits = HandlerLimits(max_in_flight, rate_limit, burst, per_host)
+    if inline and limits.active:
+        raise ValueError(f"Inline handler {name} cannot be rate limited")
+
+    def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+        if inline and inspect.iscoroutinefunction(function):
+            raise ValueError(f"Inline handler {name} must not be async")
+        HANDLERS[name] = HandlerSpec(
+            name,
+            function,
+            queue,
+            timeout,
+            inline,
+            hints,
+            version,
+            cache_ttl,
+            limits if limits.active else None,
+        )
+        return function
+
+    return decorator
+
+
+def _load_entry_points() -> None:
+    global _entry_points_loaded
+    _entry_points_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            target = entry_point.load()
+        except Exception:  # pragma: no cover - broken third-party package
+            logger.exception("Failed to load handler entry point %s", entry_point.name)
+            continue
+        # Decorated handlers register themselves on import; bare callables get
+        # the entry point's name and default settings.
+        if entry_point.name not in HANDLERS and callable(target):
+            register_handler(entry_point.name)(target)
+
+
+def get_handler(name: str) -> HandlerSpec:
+    if name not in HANDLERS and not _entry_points_loaded:
+        _load_entry_points()
+    if name not in HANDLERS:
+        raise ValueError(f"Unknown handler: {name}")
+    return HANDLERS[name]
+
+
+def handler_limits(handler: str) -> HandlerLimits | None:
+    """A handler's active limits; ``HANDLER_LIMITS`` overrides registration."""
+    limits = _limit_overrides.get(handler)
+    if limits is None:
+        try:
+            spec = get_handler(handler)
+        except ValueError:
+            return None
+        # Inline nodes run in the orchestrator, outside any worker slot.
+        limits = None if spec.inline else spec.limits
+    return limits if limits is not None and limits.active else None
+
+
+def handler_cache_ttl(spec: HandlerSpec) -> float | None:
+    """Seconds to memoize a handler's results; ``HANDLER_CACHE_TTL`` overrides."""
+    return _cache_ttl_overrides.get(spec.name, spec.cache_ttl)
+
+
+def handler_queue(name: str) -> str | None:
+    """Queue for a handler, or None to use the default ``workflow`` queue."""
+    try:
+        return get_handler(name).queue
+    except ValueError:
+        return None
+
+
+@register_handler("input", inline=True)
+def _input(execution_id: str, node_id: str, config: dict[str, Any], graph) -> Any:
+    return state.get_params(execution_id)
+
+
+@register_handler("call_external_service", queue="io", timeout=30)
+async def _call_external_service(
+    execution_id: str, node_id: str, config: dict[str, Any], graph
 ) -> dict[str, Any]:
-    """Dispatch node handlers; kept minimal for mocking."""
-    if handler == "input":
-        params = state.get_params(execution_id)
-        return params
-    if handler == "call_external_service":
-        return _mock_external_call(config)
-    if handler == "llm_generate":
-        prompt = config.get("prompt", "")
-        time.sleep(random.uniform(1, 2))
-        return {"text": f"mock_response: {prompt}"}
-    if handler == "output":
-        parent_outputs = {
-            pid: state.get_node_output(execution_id, pid)
-            for pid in graph.parents.get(node_id, [])
-        }
-        return {"final": parent_outputs}
-    raise ValueError(f"Unknown handler: {handler}")
-
-
-def _mock_external_call(config: dict[str, Any]) -> dict[str, Any]:
     url = config.get("url", "http://example.com/mock")
-    time.sleep(random.uniform(1, 2))
+    await asyncio.sleep(random.uniform(1, 2))
     return {
         "url": url,
         "status": "ok",
         "data": {"mock": True, "timestamp": time.time()},
     }
+
+
+@register_handler("llm_generate", queue="llm", timeout=120)
+async def _llm_generate(
+    execution_id: str, node_id: str, config: dict[str, Any], graph
+) -> dict[str, Any]:
+    prompt = config.get("prompt", "")
+    await asyncio.sleep(random.uniform(1, 2))
+    return {"text": f"mock_response: {prompt}"}
+
+
+@register_handler("output", inline=True)
+def _output(
+    execution_id: str, node_id: str, config: dict[str, Any], graph
+) -> dict[str, Any]:
+    parent_outputs = state.get_node_outputs(
+        execution_id, graph.parents.get(node_id, [])
+    )
+    return {"final": parent_outputs}
+
+
+def is_async_handler(handler: str) -> bool:
+    return get_handler(handler).is_async
+
+
+def execute_handler(
+    execution_id: str, node_id: str, handler: str, config: dict[str, Any], graph
+) -> dict[str, Any]:
+    """Run a node handler to completion; async handlers get a private loop.
+
+    Timeouts of blocking handlers are enforced by the Celery time limits set
+    at dispatch.
+    """
+    spec = get_handler(handler)
+
+    def call() -> dict[str, Any]:
+        result = spec.function(execution_id, node_id, config, graph)
+        if inspect.isawaitable(result):
+            return asyncio.run(asyncio.wait_for(result, spec.timeout))
+        return result
+
+    cache_ttl = handler_cache_ttl(spec)
+    if cache_ttl is None:
+        return call()
+    key = memo.memo_key(spec.name, spec.version, config)
+    return memo.memoized_call(spec.name, key, cache_ttl, call)
+
+
+async def execute_handler_async(
+    execution_id: str, node_id: str, handler: str, config: dict[str, Any], graph
+) -> dict[str, Any]:
+    """Await a node handler; blocking handlers run on the loop's executor."""
+    spec = get_handler(handler)
+
+    async def call() -> dict[str, Any]:
+        if spec.is_async:
+            result = spec.function(execution_id, node_id, config, graph)
+        else:
+            result = asyncio.get_running_loop().run_in_executor(
+                None, partial(spec.function, execution_id, node_id, config, graph)
+            )
+        return await asyncio.wait_for(result, spec.timeout)
+
+    cache_ttl = handler_cache_ttl(spec)
+    if cache_ttl is None:
+        return await call()
+    key = memo.memo_key(spec.name, spec.version, config)
+    return await memo.memoized_call_async(spec.name, key, cache_ttl, call)
@@ -0,0 +1,145 @@
+"""Node leases: worker heartbeats and the reaper that recovers lost nodes.
+
+Every node marked RUNNING gets a lease in the ``wf:leases`` sorted set, scored
+by its deadline. A queued node's deadline is ``NODE_DISPATCH_TTL`` away, long
+enough to outlast a broker backlog. When a worker starts the node, the deadline
+drops to ``NODE_LEASE_TTL`` from then, and the worker renews it every
+``NODE_HEARTBEAT_INTERVAL`` seconds; completion and failure drop it. A lease
+that expires means the task was lost with its worker (or its message was lost
+before any worker took it).
+
+The reaper (``python -m app.leases``) claims expired leases in score order and
+publishes those nodes again with exponential backoff. A node is failed once it
+has been dispatched ``NODE_MAX_ATTEMPTS`` times. Each pass also publishes
+deferred rate-limited nodes that are due (see ``app.limits``).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from app import limits, state
+from app.config import settings
+from app.models import NodeStatus, WorkflowStatus
+from app.orchestrator import load_workflow_graph, on_node_failure, redispatch_node
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseHeartbeat:
+    """Renews the leases of every node this process is running, in one call."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._held: set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @contextmanager
+    def hold(self, execution_id: str, node_id: str) -> Iterator[None]:
+        member = state.lease_member(execution_id, node_id)
+        with self._lock:
+            self._held.add(member)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="lease-heartbeat", daemon=True
+                )
+                self._thread.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held.discard(member)
+
+    def beat(self) -> None:
+        with self._lock:
+            members = list(self._held)
+        if members:
+            state.renew_leases(members)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.beat()
+            except Exception:
+                logger.exception("Lease heartbeat failed")
+
+
+lease_heartbeat = LeaseHeartbeat(settings.node_heartbeat_interval)
+
+
+def retry_delay(attempt: int) -> float:
+    return min(
+        settings.node_retry_backoff * 2 ** (attempt - 1),
+        settings.node_retry_backoff_max,
+    )
+
+
+def reap_expired_leases(now: float | None = None) -> int:
+    """Recover up to ``REAPER_BATCH_SIZE`` expired nodes; returns how many."""
+    now = time.time() if now is None else now
+    claimed = state.claim_expired_leases(
+        now, settings.reaper_batch_size, now + settings.node_lease_ttl
+    )
+    for execution_id, node_id in claimed:
+        try:
+            _recover_node(execution_id, node_id, now)
+        except Exception:
+            logger.exception("Recovering node %s of %s failed", node_id, execution_id)
+    return len(claimed)
+
+
+def _recover_node(execution_id: str, node_id: str, now: float) -> None:
+    graph = load_workflow_graph(execution_id)
+    if (
+        graph is None
+        or node_id not in graph.nodes
+        or state.get_workflow_status(execution_id) != WorkflowStatus.RUNNING
+        or state.get_node_status(execution_id, node_id) != NodeStatus.RUNNING
+    ):
+        state.release_lease(execution_id, node_id)
+        return
+
+    attempt = state.increment_attempts(execution_id, node_id)
+    if attempt >= settings.node_max_attempts:
+        on_node_failure(
+            execution_id,
+            node_id,
+            f"Node {node_id} lease expired after {attempt} attempts",
+        )
+        return
+    delay = retry_delay(attempt)
+    state.extend_lease(execution_id, node_id, now + delay + settings.node_dispatch_ttl)
+    logger.warning(
+        "Lease of node %s for workflow %s expired; re-dispatching in %.1fs",
+        node_id,
+        execution_id,
+        delay,
+    )
+    redispatch_node(execution_id, node_id, graph, countdown=delay)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        try:
+            reaped = reap_expired_leases()
+        except Exception:
+            logger.exception("Lease reaper pass failed")
+            reaped = 0
+        try:
+            limits.promote_due()
+        except Exception:
+            logger.exception("Promoting deferred nodes failed")
+        # A full batch means more leases may be waiting.
+        if reaped < settings.reaper_batch_size:
+            time.sleep(settings.reaper_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Per-handler concurrency caps and rate limits, enforced across workers.
+
+Handlers declare ``max_in_flight`` and a token-bucket ``rate_limit`` (starts
+per second, up to ``burst`` at once) when they register, or through
+``HANDLER_LIMITS``. With ``per_host`` the caps apply per host of the node's
+``url`` config. Each handler (or handler and host) is a scope with three keys:
+
+- ``wf:limit:{scope}:running``: nodes holding a slot, scored by the time the
+  slot is reclaimed if its worker dies;
+- ``wf:limit:{scope}:tokens``: the bucket's tokens and last refill time;
+- ``wf:limit:{scope}:deferred``: nodes waiting to start, scored by when they
+  may.
+
+A worker takes a slot and a token in one script before running a limited
+node. A node that gets neither, or that finds due nodes deferred before it, is
+deferred: it leaves the lease index and the worker moves on, so deferred nodes
+start in the order they were due. When the node finishes, the same script that frees its slot
+hands the slot to the next deferred node and publishes it again. Nodes that
+wait on tokens are promoted by the lease reaper once tokens are due; scopes
+with deferred nodes are indexed in ``wf:limits:due`` by their next due time.
+Handlers without limits make no extra Redis calls.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlsplit
+
+from app import state
+from app.config import settings
+from app.handlers import HandlerLimits, get_handler, handler_limits
+from app.models import WorkflowStatus
+from app.orchestrator import load_workflow_graph, redispatch_node
+
+logger = logging.getLogger(__name__)
+
+LIMITS_DUE_KEY = "wf:limits:due"
+
+# Lets a node start if its scope has a free slot and a token and no due node was
+# deferred before it, or if it already holds a slot (a redelivery or a handoff
+# from RELEASE_SCRIPT). Otherwise the node is deferred until ARGV[2] + the
+# returned wait and its lease is dropped. Returns -1 when the node may start,
+# -2 when it queued behind due nodes while the scope had a free slot (promote
+# them), else the wait in ms (0: wait for a slot).
+# KEYS: running, tokens, deferred, due index, lease index.
+# ARGV: member, now, slot deadline, max in flight (0: none), rate (0: none),
+# bucket size, scope.
+ACQUIRE_SCRIPT = """
+local member, now = ARGV[1], tonumber(ARGV[2])
+local max_in_flight, rate = tonumber(ARGV[4]), tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local wait, behind = -1, false
+if redis.call('ZSCORE', KEYS[1], member) == false then
+    local due = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now, 'LIMIT', 0, 1)
+    if max_in_flight > 0 and redis.call('ZCARD', KEYS[1]) >= max_in_flight then
+        wait = 0
+    elseif due[1] ~= nil and due[1] ~= member then
+        wait, behind = 0, true
+    elseif rate > 0 then
+        local bucket = redis.call('HMGET', KEYS[2], 'tokens', 'at')
+        local size = tonumber(ARGV[6])
+        local tokens = tonumber(bucket[1] or size)
+        local elapsed = math.max(0, now - tonumber(bucket[2] or now))
+        tokens = math.min(size, tokens + elapsed * rate)
+        if tokens < 1 then
+            wait = (1 - tokens) / rate
+        else
+            redis.call('HSET', KEYS[2], 'tokens', tokens - 1, 'at', now)
+        end
+    end
+end
+if wait >= 0 then
+    redis.call('ZADD', KEYS[3], now + wait, member)
+    redis.call('ZREM', KEYS[5], member)
+    local first = redis.call('ZRANGE', KEYS[3], 0, 0, 'WITHSCORES')
+    redis.call('ZADD', KEYS[4], first[2], ARGV[7])
+    if behind then
+        return -2
+    end
+    return math.ceil(wait * 1000)
+end
+redis.call('ZADD', KEYS[1], ARGV[3], member)
+redis.call('ZREM', KEYS[3], member)
+return -1
+"""
+
+# Frees ARGV[9]'s slot (if any), then moves up to ARGV[8] due deferred nodes
+# into free slots, spending a token each, and gives them a dispatch lease again.
+# Re-indexes the scope by its next due node, or drops it once none wait.
+# Returns the promoted members.
+# KEYS: running, tokens, deferred, due index, lease index.
+# ARGV: now, slot deadline, lease deadline, max in flight (0: none),
+# rate (0: none), bucket size, scope, limit, released member ('' for none).
+RELEASE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local max_in_flight, rate = tonumber(ARGV[4]), tonumber(ARGV[5])
+if ARGV[9] ~= '' then
+    redis.call('ZREM', KEYS[1], ARGV[9])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local count = tonumber(ARGV[8])
+if max_in_flight > 0 then
+    count = math.min(count, max_in_flight - redis.call('ZCARD', KEYS[1]))
+end
+local tokens = 0
+if rate > 0 then
+    local bucket = redis.call('HMGET', KEYS[2], 'tokens', 'at')
+    local size = tonumber(ARGV[6])
+    tokens = tonumber(bucket[1] or size)
+    local elapsed = math.max(0, now - tonumber(bucket[2] or now))
+    tokens = math.min(size, tokens + elapsed * rate)
+    count = math.min(count, math.floor(tokens))
+end
+local promoted = {}
+if count > 0 then
+    promoted = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now, 'LIMIT', 0, count)
+end
+for _, member in ipairs(promoted) do
+    redis.call('ZREM', KEYS[3], member)
+    redis.call('ZADD', KEYS[1], ARGV[2], member)
+    redis.call('ZADD', KEYS[5], ARGV[3], member)
+end
+if rate > 0 then
+    tokens = tokens - #promoted
+    redis.call('HSET', KEYS[2], 'tokens', tokens, 'at', now)
+end
+local first = redis.call('ZRANGE', KEYS[3], 0, 0, 'WITHSCORES')
+if #first == 0 then
+    redis.call('ZREM', KEYS[4], ARGV[7])
+else
+    local due = tonumber(first[2])
+    if rate > 0 and tokens < 1 then
+        due = math.max(due, now + (1 - tokens) / rate)
+    end
+    redis.call('ZADD', KEYS[4], due, ARGV[7])
+end
+return promoted
+"""
+
+
+@dataclass(frozen=True)
+class Slot:
+    """A limited node's hold on its scope, freed by ``release``."""
+
+    scope: str
+    member: str
+    limits: HandlerLimits
+
+
+# Returned by ``acquire`` when the node was deferred.
+DEFERRED = Slot("", "", HandlerLimits())
+
+
+def limit_scope(handler: str, limits: HandlerLimits, config: dict[str, Any]) -> str:
+    if limits.per_host:
+        url = config.get("url")
+        host = urlsplit(url).hostname if isinstance(url, str) else None
+        if host:
+            return f"{handler}@{host}"
+    return handler
+
+
+def _keys(scope: str) -> list[str]:
+    prefix = f"wf:limit:{scope}"
+    return [
+        f"{prefix}:running",
+        f"{prefix}:tokens",
+        f"{prefix}:deferred",
+        LIMITS_DUE_KEY,
+        state.NODE_LEASES_KEY,
+    ]
+
+
+def _slot_deadline(handler: str, now: float) -> float:
+    """When a slot is reclaimed from a worker that died holding it."""
+    try:
+        timeout = get_handler(handler).timeout or 0.0
+    except ValueError:
+        timeout = 0.0
+    return now + timeout + settings.node_lease_ttl
+
+
+def acquire(
+    execution_id: str, node_id: str, handler: str, config: dict[str, Any]
+) -> Slot | None:
+    """Take a slot for a node about to run.
+
+    Returns None for handlers without limits, ``DEFERRED`` when the node must
+    wait (the worker should return without running it), else the held slot.
+    """
+    limits = handler_limits(handler)
+    if limits is None:
+        return None
+    scope = limit_scope(handler, limits, config)
+    member = state.lease_member(execution_id, node_id)
+    now = time.time()
+    wait_ms = state._script(ACQUIRE_SCRIPT)(
+        keys=_keys(scope),
+        args=[
+            member,
+            now,
+            _slot_deadline(handler, now),
+            limits.max_in_flight or 0,
+            limits.rate_limit or 0,
+            limits.bucket_size,
+            scope,
+        ],
+    )
+    if int(wait_ms) == -1:
+        return Slot(scope, member, limits)
+    logger.info(
+        "Deferring node %s of %s: %s is at its limit", node_id, execution_id, scope
+    )
+    if int(wait_ms) == -2:
+        # Nodes deferred earlier go first; hand them the free slot.
+        _promote(scope, limits, now, 1)
+    return DEFERRED
+
+
+def release(slot: Slot | None) -> None:
+    """Free a finished node's slot and start the next deferred node in it."""
+    if slot is None or slot is DEFERRED:
+        return
+    _promote(slot.scope, slot.limits, time.time(), 1, slot.member)
+
+
+def promote_due(now: float | None = None) -> int:
+    """Publish deferred nodes whose scope has room by now; returns how many.
+
+    Run by the lease reaper; slot releases promote capacity-bound nodes
+    themselves, so this mainly starts nodes that waited for tokens.
+    """
+    now = time.time() if now is None else now
+    scopes = state.get_redis().zrangebyscore(
+        LIMITS_DUE_KEY, "-inf", now, 0, settings.reaper_batch_size
+    )
+    promoted = 0
+    for scope in scopes:
+        handler = scope.split("@", 1)[0]
+        # A scope whose limits were removed drains at the batch size per pass.
+        limits = handler_limits(handler) or HandlerLimits()
+        promoted += _promote(scope, limits, now, settings.reaper_batch_size)
+    return promoted
+
+
+def _promote(
+    scope: str, limits: HandlerLimits, now: float, count: int, released: str = ""
+) -> int:
+    handler = scope.split("@", 1)[0]
+    members = state._script(RELEASE_SCRIPT)(
+        keys=_keys(scope),
+        args=[
+            now,
+            _slot_deadline(handler, now),
+            now + settings.node_dispatch_ttl,
+            limits.max_in_flight or 0,
+            limits.rate_limit or 0,
+            limits.bucket_size,
+            scope,
+            count,
+            released,
+        ],
+    )
+    for member in members or []:
+        execution_id, node_id = state.parse_lease_member(member)
+        try:
+            _republish(scope, execution_id, node_id)
+        except Exception:
+            logger.exception("Promoting node %s of %s failed", node_id, execution_id)
+    return len(members or [])
+
+
+def _republish(scope: str, execution_id: str, node_id: str) -> None:
+    graph = load_workflow_graph(execution_id)
+    if (
+        graph is None
+        or node_id not in graph.nodes
+        or state.get_workflow_status(execution_id) != WorkflowStatus.RUNNING
+    ):
+        # Nothing will run in the slot; the lease goes with it.
+        state.get_redis().zrem(
+            _keys(scope)[0], state.lease_member(execution_id, node_id)
+        )
+        state.release_lease(execution_id, node_id)
+        return
+    logger.info("Promoting deferred node %s of %s", node_id, execution_id)
+    redispatch_node(execution_id, node_id, graph, countdown=0)
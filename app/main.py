@@ -2,69 +2,224 @@ from __future__ import annotations
 
 import logging
 import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-from app.graph import validate_workflow
-from app import state
+from app import async_state
+from app.archive import load_archived_execution
+from app.events import format_sse, stream_execution
+from app.graph import (
+    compile_definition,
+    definition_digest,
+    graph_cache,
+    validate_workflow,
+)
+from app.memo import memo_stats
+from app.metrics import render_metrics
 from app.models import (
+    BatchCreateRequest,
+    BatchCreateResponse,
+    DefinitionRegisterResponse,
     TriggerRequest,
     WorkflowCreateResponse,
     WorkflowDefinition,
     WorkflowResultResponse,
     WorkflowStatus,
     WorkflowStatusResponse,
+    WorkflowTraceResponse,
 )
-from app.orchestrator import start_workflow
+from app.orchestrator import start_workflow, start_workflows_bulk
+from app.trace import build_trace
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Event-Driven Workflow Engine")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    yield
+    await async_state.close()
+
+
+app = FastAPI(title="Event-Driven Workflow Engine", lifespan=lifespan)
 
 
 @app.post("/workflows", response_model=WorkflowCreateResponse)
-def create_workflow(definition: WorkflowDefinition) -> WorkflowCreateResponse:
+async def create_workflow(definition: WorkflowDefinition) -> WorkflowCreateResponse:
     # Validate DAG and persist
-    validate_workflow(definition)
+    graph = validate_workflow(definition)
     execution_id = str(uuid.uuid4())
-    state.set_workflow_definition(execution_id, definition)
-    state.set_workflow_status(execution_id, WorkflowStatus.PENDING)
+    definition_id = await async_state.set_workflow_definition(execution_id, definition)
+    graph_cache.put(definition_id, graph)
+    await async_state.set_workflow_status(execution_id, WorkflowStatus.PENDING)
     return WorkflowCreateResponse(
         execution_id=execution_id, status=WorkflowStatus.PENDING
     )
 
 
+@app.post("/definitions", response_model=DefinitionRegisterResponse)
+async def register_definition(
+    definition: WorkflowDefinition,
+) -> DefinitionRegisterResponse:
+    graph = validate_workflow(definition)
+    definition_id = await async_state.register_definition(definition)
+    graph_cache.put(definition_id, graph)
+    return DefinitionRegisterResponse(definition_id=definition_id)
+
+
+@app.get("/definitions/{definition_id}", response_model=WorkflowDefinition)
+async def get_definition(definition_id: str) -> WorkflowDefinition:
+    graph = await async_state.load_registered_graph(definition_id)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Definition not found")
+    return graph.definition
+
+
+@app.post(
+    "/definitions/{definition_id}/executions", response_model=WorkflowCreateResponse
+)
+async def create_execution(definition_id: str) -> WorkflowCreateResponse:
+    if await async_state.load_registered_graph(definition_id) is None:
+        raise HTTPException(status_code=404, detail="Definition not found")
+    execution_id = str(uuid.uuid4())
+    await async_state.set_execution_definition(execution_id, definition_id)
+    await async_state.set_workflow_status(execution_id, WorkflowStatus.PENDING)
+    return WorkflowCreateResponse(
+        execution_id=execution_id, status=WorkflowStatus.PENDING
+    )
+
+
+@app.post("/workflows/batch", response_model=BatchCreateResponse)
+async def create_and_trigger_batch(request: BatchCreateRequest) -> BatchCreateResponse:
+    graph = validate_workflow(request.definition)
+    execution_ids = await run_in_threadpool(
+        start_workflows_bulk, request.definition, graph, request.params
+    )
+    return BatchCreateResponse(
+        execution_ids=execution_ids, status=WorkflowStatus.RUNNING
+    )
+
+
 @app.post("/workflows/{execution_id}/trigger")
-def trigger_workflow(execution_id: str, request: TriggerRequest) -> dict[str, str]:
-    definition = state.get_workflow_definition(execution_id)
-    if not definition:
+async def trigger_workflow(
+    execution_id: str, request: TriggerRequest
+) -> dict[str, str]:
+    graph = await async_state.load_workflow_graph(execution_id)
+    if graph is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    graph = validate_workflow(definition)
-    start_workflow(execution_id, definition, graph, request.params)
+    # Root dispatch publishes to the broker with the blocking Celery client.
+    await run_in_threadpool(
+        start_workflow, execution_id, graph.definition, graph, request.params
+    )
     return {"execution_id": execution_id, "status": "triggered"}
 
 
 @app.get("/workflows/{execution_id}", response_model=WorkflowStatusResponse)
-def get_workflow_status(execution_id: str) -> WorkflowStatusResponse:
-    definition = state.get_workflow_definition(execution_id)
-    if not definition:
-        raise HTTPException(status_code=404, detail="Workflow not found")
-    status_value = state.get_workflow_status(execution_id) or WorkflowStatus.PENDING
-    node_statuses = state.list_node_statuses(execution_id, definition)
+async def get_workflow_status(execution_id: str) -> WorkflowStatusResponse:
+    graph = await async_state.load_workflow_graph(execution_id)
+    if graph is None:
+        archived = await run_in_threadpool(load_archived_execution, execution_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        return WorkflowStatusResponse(
+            execution_id=execution_id,
+            status=archived.status,
+            node_statuses=archived.node_statuses,
+        )
+    status_value = (
+        await async_state.get_workflow_status(execution_id) or WorkflowStatus.PENDING
+    )
+    node_statuses = await async_state.list_node_statuses(execution_id, graph.definition)
     return WorkflowStatusResponse(
         execution_id=execution_id, status=status_value, node_statuses=node_statuses
     )
 
 
 @app.get("/workflows/{execution_id}/results", response_model=WorkflowResultResponse)
-def get_workflow_results(execution_id: str) -> WorkflowResultResponse:
-    definition = state.get_workflow_definition(execution_id)
-    if not definition:
-        raise HTTPException(status_code=404, detail="Workflow not found")
-    status_value = state.get_workflow_status(execution_id) or WorkflowStatus.PENDING
-    outputs = state.get_all_outputs(execution_id, definition)
-    error = state.get_error(execution_id)
+async def get_workflow_results(execution_id: str) -> WorkflowResultResponse:
+    graph = await async_state.load_workflow_graph(execution_id)
+    if graph is None:
+        archived = await run_in_threadpool(load_archived_execution, execution_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        return WorkflowResultResponse(
+            execution_id=execution_id,
+            status=archived.status,
+            results=archived.outputs,
+            error=archived.error,
+        )
+    status_value = (
+        await async_state.get_workflow_status(execution_id) or WorkflowStatus.PENDING
+    )
+    outputs = await async_state.get_all_outputs(execution_id, graph.definition)
+    error = await async_state.get_error(execution_id)
     return WorkflowResultResponse(
         execution_id=execution_id, status=status_value, results=outputs, error=error
     )
+
+
+@app.get("/workflows/{execution_id}/trace", response_model=WorkflowTraceResponse)
+async def get_workflow_trace(execution_id: str) -> WorkflowTraceResponse:
+    """Chrome trace-event timeline (open in ui.perfetto.dev) and critical path."""
+    graph = await async_state.load_workflow_graph(execution_id)
+    if graph is None:
+        archived = await run_in_threadpool(load_archived_execution, execution_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        graph = compile_definition(
+            definition_digest(archived.definition), archived.definition
+        )
+        return build_trace(
+            execution_id,
+            graph,
+            archived.status,
+            archived.node_statuses,
+            archived.timings,
+        )
+    status_value = (
+        await async_state.get_workflow_status(execution_id) or WorkflowStatus.PENDING
+    )
+    node_statuses = await async_state.list_node_statuses(execution_id, graph.definition)
+    timings = await async_state.get_node_timings(execution_id)
+    return build_trace(execution_id, graph, status_value, node_statuses, timings)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> str:
+    return await run_in_threadpool(render_metrics)
+
+
+@app.get("/metrics/memo")
+async def get_memo_metrics() -> dict[str, dict[str, float]]:
+    return await run_in_threadpool(memo_stats)
+
+
+@app.get("/workflows/{execution_id}/events")
+async def stream_workflow_events(execution_id: str) -> StreamingResponse:
+    if await async_state.load_workflow_graph(execution_id) is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    async def body() -> AsyncIterator[str]:
+        async for event in stream_execution(execution_id):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/workflows/{execution_id}/ws")
+async def workflow_events_socket(websocket: WebSocket, execution_id: str) -> None:
+    await websocket.accept()
+    try:
+        async for event in stream_execution(execution_id):
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
@@ -0,0 +1,200 @@
+"""Cross-execution memoization of handler results.
+
+Handlers opt in with ``register_handler(..., cache_ttl=seconds)`` or through
+``HANDLER_CACHE_TTL``. A result is keyed by a SHA-256 over (handler, handler
+version, resolved config), so bumping ``version`` retires every entry of a
+handler whose behaviour changed.
+
+Entries share one byte budget (``MEMO_MAX_BYTES``) and are evicted least
+recently used first: every read or write bumps the entry in a sorted set of
+access times, and the put script drops the oldest entries until the total fits.
+Entries are stored inline, never offloaded to the blob store, so the budget
+counts their real size and eviction frees all of it; results larger than the
+whole budget are not cached. Concurrent misses on one key are de-duplicated
+with a short Redis lock. The holder computes the result, and the others poll
+for it until the lock expires, then compute it themselves.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app import state
+from app.config import settings
+from app.serialization import encode
+
+MEMO_LRU_KEY = "wf:memo:lru"
+MEMO_SIZES_KEY = "wf:memo:sizes"
+MEMO_BYTES_KEY = "wf:memo:bytes"
+MEMO_STATS_KEY = "wf:memo:stats"
+MEMO_OUTCOMES = ("hits", "coalesced", "misses")
+
+# Stores an entry with its TTL, records its size and access time, then evicts
+# least recently used entries until the cache fits its byte budget. Entries that
+# already expired keep their size until eviction reaches them.
+# KEYS: entry, LRU sorted set, sizes hash, total bytes counter.
+# ARGV: payload, TTL in ms, now, max bytes.
+MEMO_PUT_SCRIPT = """
+local entry = KEYS[1]
+local size = string.len(ARGV[1])
+local previous = tonumber(redis.call('HGET', KEYS[3], entry) or '0')
+redis.call('SET', entry, ARGV[1], 'PX', ARGV[2])
+redis.call('HSET', KEYS[3], entry, size)
+redis.call('ZADD', KEYS[2], ARGV[3], entry)
+local total = redis.call('INCRBY', KEYS[4], size - previous)
+local max_bytes = tonumber(ARGV[4])
+while total > max_bytes do
+    local oldest = redis.call('ZRANGE', KEYS[2], 0, 0)[1]
+    if not oldest or oldest == entry then
+        break
+    end
+    local freed = tonumber(redis.call('HGET', KEYS[3], oldest) or '0')
+    redis.call('DEL', oldest)
+    redis.call('ZREM', KEYS[2], oldest)
+    redis.call('HDEL', KEYS[3], oldest)
+    total = redis.call('INCRBY', KEYS[4], -freed)
+end
+return total
+"""
+
+# Deletes the lock only while it still holds the caller's token, so a holder
+# that outlived its lock cannot release the next holder's.
+# KEYS: lock. ARGV: token.
+MEMO_UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_MISS = object()
+_POLL_SECONDS = 0.05
+
+
+def memo_key(handler: str, version: str, config: dict[str, Any]) -> str:
+    canonical = json.dumps(
+        [handler, version, config], sort_keys=True, separators=(",", ":"), default=str
+    )
+    return f"wf:memo:{handler}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def _count(handler: str, outcome: str) -> None:
+    state.get_redis().hincrby(MEMO_STATS_KEY, f"{handler}:{outcome}", 1)
+
+
+def lookup(key: str) -> Any:
+    """Return the cached result, or ``_MISS``; a hit refreshes its LRU position."""
+    pipe = state.get_payload_redis().pipeline(transaction=False)
+    pipe.get(key)
+    pipe.zadd(MEMO_LRU_KEY, {key: time.time()}, xx=True)
+    raw, _ = pipe.execute()
+    # Entries written by older versions may still reference a blob.
+    return _MISS if raw is None else state.decode_payload(raw)
+
+
+def store(key: str, output: Any, ttl_seconds: float) -> None:
+    payload = encode(output)
+    if len(payload) > settings.memo_max_bytes:
+        return
+    state._script(MEMO_PUT_SCRIPT)(
+        keys=[key, MEMO_LRU_KEY, MEMO_SIZES_KEY, MEMO_BYTES_KEY],
+        args=[
+            payload,
+            int(ttl_seconds * 1000),
+            time.time(),
+            settings.memo_max_bytes,
+        ],
+        client=state.get_payload_redis(),
+    )
+
+
+def _acquire(key: str) -> str | None:
+    """Take the single-flight lock; returns its token, or None if held."""
+    token = uuid.uuid4().hex
+    lock_ms = int(settings.memo_lock_ttl * 1000)
+    if state.get_redis().set(_lock_key(key), token, nx=True, px=lock_ms):
+        return token
+    return None
+
+
+def _release(key: str, token: str | None) -> None:
+    if token is not None:
+        state._script(MEMO_UNLOCK_SCRIPT)(keys=[_lock_key(key)], args=[token])
+
+
+def memoized_call(
+    handler: str, key: str, ttl_seconds: float, call: Callable[[], Any]
+) -> Any:
+    """Return the cached result for ``key`` or compute, store and return it."""
+    deadline = time.monotonic() + settings.memo_lock_ttl
+    waited = False
+    while True:
+        cached = lookup(key)
+        if cached is not _MISS:
+            _count(handler, "coalesced" if waited else "hits")
+            return cached
+        token = _acquire(key)
+        if token or time.monotonic() >= deadline:
+            break
+        waited = True
+        time.sleep(_POLL_SECONDS)
+    _count(handler, "misses")
+    try:
+        output = call()
+        store(key, output, ttl_seconds)
+        return output
+    finally:
+        _release(key, token)
+
+
+async def memoized_call_async(
+    handler: str, key: str, ttl_seconds: float, call: Callable[[], Awaitable[Any]]
+) -> Any:
+    """``memoized_call`` for the event loop; Redis calls run in a thread."""
+    deadline = time.monotonic() + settings.memo_lock_ttl
+    waited = False
+    while True:
+        cached = await asyncio.to_thread(lookup, key)
+        if cached is not _MISS:
+            await asyncio.to_thread(_count, handler, "coalesced" if waited else "hits")
+            return cached
+        token = await asyncio.to_thread(_acquire, key)
+        if token or time.monotonic() >= deadline:
+            break
+        waited = True
+        await asyncio.sleep(_POLL_SECONDS)
+    await asyncio.to_thread(_count, handler, "misses")
+    try:
+        output = await call()
+        await asyncio.to_thread(store, key, output, ttl_seconds)
+        return output
+    finally:
+        await asyncio.to_thread(_release, key, token)
+
+
+def memo_stats() -> dict[str, dict[str, float]]:
+    """Per-handler hits, coalesced waits, misses and hit rate.
+
+    ``coalesced`` counts callers that waited on another worker's computation
+    instead of running the handler; they count as hits in ``hit_rate``.
+    """
+    stats: dict[str, dict[str, float]] = {}
+    for field, value in state.get_redis().hgetall(MEMO_STATS_KEY).items():
+        handler, outcome = field.rsplit(":", 1)
+        counts = stats.setdefault(handler, dict.fromkeys(MEMO_OUTCOMES, 0))
+        counts[outcome] = int(value)
+    for counts in stats.values():
+        served = counts["hits"] + counts["coalesced"]
+        lookups = served + counts["misses"]
+        counts["hit_rate"] = served / lookups if lookups else 0.0
+    return stats
@@ -0,0 +1,280 @@
+"""Per-node timings and Prometheus histograms of where execution time goes.
+
+Each execution keeps a ``wf:{id}:timings`` hash with one field per node. It
+holds the enqueue time once the node is RUNNING and ``enqueued,started,finished``
+once its handler ran, as epoch milliseconds. The writes ride on the pipeline
+that marks the node RUNNING and on the completion script, so they add no round
+trips.
+
+Workers observe four histograms per handler: queue wait, handler duration,
+orchestration time (task time outside handlers) and the Redis round trips of
+that orchestration. Observations are aggregated in process and added to the
+``wf:metrics`` hash every ``METRICS_FLUSH_INTERVAL`` seconds, so a node only
+touches local counters. The same flush adds the process's compiled-graph cache
+hits and misses since the previous one. ``GET /metrics`` renders the hash in the
+Prometheus text format. ``NODE_METRICS=0`` turns timings and histograms off.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from app import state
+from app.config import settings
+from app.graph import graph_cache
+from app.memo import MEMO_STATS_KEY
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "wf:metrics"
+
+QUEUE_WAIT = "workflow_node_queue_wait_seconds"
+HANDLER_DURATION = "workflow_node_handler_seconds"
+ORCHESTRATION = "workflow_node_orchestration_seconds"
+ROUND_TRIPS = "workflow_node_redis_round_trips"
+GRAPH_CACHE_LOOKUPS = "workflow_graph_cache_lookups_total"
+
+_SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Help text and bucket upper bounds of every histogram.
+HISTOGRAMS: dict[str, tuple[str, tuple[float, ...]]] = {
+    QUEUE_WAIT: (
+        "Time from marking a node RUNNING to its handler starting.",
+        (*_SECONDS, 5.0, 10.0, 30.0, 60.0, 300.0),
+    ),
+    HANDLER_DURATION: (
+        "Handler run time.",
+        (*_SECONDS, 5.0, 10.0, 30.0, 60.0, 300.0),
+    ),
+    ORCHESTRATION: (
+        "Task time outside handlers: loading state, recording results and"
+        " dispatching children.",
+        _SECONDS,
+    ),
+    ROUND_TRIPS: (
+        "Redis round trips of a task's orchestration.",
+        (1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50),
+    ),
+}
+
+
+class MetricsRecorder:
+    """Aggregates observations in process and adds them to Redis periodically."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        # (metric, handler) -> per-bucket counts followed by the sum.
+        self._pending: dict[tuple[str, str], list[float]] = {}
+        # Graph cache hits and misses already added to the hash.
+        self._graph_cache_flushed = {"hit": 0, "miss": 0}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def observe(self, metric: str, handler: str, value: float) -> None:
+        self.observe_many([(metric, handler, value)])
+
+    def observe_many(self, observations: list[tuple[str, str, float]]) -> None:
+        if not settings.node_metrics:
+            return
+        with self._lock:
+            for metric, handler, value in observations:
+                bounds = HISTOGRAMS[metric][1]
+                slots = self._pending.get((metric, handler))
+                if slots is None:
+                    slots = self._pending[(metric, handler)] = [0] * (len(bounds) + 2)
+                slots[bisect_left(bounds, value)] += 1
+                slots[-1] += value
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-flush", daemon=True
+                )
+                self._thread.start()
+
+    def _graph_cache_lookups(self) -> dict[str, int]:
+        stats = graph_cache.stats()
+        lookups = {}
+        for outcome, total in (("hit", stats["hits"]), ("miss", stats["misses"])):
+            flushed = self._graph_cache_flushed[outcome]
+            # A cleared cache starts counting from zero again.
+            lookups[outcome] = total - flushed if total >= flushed else total
+            self._graph_cache_flushed[outcome] = total
+        return lookups
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            lookups = self._graph_cache_lookups()
+        if not pending and not any(lookups.values()):
+            return
+        pipe = state.get_redis().pipeline(transaction=False)
+        for outcome, count in lookups.items():
+            if count:
+                pipe.hincrby(METRICS_KEY, f"{GRAPH_CACHE_LOOKUPS}|{outcome}", count)
+        for (metric, handler), slots in pending.items():
+            prefix = f"{metric}|{handler}|"
+            for bucket, count in enumerate(slots[:-1]):
+                if count:
+                    pipe.hincrby(METRICS_KEY, f"{prefix}{bucket}", count)
+            pipe.hincrbyfloat(METRICS_KEY, f"{prefix}sum", slots[-1])
+        pipe.execute()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Metrics flush failed")
+
+
+recorder = MetricsRecorder(settings.metrics_flush_interval)
+
+
+class NodeTimer:
+    """Times one task: its handler runs and the orchestration around them.
+
+    ``engine`` blocks time orchestration and count its round trips on the
+    calling thread, so each block must start and end on one thread.
+    """
+
+    def __init__(self) -> None:
+        self.received = time.time()
+        self.enqueued: float | None = None
+        self.runs: list[tuple[str, str, float, float]] = []
+        self.engine_seconds = 0.0
+        self.round_trips = 0
+
+    @contextmanager
+    def engine(self) -> Iterator[None]:
+        started, trips = time.perf_counter(), state.redis_round_trips()
+        try:
+            yield
+        finally:
+            self.engine_seconds += time.perf_counter() - started
+            self.round_trips += state.redis_round_trips() - trips
+
+    @contextmanager
+    def run(self, node_id: str, handler: str) -> Iterator[None]:
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.runs.append((node_id, handler, started, time.time()))
+
+    def timings(self) -> dict[str, str]:
+        """Encoded timings of every node run; later chain members never wait."""
+        if not settings.node_metrics:
+            return {}
+        enqueued = self.enqueued if self.enqueued is not None else self.received
+        timings = {}
+        for node_id, _, started, finished in self.runs:
+            timings[node_id] = state.encode_timing(
+                enqueued if not timings else started, started, finished
+            )
+        return timings
+
+    def report(self) -> None:
+        if not self.runs:
+            return
+        _, head, head_started, _ = self.runs[0]
+        observations = [
+            (HANDLER_DURATION, handler, finished - started)
+            for _, handler, started, finished in self.runs
+        ]
+        observations.append((ORCHESTRATION, head, self.engine_seconds))
+        observations.append((ROUND_TRIPS, head, self.round_trips))
+        if self.enqueued is not None:
+            wait = max(0.0, head_started - self.enqueued)
+            observations.append((QUEUE_WAIT, head, wait))
+        recorder.observe_many(observations)
+
+
+_handler_means: tuple[float, dict[str, float]] = (float("-inf"), {})
+
+
+def handler_mean_seconds() -> dict[str, float]:
+    """Mean handler duration per handler from the shared histograms.
+
+    Re-read at most every ``PRIORITY_REFRESH_INTERVAL`` seconds; the same dict
+    is returned in between, so callers can cache on its identity.
+    """
+    global _handler_means
+    fetched_at, means = _handler_means
+    now = time.monotonic()
+    if now - fetched_at < settings.priority_refresh_interval:
+        return means
+    totals: dict[str, list[float]] = {}
+    prefix = f"{HANDLER_DURATION}|"
+    for field, value in state.get_redis().hgetall(METRICS_KEY).items():
+        if not field.startswith(prefix):
+            continue
+        handler, slot = field[len(prefix) :].rsplit("|", 1)
+        seconds_and_count = totals.setdefault(handler, [0.0, 0.0])
+        if slot == "sum":
+            seconds_and_count[0] += float(value)
+        else:
+            seconds_and_count[1] += int(value)
+    means = {
+        handler: seconds / count
+        for handler, (seconds, count) in totals.items()
+        if count
+    }
+    _handler_means = (now, means)
+    return means
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics() -> str:
+    """Node histograms, graph cache and memo counters in the Prometheus format."""
+    recorder.flush()
+    client = state.get_redis()
+    series: dict[str, dict[str, dict[str, str]]] = {}
+    graph_lookups: dict[str, str] = {}
+    for field, value in client.hgetall(METRICS_KEY).items():
+        metric, rest = field.split("|", 1)
+        if metric == GRAPH_CACHE_LOOKUPS:
+            graph_lookups[rest] = value
+            continue
+        handler, slot = rest.rsplit("|", 1)
+        series.setdefault(metric, {}).setdefault(handler, {})[slot] = value
+
+    lines = []
+    for metric, (description, bounds) in HISTOGRAMS.items():
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+        for handler, slots in sorted(series.get(metric, {}).items()):
+            label = f'handler="{_label(handler)}"'
+            count = 0
+            for bucket, bound in enumerate([*bounds, "+Inf"]):
+                count += int(slots.get(str(bucket), 0))
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum{{{label}}} {float(slots.get('sum', 0))}")
+            lines.append(f"{metric}_count{{{label}}} {count}")
+
+    lines += [
+        f"# HELP {GRAPH_CACHE_LOOKUPS} Compiled workflow graph cache lookups by"
+        " outcome.",
+        f"# TYPE {GRAPH_CACHE_LOOKUPS} counter",
+    ]
+    for outcome in ("hit", "miss"):
+        count = graph_lookups.get(outcome, 0)
+        lines.append(f'{GRAPH_CACHE_LOOKUPS}{{outcome="{outcome}"}} {count}')
+
+    lines += [
+        "# HELP workflow_memo_lookups_total Memoized handler lookups by outcome.",
+        "# TYPE workflow_memo_lookups_total counter",
+    ]
+    for field, value in sorted(client.hgetall(MEMO_STATS_KEY).items()):
+        handler, outcome = field.rsplit(":", 1)
+        lines.append(
+            f'workflow_memo_lookups_total{{handler="{_label(handler)}",'
+            f'outcome="{outcome}"}} {value}'
+        )
+    return "\n".join(lines) + "\n"
@@ -3,7 +3,7 @@ from __future__ import annotations
 from enum import Enum
 from typing import Any
 
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 
 class WorkflowStatus(str, Enum):
@@ -57,10 +57,24 @@ class WorkflowCreateResponse(BaseModel):
     status: WorkflowStatus
 
 
+class DefinitionRegisterResponse(BaseModel):
+    definition_id: str
+
+
 class TriggerRequest(BaseModel):
     params: dict[str, Any] = Field(default_factory=dict)
 
 
+class BatchCreateRequest(BaseModel):
+    definition: WorkflowDefinition
+    params: list[dict[str, Any]] = Field(..., min_length=1)
+
+
+class BatchCreateResponse(BaseModel):
+    execution_ids: list[str]
+    status: WorkflowStatus
+
+
 class WorkflowStatusResponse(BaseModel):
     execution_id: str
     status: WorkflowStatus
@@ -72,3 +86,28 @@ class WorkflowResultResponse(BaseModel):
     status: WorkflowStatus
     results: dict[str, Any]
     error: str | None = None
+
+
+class NodeTrace(BaseModel):
+    handler: str
+    status: NodeStatus
+    wait_ms: float | None = None
+    run_ms: float | None = None
+    earliest_start_ms: float
+    latest_start_ms: float
+    slack_ms: float
+    critical: bool
+
+
+class WorkflowTraceResponse(BaseModel):
+    """Chrome trace-event JSON plus the critical-path analysis."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    execution_id: str
+    status: WorkflowStatus
+    duration_ms: float
+    critical_path: list[str]
+    nodes: dict[str, NodeTrace]
+    trace_events: list[dict[str, Any]] = Field(alias="traceEvents")
+    display_time_unit: str = Field("ms", alias="displayTimeUnit")
@@ -1,16 +1,40 @@
 from __future__ import annotations
 
 import logging
+import time
+import uuid
+from collections import ChainMap
+from collections.abc import Mapping
 from typing import Any
 
 from app import state
-from app.celery_app import celery_app
-from app.graph import WorkflowGraph
+from app.celery_app import celery_app, message_priority
+from app.config import settings
+from app.graph import WorkflowGraph, compile_definition
+from app.handlers import HANDLER_QUEUES, get_handler, handler_limits
+from app.metrics import HANDLER_DURATION, handler_mean_seconds, recorder
 from app.models import NodeStatus, WorkflowDefinition, WorkflowStatus
-from app.utils import resolve_templates
 
 logger = logging.getLogger(__name__)
 
+# Seconds between a handler's soft time limit and the hard kill of its task.
+HARD_TIME_LIMIT_GRACE = 10
+
+
+def load_workflow_graph(execution_id: str) -> WorkflowGraph | None:
+    """Return the validated graph for an execution, reusing the process cache.
+
+    A cache hit costs a single GET of the execution's definition pointer.
+    """
+    pointer = state.get_definition_pointer(execution_id)
+    if not pointer:
+        return None
+    graph, definition_id = state.cached_graph(pointer)
+    if graph is not None:
+        return graph
+    raw = state.get_registered_definition_raw(definition_id)
+    return compile_definition(definition_id, raw) if raw else None
+
 
 def dispatch_node_once(execution_id: str, node_id: str, graph: WorkflowGraph) -> bool:
     if state.get_workflow_status(execution_id) == WorkflowStatus.FAILED:
@@ -22,41 +46,332 @@ def dispatch_node_once(execution_id: str, node_id: str, graph: WorkflowGraph) ->
     if current_status in {NodeStatus.RUNNING, NodeStatus.COMPLETED}:
         return False
 
-    definition = graph.nodes[node_id]
-    parent_outputs = {
-        pid: state.get_node_output(execution_id, pid)
-        for pid in graph.parents.get(node_id, [])
+    resolved_config = _node_config(execution_id, node_id, graph)
+    if resolved_config is None:
+        return False
+
+    state.set_node_status(execution_id, node_id, NodeStatus.RUNNING)
+    _send_node(execution_id, node_id, graph, resolved_config)
+    return True
+
+
+def redispatch_node(
+    execution_id: str, node_id: str, graph: WorkflowGraph, countdown: float
+) -> bool:
+    """Publish a RUNNING node again, after ``countdown`` seconds.
+
+    Used when the node's lease expired; a worker still running the first copy
+    loses nothing, because completion of an already COMPLETED node is a no-op.
+    """
+    resolved_config = _node_config(execution_id, node_id, graph)
+    if resolved_config is None:
+        return False
+    _publish_node(execution_id, node_id, graph, resolved_config, countdown=countdown)
+    return True
+
+
+def _node_config(
+    execution_id: str, node_id: str, graph: WorkflowGraph
+) -> dict[str, Any] | None:
+    parent_fields = graph.parent_fields(node_id)
+    params, parent_outputs = state.get_dispatch_inputs(
+        execution_id, list(parent_fields), _projected(parent_fields)
+    )
+    return _resolve_node_config(execution_id, node_id, graph, params, parent_outputs)
+
+
+def dispatch_ready_nodes(
+    execution_id: str, node_ids: list[str], graph: WorkflowGraph, depth: int = 0
+) -> list[str]:
+    """Dispatch nodes whose remaining-parents counter just reached zero.
+
+    The counter reaches zero exactly once per node, so no dispatch lock or
+    status re-check is needed; inputs for all nodes are fetched in one batch.
+    """
+    parent_fields: dict[str, frozenset[str] | None] = {}
+    for node_id in node_ids:
+        for parent, fields in graph.parent_fields(node_id).items():
+            seen = parent_fields.get(parent, frozenset())
+            parent_fields[parent] = (
+                None if seen is None or fields is None else seen | fields
+            )
+    params, outputs = state.get_dispatch_inputs(
+        execution_id, list(parent_fields), _projected(parent_fields)
+    )
+    resolved: dict[str, dict[str, Any]] = {}
+    for node_id in node_ids:
+        config = _resolve_node_config(
+            execution_id,
+            node_id,
+            graph,
+            params,
+            outputs.subset(graph.referenced_parents(node_id)),
+        )
+        if config is None:
+            return []
+        resolved[node_id] = config
+
+    inline = {
+        node_id: config
+        for node_id, config in resolved.items()
+        if _runs_inline(graph, node_id, depth)
     }
-    params = state.get_params(execution_id)
-    context = {**parent_outputs, "params": params}
+    state.set_node_statuses(
+        execution_id, list(resolved), NodeStatus.RUNNING, started=inline
+    )
+    # Publish first so queued work starts before inline chains run here.
+    for node_id, config in resolved.items():
+        if node_id not in inline:
+            _publish_node(execution_id, node_id, graph, config)
+    for node_id, config in inline.items():
+        _run_inline(execution_id, node_id, graph, config, depth)
+    return list(resolved)
+
+
+def _projected(
+    parent_fields: dict[str, frozenset[str] | None],
+) -> dict[str, frozenset[str]]:
+    return {parent: fields for parent, fields in parent_fields.items() if fields}
+
+
+def _resolve_node_config(
+    execution_id: str,
+    node_id: str,
+    graph: WorkflowGraph,
+    params: dict[str, Any],
+    parent_outputs: Mapping[str, Any],
+) -> dict[str, Any] | None:
+    context = ChainMap({"params": params}, parent_outputs)
     try:
-        resolved_config = resolve_templates(definition.config, context)
+        return graph.plans[node_id].resolve(context)
     except ValueError as exc:
         logger.error("Template resolution failed for node %s: %s", node_id, exc)
         fail_workflow(
             execution_id, f"Template resolution failed for node {node_id}: {exc}"
         )
         state.set_node_status(execution_id, node_id, NodeStatus.FAILED)
-        return False
+        return None
 
-    state.set_node_status(execution_id, node_id, NodeStatus.RUNNING)
+
+def _send_node(
+    execution_id: str,
+    node_id: str,
+    graph: WorkflowGraph,
+    config: dict[str, Any],
+    depth: int = 0,
+) -> None:
+    if _runs_inline(graph, node_id, depth):
+        _run_inline(execution_id, node_id, graph, config, depth)
+    else:
+        _publish_node(execution_id, node_id, graph, config)
+
+
+def _publish_node(
+    execution_id: str,
+    node_id: str,
+    graph: WorkflowGraph,
+    config: dict[str, Any],
+    **options: Any,
+) -> None:
+    handler = graph.nodes[node_id].handler
+    members = fused_chain(graph, node_id) or [node_id]
     logger.info("Dispatching node %s for workflow %s", node_id, execution_id)
+    priority = node_priority(graph, node_id)
+    if priority is not None:
+        options["priority"] = message_priority(priority)
     celery_app.send_task(
         "app.tasks.execute_node",
-        args=[execution_id, node_id, definition.handler, resolved_config],
+        args=[execution_id, node_id, handler, config],
+        **_task_options(*(graph.nodes[member].handler for member in members)),
+        **options,
     )
-    return True
 
 
-def is_node_ready(execution_id: str, node_id: str, graph: WorkflowGraph) -> bool:
-    status_value = state.get_node_status(execution_id, node_id)
-    if status_value != NodeStatus.PENDING:
+def node_priority(graph: WorkflowGraph, node_id: str) -> int | None:
+    """Urgency (0-9) from the node's longest downstream path.
+
+    ``DISPATCH_PRIORITY=depth`` counts nodes on the path, ``duration`` weighs
+    them by their handlers' mean run time so far, and ``off`` sends no priority.
+    """
+    if settings.dispatch_priority == "depth":
+        return graph.priorities[node_id]
+    if settings.dispatch_priority == "duration":
+        return graph.weighted_priorities(handler_mean_seconds())[node_id]
+    return None
+
+
+def fused_chain(graph: WorkflowGraph, node_id: str) -> list[str] | None:
+    """The straight-line chain a head node runs as one task, if fusion is on.
+
+    Chains with a rate-limited member are not fused, so each member takes its
+    own slot (see ``app.limits``).
+    """
+    chain = graph.chains.get(node_id) if settings.fuse_chains else None
+    if chain is None or any(
+        handler_limits(graph.nodes[member].handler) for member in chain
+    ):
+        return None
+    return chain
+
+
+def _runs_inline(graph: WorkflowGraph, node_id: str, depth: int) -> bool:
+    # A chain head is published so the worker runs the whole chain.
+    if depth >= settings.inline_max_depth or fused_chain(graph, node_id):
         return False
-    parents: list[str] = graph.parents.get(node_id, [])
-    return all(
-        state.get_node_status(execution_id, pid) == NodeStatus.COMPLETED
-        for pid in parents
+    try:
+        return get_handler(graph.nodes[node_id].handler).inline
+    except ValueError:
+        return False
+
+
+def _run_inline(
+    execution_id: str,
+    node_id: str,
+    graph: WorkflowGraph,
+    config: dict[str, Any],
+    depth: int,
+) -> None:
+    """Execute an inline handler here and chain into the nodes it unblocks.
+
+    The node is already RUNNING, and completion goes through the same script
+    as a worker's, so redelivery and fan-in guarantees are unchanged. ``depth``
+    bounds how many inline nodes one call stack runs in a row.
+    """
+    logger.info("Running node %s inline for workflow %s", node_id, execution_id)
+    handler = get_handler(graph.nodes[node_id].handler)
+    started = time.time()
+    try:
+        output = handler.function(execution_id, node_id, config, graph)
+    except Exception as exc:
+        on_node_failure(execution_id, node_id, str(exc))
+        return
+    finished = time.time()
+    recorder.observe(HANDLER_DURATION, handler.name, finished - started)
+    timing = state.encode_timing(started, started, finished)
+    payload, fields = state.encode_output(output)
+    on_node_success(execution_id, node_id, payload, graph, fields, depth + 1, timing)
+
+
+def _task_options(*handlers: str) -> dict[str, Any]:
+    """Route a task to its handlers' queue with their combined time limits.
+
+    A fused chain runs on the heaviest queue among its members (llm, then io,
+    then cpu). Its time limit is the sum of its members' timeouts, counting
+    members without one as 0, and is set if any member declares a timeout.
+    """
+    try:
+        specs = [get_handler(handler) for handler in handlers]
+    except ValueError:
+        # Unknown handlers fail on the default queue like before.
+        return {}
+    options: dict[str, Any] = {
+        "queue": max((spec.queue for spec in specs), key=HANDLER_QUEUES.index)
+    }
+    timeout = sum(spec.timeout or 0 for spec in specs)
+    if timeout:
+        options["soft_time_limit"] = timeout
+        options["time_limit"] = timeout + HARD_TIME_LIMIT_GRACE
+    return options
+
+
+def resolve_chain_config(
+    execution_id: str,
+    node_id: str,
+    graph: WorkflowGraph,
+    params: dict[str, Any],
+    parent_output: Any,
+) -> dict[str, Any]:
+    """Resolve a fused chain member's config from its in-memory parent output."""
+    parent_id = graph.parents[node_id][0]
+    context = ChainMap({"params": params}, {parent_id: parent_output})
+    try:
+        return graph.plans[node_id].resolve(context)
+    except ValueError as exc:
+        raise ValueError(f"Template resolution failed for node {node_id}: {exc}")
+
+
+def complete_chain(
+    execution_id: str,
+    graph: WorkflowGraph,
+    outputs: list[tuple[str, Any]],
+    failure: tuple[str, str] | None = None,
+    timings: Mapping[str, str] | None = None,
+) -> None:
+    """Persist the outputs of a fused chain's completed prefix in one batch.
+
+    With ``failure`` (node id, error) the chain stopped at that node, which is
+    marked FAILED after its predecessors are recorded as COMPLETED. ``timings``
+    holds the encoded run timings of the members that ran.
+    """
+    timings = timings or {}
+    completions = []
+    for node_id, output in outputs:
+        payload, fields = state.encode_output(output)
+        children = graph.adjacency.get(node_id, [])
+        completions.append(
+            (node_id, payload, fields, children, timings.get(node_id, ""))
+        )
+    ready = state.complete_nodes(execution_id, completions, len(graph.nodes))
+    logger.info(
+        "Chain %s completed for workflow %s",
+        [node_id for node_id, _ in outputs],
+        execution_id,
     )
+    if failure is not None:
+        on_node_failure(execution_id, *failure, timings.get(failure[0], ""))
+        return
+    # Earlier members only unblocked the next member, which ran in the chain.
+    last = ready[-1] if ready else []
+    if last is None:
+        last = _ready_without_counters(execution_id, outputs[-1][0], graph)
+    if last:
+        dispatch_ready_nodes(execution_id, last, graph)
+
+
+def start_workflows_bulk(
+    definition: WorkflowDefinition,
+    graph: WorkflowGraph,
+    params_list: list[dict[str, Any]],
+) -> list[str]:
+    """Create and start one execution per params set of an already validated graph.
+
+    State is written in pipelined chunks of ``BULK_CHUNK_SIZE`` executions and
+    all root tasks of a chunk are published over a single broker connection.
+    """
+    execution_ids: list[str] = []
+    chunk_size = max(1, settings.bulk_chunk_size)
+    for start in range(0, len(params_list), chunk_size):
+        chunk = {
+            str(uuid.uuid4()): params
+            for params in params_list[start : start + chunk_size]
+        }
+        tasks: list[tuple[str, str, dict[str, Any]]] = []
+        failures: dict[str, tuple[str, str]] = {}
+        for execution_id, params in chunk.items():
+            for node_id in graph.roots:
+                try:
+                    config = graph.plans[node_id].resolve({"params": params})
+                except ValueError as exc:
+                    failures[execution_id] = (node_id, str(exc))
+                    break
+                tasks.append((execution_id, node_id, config))
+
+        state.create_executions(definition, chunk, graph.roots)
+        for execution_id, (node_id, error) in failures.items():
+            fail_workflow(
+                execution_id, f"Template resolution failed for node {node_id}: {error}"
+            )
+            state.set_node_status(execution_id, node_id, NodeStatus.FAILED)
+
+        with celery_app.producer_or_acquire() as producer:
+            for execution_id, node_id, config in tasks:
+                if execution_id not in failures:
+                    _publish_node(
+                        execution_id, node_id, graph, config, producer=producer
+                    )
+        execution_ids.extend(chunk)
+    logger.info("Started %d executions of %s", len(execution_ids), definition.name)
+    return execution_ids
 
 
 def start_workflow(
@@ -71,30 +386,64 @@ def start_workflow(
 
 
 def on_node_success(
-    execution_id: str, node_id: str, output: dict[str, Any], graph: WorkflowGraph
+    execution_id: str,
+    node_id: str,
+    output: dict[str, Any] | bytes,
+    graph: WorkflowGraph,
+    fields: dict[str, bytes] | None = None,
+    depth: int = 0,
+    timing: str = "",
 ) -> None:
-    if state.get_workflow_status(execution_id) == WorkflowStatus.FAILED:
-        return
-    state.store_node_output(execution_id, node_id, output)
-    state.set_node_status(execution_id, node_id, NodeStatus.COMPLETED)
+    # Workflow completion is detected inside the script via the completed counter.
+    ready = state.complete_node(
+        execution_id,
+        node_id,
+        output,
+        graph.adjacency.get(node_id, []),
+        len(graph.nodes),
+        fields,
+        timing,
+    )
     logger.info("Node %s completed for workflow %s", node_id, execution_id)
+    if ready is None:
+        ready = _ready_without_counters(execution_id, node_id, graph)
 
-    # Dispatch downstream nodes that are now ready.
-    for child in graph.adjacency.get(node_id, []):
-        if is_node_ready(execution_id, child, graph):
-            dispatch_node_once(execution_id, child, graph)
+    # Dispatch downstream nodes whose last parent just completed.
+    if ready:
+        dispatch_ready_nodes(execution_id, ready, graph, depth)
 
-    # Check completion
-    node_statuses = state.list_node_statuses(
-        execution_id, definition=definition_from_graph(graph)
-    )
-    if all(status == NodeStatus.COMPLETED for status in node_statuses.values()):
+
+def _ready_without_counters(
+    execution_id: str, node_id: str, graph: WorkflowGraph
+) -> list[str]:
+    """Ready children of an execution started before the completion counters.
+
+    Reads every node status, as the engine did before the counters, and
+    completes the workflow once all nodes are COMPLETED. Each completion
+    script writes its node's status before this runs, so the last parent to
+    finish always sees its siblings done; the dispatch lock keeps concurrent
+    last parents from dispatching a child twice.
+    """
+    statuses = state.list_node_statuses(execution_id, graph.definition)
+    if all(status == NodeStatus.COMPLETED for status in statuses.values()):
         state.set_workflow_status(execution_id, WorkflowStatus.COMPLETED)
+        return []
+    return [
+        child
+        for child in graph.adjacency.get(node_id, [])
+        if statuses[child] == NodeStatus.PENDING
+        and all(
+            statuses[parent] == NodeStatus.COMPLETED for parent in graph.parents[child]
+        )
+        and state.acquire_dispatch_lock(execution_id, child)
+    ]
 
 
-def on_node_failure(execution_id: str, node_id: str, error: str) -> None:
+def on_node_failure(
+    execution_id: str, node_id: str, error: str, timing: str = ""
+) -> None:
     logger.error("Node %s failed for workflow %s: %s", node_id, execution_id, error)
-    state.set_node_status(execution_id, node_id, NodeStatus.FAILED)
+    state.set_node_status(execution_id, node_id, NodeStatus.FAILED, timing)
     fail_workflow(execution_id, error)
 
 
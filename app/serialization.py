@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any
+
+from kombu.serialization import register
+
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+class Serializer(ABC):
+    """Encodes payloads stored in Redis behind a one-byte format marker.
+
+    JSON text can never start with ``J``, ``M`` or the blob marker ``B``, so
+    values written before markers existed are still read as plain JSON.
+    """
+
+    name: str
+    marker: bytes
+    celery_name: str
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes: ...
+
+    @abstractmethod
+    def loads(self, raw: bytes) -> Any: ...
+
+
+class JsonSerializer(Serializer):
+    name = "json"
+    marker = b"J"
+    celery_name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode()
+
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class OrjsonSerializer(Serializer):
+    name = "orjson"
+    marker = b"J"
+    celery_name = "orjson"
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+
+class MsgpackSerializer(Serializer):
+    name = "msgpack"
+    marker = b"M"
+    celery_name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, raw: bytes) -> Any:
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+_REQUIREMENTS = {"orjson": lambda: orjson, "msgpack": lambda: msgpack}
+_SERIALIZERS = {
+    cls.name: cls for cls in (JsonSerializer, OrjsonSerializer, MsgpackSerializer)
+}
+
+
+def get_serializer(name: str | None = None) -> Serializer:
+    name = name or settings.serializer
+    if name not in _SERIALIZERS:
+        raise ValueError(f"Unknown serializer: {name}")
+    if name in _REQUIREMENTS and _REQUIREMENTS[name]() is None:
+        raise RuntimeError(f"Serializer {name} requires the {name} package")
+    return _SERIALIZERS[name]()
+
+
+def _reader(marker: bytes) -> Serializer:
+    if marker == MsgpackSerializer.marker:
+        return MsgpackSerializer()
+    return OrjsonSerializer() if orjson is not None else JsonSerializer()
+
+
+def encode(value: Any) -> bytes:
+    serializer = get_serializer()
+    return serializer.marker + serializer.dumps(value)
+
+
+def decode(raw: bytes | str) -> Any:
+    if isinstance(raw, str):
+        raw = raw.encode()
+    marker = raw[:1]
+    if marker in (JsonSerializer.marker, MsgpackSerializer.marker):
+        return _reader(marker).loads(raw[1:])
+    return _reader(JsonSerializer.marker).loads(raw)
+
+
+if orjson is not None:
+    register(
+        "orjson",
+        lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS),
+        orjson.loads,
+        content_type="application/x-orjson",
+        content_encoding="binary",
+    )
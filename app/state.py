@@ -1,27 +1,433 @@
 from __future__ import annotations
 
 import json
+import threading
+import time
+from collections.abc import Collection, Iterable, Iterator, Mapping
 from typing import Any
 import redis
 
+from app.blobstore import blob_digest, offload, resolve
 from app.config import settings
+from app.graph import (
+    WorkflowGraph,
+    compile_definition,
+    definition_digest,
+    graph_cache,
+)
 from app.models import NodeStatus, WorkflowDefinition, WorkflowStatus
+from app.serialization import decode, encode
 
 
 _redis_client: redis.Redis | None = None
+_payload_client: redis.Redis | None = None
+_scripts: dict[str, Any] = {}
+
+# Stores the output, marks the node COMPLETED and decrements each child's
+# remaining-parents counter in one round trip; returns the children that hit 0.
+# The per-execution completed counter flips the workflow to COMPLETED once it
+# reaches the node count, so completion detection is O(1).
+# The node's lease is released in the same step, and a completed workflow
+# enters the finished index that drives retention.
+# KEYS: workflow status, node status, node output, completed counter, output
+# fields hash, lease index, finished index, node timings hash, then one
+# remaining counter per child edge.
+# ARGV: serialized output, node count, layout, node id, events channel ('' to
+# skip publishing), the number F of field/value arguments, the F field/value
+# arguments, the lease member, the execution id, the current time, the node's
+# timing ('' to skip), then the child ids (ARGV[i + 2 + F] belongs to KEYS[i]).
+# With the "hash" layout the node and child ids are the hash fields; with the
+# "keys" layout every KEYS entry is a plain string.
+# Executions started before the counters existed have no completed counter;
+# for them the script records the node but returns -1 without touching any
+# counter, and the caller checks readiness from node statuses instead.
+# Retired executions (status key deleted or expiring) only lose the lease.
+COMPLETE_NODE_SCRIPT = """
+local hashed = ARGV[3] == 'hash'
+local node_id = ARGV[4]
+local channel = ARGV[5]
+local function read(key)
+    if hashed then
+        return redis.call('HGET', key, node_id)
+    end
+    return redis.call('GET', key)
+end
+local function write(key, value)
+    if hashed then
+        redis.call('HSET', key, node_id, value)
+    else
+        redis.call('SET', key, value)
+    end
+end
+local field_args = tonumber(ARGV[6])
+if redis.call('PTTL', KEYS[1]) ~= -1 then
+    redis.call('ZREM', KEYS[6], ARGV[7 + field_args])
+    return {}
+end
+if redis.call('GET', KEYS[1]) == 'FAILED' then
+    return {}
+end
+if read(KEYS[2]) == 'COMPLETED' then
+    return {}
+end
+write(KEYS[3], ARGV[1])
+if field_args > 0 then
+    redis.call('HSET', KEYS[5], unpack(ARGV, 7, 6 + field_args))
+end
+write(KEYS[2], 'COMPLETED')
+redis.call('ZREM', KEYS[6], ARGV[7 + field_args])
+if ARGV[10 + field_args] ~= '' then
+    redis.call('HSET', KEYS[8], node_id, ARGV[10 + field_args])
+end
+if channel ~= '' then
+    redis.call('PUBLISH', channel,
+        '{"type": "node", "node_id": "' .. node_id .. '", "status": "COMPLETED"}')
+end
+if redis.call('EXISTS', KEYS[4]) == 0 then
+    return -1
+end
+if redis.call('INCR', KEYS[4]) == tonumber(ARGV[2]) then
+    redis.call('SET', KEYS[1], 'COMPLETED')
+    redis.call('ZADD', KEYS[7], ARGV[9 + field_args], ARGV[8 + field_args])
+    if channel ~= '' then
+        redis.call('PUBLISH', channel, '{"type": "workflow", "status": "COMPLETED"}')
+    end
+end
+local ready = {}
+for i = 9, #KEYS do
+    local child = ARGV[i + 2 + field_args]
+    local remaining
+    if hashed then
+        remaining = redis.call('HINCRBY', KEYS[i], child, -1)
+    else
+        remaining = redis.call('DECR', KEYS[i])
+    end
+    if remaining == 0 then
+        ready[#ready + 1] = child
+    end
+end
+return ready
+"""
+
+# Claims up to ARGV[2] leases that expired by ARGV[1] by pushing their deadline
+# to ARGV[3], so concurrent reapers never recover the same node twice.
+# KEYS: lease index.
+CLAIM_LEASES_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(expired) do
+    redis.call('ZADD', KEYS[1], ARGV[3], member)
+end
+return expired
+"""
+
+# Params plus parent outputs for a dispatch. Per parent, KEYS holds the output
+# key, its per-node fallback and the output fields hash; ARGV holds the node
+# id, the number of requested fields and their names. A parent whose fields are
+# all stored comes back as 'F' + values. A split output read whole comes back as
+# 'S' + its marker + the length and items of its fields hash, any other as
+# 'O' + the whole output.
+READ_INPUTS_SCRIPT = """
+local hashed = ARGV[1] == 'hash'
+local result = {redis.call('GET', KEYS[1])}
+local arg = 2
+for k = 2, #KEYS, 3 do
+    local node_id = ARGV[arg]
+    local count = tonumber(ARGV[arg + 1])
+    local values = {}
+    if count > 0 then
+        values = redis.call('HMGET', KEYS[k + 2], unpack(ARGV, arg + 2, arg + 1 + count))
+    end
+    arg = arg + 2 + count
+    local projected = count > 0
+    for j = 1, count do
+        if not values[j] then
+            projected = false
+        end
+    end
+    if projected then
+        result[#result + 1] = 'F'
+        for j = 1, count do
+            result[#result + 1] = values[j]
+        end
+    else
+        local output = false
+        if hashed then
+            output = redis.call('HGET', KEYS[k], node_id)
+        end
+        if not output then
+            output = redis.call('GET', KEYS[k + 1])
+        end
+        if output and string.sub(output, 1, 1) == 'S' then
+            local stored = redis.call('HGETALL', KEYS[k + 2])
+            result[#result + 1] = 'S'
+            result[#result + 1] = output
+            result[#result + 1] = #stored
+            for j = 1, #stored do
+                result[#result + 1] = stored[j]
+            end
+        else
+            result[#result + 1] = 'O'
+            result[#result + 1] = output
+        end
+    end
+end
+return result
+"""
+
+# Sorted set of COMPLETED/FAILED executions by finish time, drained by the
+# retention job in app.archive.
+FINISHED_EXECUTIONS_KEY = "wf:finished"
+
+# Blobs are content-addressed and shared across executions. Each execution
+# lists the blobs its outputs refer to in ``wf:{id}:blobs``; this hash counts
+# the executions per blob. Blobs that lose their last reference wait in the
+# orphaned index, scored by when they may be deleted.
+BLOB_REFS_KEY = "wf:blobs:refs"
+ORPHANED_BLOBS_KEY = "wf:blobs:orphaned"
+
+# Adds digests to an execution's blob references, counting each new one. A
+# retired execution takes no references; its unreferenced blobs are orphaned.
+# KEYS: workflow status, execution blobs set, refs hash, orphaned index.
+# ARGV: now, then the digests.
+REGISTER_BLOBS_SCRIPT = """
+local retired = redis.call('PTTL', KEYS[1]) ~= -1
+for i = 2, #ARGV do
+    if retired then
+        if not redis.call('HGET', KEYS[3], ARGV[i]) then
+            redis.call('ZADD', KEYS[4], 'NX', ARGV[1], ARGV[i])
+        end
+    elseif redis.call('SADD', KEYS[2], ARGV[i]) == 1 then
+        redis.call('HINCRBY', KEYS[3], ARGV[i], 1)
+    end
+end
+return 0
+"""
+
+# Drops an execution's blob references. Blobs left without any are orphaned,
+# to be deleted from ARGV[1] on. Returns how many were orphaned.
+# KEYS: execution blobs set, refs hash, orphaned index.
+RELEASE_BLOBS_SCRIPT = """
+local orphaned = 0
+for _, digest in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if redis.call('HINCRBY', KEYS[2], digest, -1) <= 0 then
+        redis.call('HDEL', KEYS[2], digest)
+        redis.call('ZADD', KEYS[3], ARGV[1], digest)
+        orphaned = orphaned + 1
+    end
+end
+redis.call('DEL', KEYS[1])
+return orphaned
+"""
+
+# Claims up to ARGV[2] orphans due by ARGV[1]. Ones referenced again since
+# leave the index without being returned.
+# KEYS: orphaned index, refs hash.
+CLAIM_ORPHANED_BLOBS_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local claimed = {}
+for _, digest in ipairs(due) do
+    redis.call('ZREM', KEYS[1], digest)
+    if not redis.call('HGET', KEYS[2], digest) then
+        claimed[#claimed + 1] = digest
+    end
+end
+return claimed
+"""
+
+# Sorted set of RUNNING nodes ("{execution_id}:{node_id}") by lease deadline:
+# NODE_DISPATCH_TTL while queued, NODE_LEASE_TTL once a worker started them.
+NODE_LEASES_KEY = "wf:leases"
+
+# Dict outputs with more top-level fields than this are never split.
+MAX_OUTPUT_FIELDS = 256
+
+# A split output's value holds this marker and its field names; the fields
+# themselves live only in its output fields hash.
+SPLIT_MARKER = b"S"
+
+
+def pool_options() -> dict[str, Any]:
+    """Connection pool settings shared by the sync and asyncio clients.
+
+    Both use a ``BlockingConnectionPool``: callers past ``REDIS_POOL_SIZE``
+    wait up to ``REDIS_POOL_TIMEOUT`` seconds for a free connection instead of
+    failing at once with "Too many connections".
+    """
+    return {
+        "max_connections": settings.redis_pool_size,
+        "timeout": settings.redis_pool_timeout,
+        "socket_timeout": settings.redis_socket_timeout,
+        "socket_connect_timeout": settings.redis_connect_timeout,
+        "health_check_interval": settings.redis_health_check_interval,
+    }
+
+
+_round_trips = threading.local()
+
+
+def redis_round_trips() -> int:
+    """Round trips this thread has made through the sync clients so far."""
+    return getattr(_round_trips, "count", 0)
+
+
+def _count_round_trip() -> None:
+    _round_trips.count = getattr(_round_trips, "count", 0) + 1
+
+
+class _CountingPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error: bool = True) -> list[Any]:
+        if self.command_stack:
+            _count_round_trip()
+        return super().execute(raise_on_error)
+
+
+class CountingRedis(redis.Redis):
+    """Sync client that counts round trips per thread for the node metrics.
+
+    Direct commands and script calls count one each; a pipeline counts once
+    when executed.
+    """
+
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        _count_round_trip()
+        return super().execute_command(*args, **options)
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: str | None = None
+    ) -> _CountingPipeline:
+        return _CountingPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
 
 
 def get_redis() -> redis.Redis:
     global _redis_client
     if _redis_client is None:
-        _redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+        _redis_client = CountingRedis.from_pool(
+            redis.BlockingConnectionPool.from_url(
+                settings.redis_url, decode_responses=True, **pool_options()
+            )
+        )
     return _redis_client
 
 
+def get_payload_redis() -> redis.Redis:
+    """Client without response decoding, for serialized outputs and params."""
+    global _payload_client
+    if _payload_client is None:
+        _payload_client = CountingRedis.from_pool(
+            redis.BlockingConnectionPool.from_url(settings.redis_url, **pool_options())
+        )
+    return _payload_client
+
+
+def _script(source: str) -> Any:
+    script = _scripts.get(source)
+    if script is None or script.registered_client is not get_redis():
+        script = get_redis().register_script(source)
+        _scripts[source] = script
+    return script
+
+
+def encode_payload(value: Any) -> bytes:
+    """Serialize a node output, offloading it to the blob store when large."""
+    return offload(encode(value))
+
+
+def decode_payload(raw: bytes | str) -> Any:
+    return decode(resolve(raw))
+
+
+def encode_output(output: Any) -> tuple[bytes, dict[str, bytes]]:
+    """Encode a node output, split into per-field entries when large.
+
+    Dict outputs larger than ``OUTPUT_FIELD_THRESHOLD`` are stored field by
+    field, so a template reading ``{{ a.data.id }}`` fetches and decodes only
+    ``data``. The payload is then just ``SPLIT_MARKER`` and the field names;
+    whole reads join the fields back (``join_split_output``).
+    """
+    payload = encode(output)
+    threshold = settings.output_field_threshold
+    if (
+        isinstance(output, dict)
+        and 0 < threshold < len(payload)
+        and len(output) <= MAX_OUTPUT_FIELDS
+        and all(isinstance(key, str) for key in output)
+    ):
+        fields = {key: encode_payload(value) for key, value in output.items()}
+        return SPLIT_MARKER + encode(list(output)), fields
+    return offload(payload), {}
+
+
+def is_split_output(raw: Any) -> bool:
+    return isinstance(raw, bytes) and raw[:1] == SPLIT_MARKER
+
+
+def join_split_output(raw: bytes, stored: Mapping[Any, bytes]) -> dict[str, Any]:
+    """Rebuild a split output from its marker and its fields hash."""
+    values = {
+        name.decode() if isinstance(name, bytes) else name: value
+        for name, value in stored.items()
+    }
+    return {name: decode_payload(values[name]) for name in decode(raw[1:])}
+
+
+def _decode_outputs(
+    execution_id: str, node_ids: list[str], raw_outputs: list[Any]
+) -> list[Any]:
+    """Decode stored outputs; split ones take one more batched read."""
+    split = [
+        node_id for node_id, raw in zip(node_ids, raw_outputs) if is_split_output(raw)
+    ]
+    stored: dict[str, Any] = {}
+    if split:
+        pipe = get_payload_redis().pipeline(transaction=False)
+        for node_id in split:
+            pipe.hgetall(node_output_fields_key(execution_id, node_id))
+        stored = dict(zip(split, pipe.execute()))
+    return [
+        (
+            join_split_output(raw, stored[node_id])
+            if node_id in stored
+            else decode_payload(raw) if raw else None
+        )
+        for node_id, raw in zip(node_ids, raw_outputs)
+    ]
+
+
+class LazyPayloads(Mapping[str, Any]):
+    """Node outputs that are decoded (and fetched from blobs) on first access."""
+
+    def __init__(
+        self, raw: dict[str, Any], decoded: dict[str, Any] | None = None
+    ) -> None:
+        self._raw = raw
+        self._decoded = {} if decoded is None else decoded
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._decoded:
+            raw = self._raw[key]
+            self._decoded[key] = decode_payload(raw) if raw else None
+        return self._decoded[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def subset(self, keys: Iterable[str]) -> LazyPayloads:
+        return LazyPayloads({key: self._raw[key] for key in keys}, self._decoded)
+
+
 def workflow_definition_key(execution_id: str) -> str:
     return f"wf:{execution_id}:definition"
 
 
+def registered_definition_key(definition_id: str) -> str:
+    return f"wf:definitions:{definition_id}"
+
+
 def workflow_status_key(execution_id: str) -> str:
     return f"wf:{execution_id}:status"
 
@@ -34,35 +440,277 @@ def node_output_key(execution_id: str, node_id: str) -> str:
     return f"wf:{execution_id}:node:{node_id}:output"
 
 
+def node_output_fields_key(execution_id: str, node_id: str) -> str:
+    return f"wf:{execution_id}:node:{node_id}:output_fields"
+
+
 def dispatch_lock_key(execution_id: str, node_id: str) -> str:
     return f"wf:{execution_id}:node:{node_id}:lock"
 
 
+def remaining_parents_key(execution_id: str, node_id: str) -> str:
+    return f"wf:{execution_id}:node:{node_id}:remaining"
+
+
+def node_statuses_key(execution_id: str) -> str:
+    return f"wf:{execution_id}:node_statuses"
+
+
+def node_outputs_key(execution_id: str) -> str:
+    return f"wf:{execution_id}:node_outputs"
+
+
+def remaining_parents_hash_key(execution_id: str) -> str:
+    return f"wf:{execution_id}:remaining"
+
+
+def completed_count_key(execution_id: str) -> str:
+    return f"wf:{execution_id}:completed"
+
+
 def errors_key(execution_id: str) -> str:
     return f"wf:{execution_id}:errors"
 
 
+def events_channel(execution_id: str) -> str:
+    return f"wf:{execution_id}:events"
+
+
+def node_event(node_id: str, status: NodeStatus) -> str:
+    return json.dumps({"type": "node", "node_id": node_id, "status": status.value})
+
+
+def workflow_event(status: WorkflowStatus) -> str:
+    return json.dumps({"type": "workflow", "status": status.value})
+
+
+def queue_workflow_status(pipe: Any, execution_id: str, status: WorkflowStatus) -> None:
+    pipe.set(workflow_status_key(execution_id), status.value)
+    if settings.publish_events:
+        pipe.publish(events_channel(execution_id), workflow_event(status))
+    if status in (WorkflowStatus.COMPLETED, WorkflowStatus.FAILED):
+        pipe.zadd(FINISHED_EXECUTIONS_KEY, {execution_id: time.time()})
+    elif status == WorkflowStatus.RUNNING:
+        # A re-triggered execution is live again.
+        pipe.zrem(FINISHED_EXECUTIONS_KEY, execution_id)
+
+
 def params_key(execution_id: str) -> str:
     return f"wf:{execution_id}:params"
 
 
-def set_workflow_definition(execution_id: str, definition: WorkflowDefinition) -> None:
-    redis_client = get_redis()
-    redis_client.set(
-        workflow_definition_key(execution_id), definition.model_dump_json()
+def node_attempts_key(execution_id: str) -> str:
+    return f"wf:{execution_id}:attempts"
+
+
+def node_timings_key(execution_id: str) -> str:
+    return f"wf:{execution_id}:timings"
+
+
+def execution_blobs_key(execution_id: str) -> str:
+    return f"wf:{execution_id}:blobs"
+
+
+def encode_timing(*timestamps: float) -> str:
+    """Epoch seconds as comma-separated integer milliseconds."""
+    return ",".join(str(int(timestamp * 1000)) for timestamp in timestamps)
+
+
+def decode_timing(raw: str | None) -> list[float]:
+    return [int(value) / 1000 for value in raw.split(",")] if raw else []
+
+
+def lease_member(execution_id: str, node_id: str) -> str:
+    return f"{execution_id}:{node_id}"
+
+
+def parse_lease_member(member: str) -> tuple[str, str]:
+    execution_id, node_id = member.split(":", 1)
+    return execution_id, node_id
+
+
+# Per-node values live either in one string key per node ("keys" layout) or in
+# one hash per execution keyed by node id ("hash" layout, see STATE_LAYOUT).
+_NODE_KEYS = {
+    "status": (node_status_key, node_statuses_key),
+    "output": (node_output_key, node_outputs_key),
+    "remaining": (remaining_parents_key, remaining_parents_hash_key),
+}
+
+
+def _hashed() -> bool:
+    return settings.state_layout == "hash"
+
+
+def _node_key(kind: str, execution_id: str, node_id: str) -> str:
+    per_node_key, hash_key = _NODE_KEYS[kind]
+    return hash_key(execution_id) if _hashed() else per_node_key(execution_id, node_id)
+
+
+def _queue_node_write(
+    pipe: Any, kind: str, execution_id: str, node_id: str, value: Any
+) -> None:
+    if _hashed():
+        pipe.hset(_NODE_KEYS[kind][1](execution_id), node_id, value)
+    else:
+        pipe.set(_NODE_KEYS[kind][0](execution_id, node_id), value)
+
+
+def _queue_node_reads(
+    pipe: Any, kind: str, execution_id: str, node_ids: list[str]
+) -> None:
+    if not node_ids:
+        return
+    if _hashed():
+        pipe.hmget(_NODE_KEYS[kind][1](execution_id), node_ids)
+        # Executions written before the hash layout keep a status key per node.
+        pipe.exists(node_status_key(execution_id, node_ids[0]))
+        return
+    for node_id in node_ids:
+        pipe.get(_NODE_KEYS[kind][0](execution_id, node_id))
+
+
+def _queue_legacy_node_reads(
+    pipe: Any, kind: str, execution_id: str, node_ids: list[str]
+) -> None:
+    for node_id in node_ids:
+        pipe.get(_NODE_KEYS[kind][0](execution_id, node_id))
+
+
+def _unpack_node_values(
+    node_ids: list[str], results: list[Any]
+) -> tuple[list[Any], list[str]]:
+    """Unpack the reads queued by ``_queue_node_reads``.
+
+    Also returns the nodes to read from per-node keys instead: those missing
+    from the hash of an execution that still uses the per-node layout.
+    """
+    if not node_ids:
+        return [], []
+    if not _hashed():
+        return results, []
+    values, legacy = results
+    if not legacy:
+        return values, []
+    return values, [node for node, value in zip(node_ids, values) if value is None]
+
+
+def _merge_legacy_values(
+    node_ids: list[str], values: list[Any], missing: list[str], legacy: list[Any]
+) -> list[Any]:
+    found = dict(zip(missing, legacy))
+    return [
+        found.get(node_id) if value is None else value
+        for node_id, value in zip(node_ids, values)
+    ]
+
+
+def _node_values(
+    kind: str,
+    execution_id: str,
+    node_ids: list[str],
+    results: list[Any],
+    client: redis.Redis | None = None,
+) -> list[Any]:
+    values, missing = _unpack_node_values(node_ids, results)
+    if not missing:
+        return values
+    # Compat reader: executions written before switching to the hash layout.
+    pipe = (client or get_redis()).pipeline()
+    _queue_legacy_node_reads(pipe, kind, execution_id, missing)
+    return _merge_legacy_values(node_ids, values, missing, pipe.execute())
+
+
+def _read_node_values(
+    kind: str,
+    execution_id: str,
+    node_ids: list[str],
+    client: redis.Redis | None = None,
+) -> list[Any]:
+    client = client or get_redis()
+    pipe = client.pipeline()
+    _queue_node_reads(pipe, kind, execution_id, node_ids)
+    return _node_values(kind, execution_id, node_ids, pipe.execute(), client)
+
+
+# Executions point at a registered definition with "ref:<definition_id>".
+# Executions created before the registry hold the definition JSON inline.
+DEFINITION_REF_PREFIX = "ref:"
+
+
+def get_registered_definition_raw(definition_id: str) -> str | None:
+    return get_redis().get(registered_definition_key(definition_id))
+
+
+def set_workflow_definition(execution_id: str, definition: WorkflowDefinition) -> str:
+    """Register the definition and point the execution at it; returns its id."""
+    raw = definition.model_dump_json()
+    definition_id = definition_digest(raw)
+    pipe = get_redis().pipeline()
+    pipe.set(registered_definition_key(definition_id), raw, nx=True)
+    pipe.set(workflow_definition_key(execution_id), definition_ref(definition_id))
+    pipe.execute()
+    return definition_id
+
+
+def set_execution_definition(execution_id: str, definition_id: str) -> None:
+    get_redis().set(
+        workflow_definition_key(execution_id), definition_ref(definition_id)
     )
 
 
+def definition_ref(definition_id: str) -> str:
+    return f"{DEFINITION_REF_PREFIX}{definition_id}"
+
+
+def get_definition_pointer(execution_id: str) -> str | None:
+    return get_redis().get(workflow_definition_key(execution_id))
+
+
+def pointer_definition_id(pointer: str) -> str:
+    if pointer.startswith(DEFINITION_REF_PREFIX):
+        return pointer[len(DEFINITION_REF_PREFIX) :]
+    return definition_digest(pointer)
+
+
+def resolve_definition_pointer(pointer: str) -> str | None:
+    if pointer.startswith(DEFINITION_REF_PREFIX):
+        return get_registered_definition_raw(pointer_definition_id(pointer))
+    return pointer
+
+
+def cached_graph(pointer: str) -> tuple[WorkflowGraph | None, str]:
+    """The graph a definition pointer names, as far as it resolves without I/O.
+
+    Shared by the sync and async ``load_workflow_graph``. Returns the graph and
+    its definition id; the graph is None only for a registered definition not
+    yet in the process cache, which the caller fetches and compiles.
+    """
+    definition_id = pointer_definition_id(pointer)
+    graph = graph_cache.get(definition_id)
+    if graph is None and not pointer.startswith(DEFINITION_REF_PREFIX):
+        graph = compile_definition(definition_id, pointer)
+    return graph, definition_id
+
+
 def get_workflow_definition(execution_id: str) -> WorkflowDefinition | None:
-    redis_client = get_redis()
-    raw = redis_client.get(workflow_definition_key(execution_id))
+    raw = get_workflow_definition_raw(execution_id)
     if not raw:
         return None
     return WorkflowDefinition.model_validate_json(raw)
 
 
+def get_workflow_definition_raw(execution_id: str) -> str | None:
+    pointer = get_definition_pointer(execution_id)
+    if not pointer:
+        return None
+    return resolve_definition_pointer(pointer)
+
+
 def set_workflow_status(execution_id: str, status: WorkflowStatus) -> None:
-    get_redis().set(workflow_status_key(execution_id), status.value)
+    pipe = get_redis().pipeline()
+    queue_workflow_status(pipe, execution_id, status)
+    pipe.execute()
 
 
 def get_workflow_status(execution_id: str) -> WorkflowStatus | None:
@@ -70,46 +718,417 @@ def get_workflow_status(execution_id: str) -> WorkflowStatus | None:
     return WorkflowStatus(raw) if raw else None
 
 
-def set_node_status(execution_id: str, node_id: str, status: NodeStatus) -> None:
-    get_redis().set(node_status_key(execution_id, node_id), status.value)
+def set_node_status(
+    execution_id: str, node_id: str, status: NodeStatus, timing: str = ""
+) -> None:
+    set_node_statuses(execution_id, [node_id], status, {node_id: timing})
 
 
 def get_node_status(execution_id: str, node_id: str) -> NodeStatus | None:
-    raw = get_redis().get(node_status_key(execution_id, node_id))
+    (raw,) = _read_node_values("status", execution_id, [node_id])
     return NodeStatus(raw) if raw else None
 
 
+def start_node_run(
+    execution_id: str, node_id: str
+) -> tuple[NodeStatus | None, float | None]:
+    """Start a published node's lease; returns its status and enqueue time.
+
+    The queued node's long dispatch lease becomes a ``NODE_LEASE_TTL`` one that
+    the worker's heartbeat renews. ``ZADD XX`` leaves finished nodes without
+    one. All in one round trip.
+    """
+    client = get_redis()
+    pipe = client.pipeline()
+    pipe.zadd(
+        NODE_LEASES_KEY,
+        {lease_member(execution_id, node_id): time.time() + settings.node_lease_ttl},
+        xx=True,
+    )
+    pipe.hget(node_timings_key(execution_id), node_id)
+    _queue_node_reads(pipe, "status", execution_id, [node_id])
+    _, timing, *results = pipe.execute()
+    (raw,) = _node_values("status", execution_id, [node_id], results, client)
+    enqueued = decode_timing(timing)
+    return NodeStatus(raw) if raw else None, enqueued[0] if enqueued else None
+
+
+def get_node_timings(execution_id: str) -> dict[str, list[float]]:
+    """Per node: enqueued, then started and finished once its handler ran."""
+    raw = get_redis().hgetall(node_timings_key(execution_id))
+    return {node_id: decode_timing(timing) for node_id, timing in raw.items()}
+
+
 def init_workflow_state(
     execution_id: str, definition: WorkflowDefinition, params: dict[str, Any]
 ) -> None:
     redis_client = get_redis()
     pipe = redis_client.pipeline()
-    pipe.set(workflow_status_key(execution_id), WorkflowStatus.RUNNING.value)
-    pipe.set(params_key(execution_id), json.dumps(params))
+    queue_workflow_status(pipe, execution_id, WorkflowStatus.RUNNING)
+    pipe.set(params_key(execution_id), encode(params))
+    pipe.set(completed_count_key(execution_id), 0)
+    if _hashed():
+        for key in (
+            node_statuses_key(execution_id),
+            node_outputs_key(execution_id),
+            remaining_parents_hash_key(execution_id),
+        ):
+            pipe.delete(key)
     for node in definition.dag.nodes:
-        pipe.set(node_status_key(execution_id, node.id), NodeStatus.PENDING.value)
-        pipe.delete(node_output_key(execution_id, node.id))
+        _queue_node_write(
+            pipe, "status", execution_id, node.id, NodeStatus.PENDING.value
+        )
+        _queue_node_write(
+            pipe, "remaining", execution_id, node.id, len(node.dependencies)
+        )
+        if not _hashed():
+            pipe.delete(node_output_key(execution_id, node.id))
+        pipe.delete(node_output_fields_key(execution_id, node.id))
         pipe.delete(dispatch_lock_key(execution_id, node.id))
     pipe.delete(errors_key(execution_id))
+    pipe.delete(node_attempts_key(execution_id))
+    pipe.delete(node_timings_key(execution_id))
+    pipe.execute()
+
+
+def create_executions(
+    definition: WorkflowDefinition,
+    params_by_execution: dict[str, dict[str, Any]],
+    running_nodes: list[str],
+) -> None:
+    """Persist fresh executions of one definition in a single pipeline.
+
+    Every execution starts RUNNING with ``running_nodes`` already marked RUNNING
+    (their tasks are published by the caller); all other nodes are PENDING.
+    """
+    raw_definition = definition.model_dump_json()
+    pointer = definition_ref(definition_digest(raw_definition))
+    statuses = {node.id: NodeStatus.PENDING.value for node in definition.dag.nodes}
+    statuses.update({node_id: NodeStatus.RUNNING.value for node_id in running_nodes})
+    remaining = {node.id: len(node.dependencies) for node in definition.dag.nodes}
+    now = time.time()
+    deadline = now + settings.node_dispatch_ttl
+    enqueued = dict.fromkeys(running_nodes, encode_timing(now))
+
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.set(
+        registered_definition_key(pointer[len(DEFINITION_REF_PREFIX) :]),
+        raw_definition,
+        nx=True,
+    )
+    for execution_id, params in params_by_execution.items():
+        pipe.mset(
+            {
+                workflow_definition_key(execution_id): pointer,
+                workflow_status_key(execution_id): WorkflowStatus.RUNNING.value,
+                params_key(execution_id): encode(params),
+                completed_count_key(execution_id): 0,
+            }
+        )
+        if running_nodes:
+            pipe.zadd(
+                NODE_LEASES_KEY,
+                {lease_member(execution_id, node): deadline for node in running_nodes},
+            )
+            if settings.node_metrics:
+                pipe.hset(node_timings_key(execution_id), mapping=enqueued)
+        if _hashed():
+            pipe.hset(node_statuses_key(execution_id), mapping=statuses)
+            pipe.hset(remaining_parents_hash_key(execution_id), mapping=remaining)
+            continue
+        mapping = {}
+        for node_id, status in statuses.items():
+            mapping[node_status_key(execution_id, node_id)] = status
+            mapping[remaining_parents_key(execution_id, node_id)] = remaining[node_id]
+        pipe.mset(mapping)
     pipe.execute()
 
 
 def get_params(execution_id: str) -> dict[str, Any]:
-    raw = get_redis().get(params_key(execution_id))
+    raw = get_payload_redis().get(params_key(execution_id))
     if not raw:
         return {}
-    return json.loads(raw)
+    return decode(raw)
 
 
 def store_node_output(execution_id: str, node_id: str, output: dict[str, Any]) -> None:
-    get_redis().set(node_output_key(execution_id, node_id), json.dumps(output))
+    payload = encode_payload(output)
+    pipe = get_redis().pipeline()
+    _queue_blob_references(pipe, execution_id, [payload])
+    _queue_node_write(pipe, "output", execution_id, node_id, payload)
+    pipe.execute()
 
 
 def get_node_output(execution_id: str, node_id: str) -> dict[str, Any] | None:
-    raw = get_redis().get(node_output_key(execution_id, node_id))
-    if not raw:
+    raw = _read_node_values("output", execution_id, [node_id], get_payload_redis())
+    (output,) = _decode_outputs(execution_id, [node_id], raw)
+    return output
+
+
+def complete_node(
+    execution_id: str,
+    node_id: str,
+    output: dict[str, Any] | bytes,
+    children: list[str],
+    node_count: int,
+    fields: dict[str, bytes] | None = None,
+    timing: str = "",
+) -> list[str] | None:
+    """Atomically persist a node result and return the children it made ready.
+
+    ``output`` may already be encoded with ``encode_output``, in which case its
+    per-field entries are passed as ``fields``. ``timing`` (``encode_timing``
+    of enqueued, started and finished) is stored with it. Returns None for an
+    execution started without counters (see ``COMPLETE_NODE_SCRIPT``).
+    """
+    if not isinstance(output, bytes):
+        output, fields = encode_output(output)
+    keys, args = _complete_node_call(
+        execution_id, node_id, output, fields, children, node_count, timing
+    )
+    payloads = [output, *(fields or {}).values()]
+    if not any(blob_digest(payload) for payload in payloads):
+        return _ready_children(_script(COMPLETE_NODE_SCRIPT)(keys=keys, args=args))
+    pipe = get_redis().pipeline()
+    _queue_blob_references(pipe, execution_id, payloads)
+    _script(COMPLETE_NODE_SCRIPT)(keys=keys, args=args, client=pipe)
+    return _ready_children(pipe.execute()[-1])
+
+
+def complete_nodes(
+    execution_id: str,
+    completions: list[tuple[str, bytes, dict[str, bytes], list[str], str]],
+    node_count: int,
+) -> list[list[str] | None]:
+    """Run the completion script for several encoded outputs in one MULTI/EXEC.
+
+    ``completions`` holds ``(node_id, payload, fields, children, timing)``
+    tuples; the ready children of each (as ``complete_node`` returns them) come
+    back in the same order.
+    """
+    script = _script(COMPLETE_NODE_SCRIPT)
+    pipe = get_redis().pipeline()
+    _queue_blob_references(
+        pipe,
+        execution_id,
+        [
+            payload
+            for _, output, fields, _, _ in completions
+            for payload in [output, *fields.values()]
+        ],
+    )
+    for node_id, payload, fields, children, timing in completions:
+        keys, args = _complete_node_call(
+            execution_id, node_id, payload, fields, children, node_count, timing
+        )
+        script(keys=keys, args=args, client=pipe)
+    results = pipe.execute()[-len(completions) :] if completions else []
+    return [_ready_children(ready) for ready in results]
+
+
+def _queue_blob_references(
+    pipe: Any, execution_id: str, payloads: Iterable[bytes]
+) -> None:
+    """Queue the blob references among ``payloads`` for the execution, if any."""
+    digests = sorted({digest for raw in payloads if (digest := blob_digest(raw))})
+    if not digests:
+        return
+    _script(REGISTER_BLOBS_SCRIPT)(
+        keys=[
+            workflow_status_key(execution_id),
+            execution_blobs_key(execution_id),
+            BLOB_REFS_KEY,
+            ORPHANED_BLOBS_KEY,
+        ],
+        args=[time.time(), *digests],
+        client=pipe,
+    )
+
+
+def release_execution_blobs(execution_id: str, orphan_at: float) -> int:
+    """Drop a retired execution's blob references; returns how many orphaned."""
+    return _script(RELEASE_BLOBS_SCRIPT)(
+        keys=[execution_blobs_key(execution_id), BLOB_REFS_KEY, ORPHANED_BLOBS_KEY],
+        args=[orphan_at],
+    )
+
+
+def claim_orphaned_blobs(due_by: float, limit: int) -> list[str]:
+    """Digests of blobs orphaned by ``due_by`` and still unreferenced."""
+    return list(
+        _script(CLAIM_ORPHANED_BLOBS_SCRIPT)(
+            keys=[ORPHANED_BLOBS_KEY, BLOB_REFS_KEY], args=[due_by, limit]
+        )
+        or []
+    )
+
+
+def orphan_blobs(digests: list[str], at: float) -> None:
+    """Queue blobs for deletion again, e.g. ones reused since they were claimed."""
+    if digests:
+        get_redis().zadd(ORPHANED_BLOBS_KEY, dict.fromkeys(digests, at))
+
+
+def _ready_children(result: Any) -> list[str] | None:
+    if isinstance(result, int) and result < 0:
         return None
-    return json.loads(raw)
+    return list(result or [])
+
+
+def _complete_node_call(
+    execution_id: str,
+    node_id: str,
+    payload: bytes,
+    fields: dict[str, bytes] | None,
+    children: list[str],
+    node_count: int,
+    timing: str,
+) -> tuple[list[str], list[Any]]:
+    field_args = [item for pair in (fields or {}).items() for item in pair]
+    keys = [
+        workflow_status_key(execution_id),
+        _node_key("status", execution_id, node_id),
+        _node_key("output", execution_id, node_id),
+        completed_count_key(execution_id),
+        node_output_fields_key(execution_id, node_id),
+        NODE_LEASES_KEY,
+        FINISHED_EXECUTIONS_KEY,
+        node_timings_key(execution_id),
+    ]
+    keys.extend(_node_key("remaining", execution_id, child) for child in children)
+    channel = events_channel(execution_id) if settings.publish_events else ""
+    args = [payload, node_count, settings.state_layout, node_id, channel]
+    args.extend([len(field_args), *field_args, lease_member(execution_id, node_id)])
+    return keys, [*args, execution_id, time.time(), timing, *children]
+
+
+def get_dispatch_inputs(
+    execution_id: str,
+    parent_ids: list[str],
+    fields: Mapping[str, Collection[str]] | None = None,
+) -> tuple[dict[str, Any], LazyPayloads]:
+    """Fetch trigger params and the given parents' outputs in one round trip.
+
+    Parents listed in ``fields`` are read through just those top-level fields
+    when the output was stored split; their mapping then holds only them.
+    """
+    fields = fields or {}
+    keys = [params_key(execution_id)]
+    args: list[Any] = [settings.state_layout]
+    for parent_id in parent_ids:
+        names = list(fields.get(parent_id, ()))
+        keys.extend(
+            [
+                _node_key("output", execution_id, parent_id),
+                node_output_key(execution_id, parent_id),
+                node_output_fields_key(execution_id, parent_id),
+            ]
+        )
+        args.extend([parent_id, len(names), *names])
+    raw_params, *results = _script(READ_INPUTS_SCRIPT)(
+        keys=keys, args=args, client=get_payload_redis()
+    )
+    raw_outputs: dict[str, Any] = {}
+    projected: dict[str, Any] = {}
+    position = 0
+    for parent_id in parent_ids:
+        tag = results[position]
+        if tag in (b"F", "F"):
+            names = list(fields[parent_id])
+            values = results[position + 1 : position + 1 + len(names)]
+            projected[parent_id] = {
+                name: decode_payload(raw) for name, raw in zip(names, values)
+            }
+            raw_outputs[parent_id] = b""
+            position += 1 + len(names)
+        elif tag in (b"S", "S"):
+            count = int(results[position + 2])
+            items = results[position + 3 : position + 3 + count]
+            projected[parent_id] = join_split_output(
+                results[position + 1], dict(zip(items[::2], items[1::2]))
+            )
+            raw_outputs[parent_id] = b""
+            position += 3 + count
+        else:
+            raw_outputs[parent_id] = results[position + 1]
+            position += 2
+    params = decode(raw_params) if raw_params else {}
+    return params, LazyPayloads(raw_outputs, projected)
+
+
+def get_node_outputs(execution_id: str, node_ids: list[str]) -> dict[str, Any]:
+    """Decoded outputs of the given nodes, fetched in one batched read."""
+    raw_outputs = _read_node_values(
+        "output", execution_id, node_ids, get_payload_redis()
+    )
+    return dict(zip(node_ids, _decode_outputs(execution_id, node_ids, raw_outputs)))
+
+
+def set_node_statuses(
+    execution_id: str,
+    node_ids: list[str],
+    status: NodeStatus,
+    timings: Mapping[str, str] | None = None,
+    started: Collection[str] = (),
+) -> None:
+    """Write node statuses; RUNNING nodes get a lease, finished ones drop it.
+
+    Queued nodes get a ``NODE_DISPATCH_TTL`` lease until a worker starts them;
+    ``started`` nodes run in this process and get a ``NODE_LEASE_TTL`` one.
+    RUNNING also records when each node was enqueued; other statuses store the
+    ``timings`` given for their nodes.
+    """
+    pipe = get_redis().pipeline()
+    for node_id in node_ids:
+        _queue_node_write(pipe, "status", execution_id, node_id, status.value)
+        if settings.publish_events:
+            pipe.publish(events_channel(execution_id), node_event(node_id, status))
+    members = [lease_member(execution_id, node_id) for node_id in node_ids]
+    if members and status == NodeStatus.RUNNING:
+        now = time.time()
+        deadlines = dict.fromkeys(members, now + settings.node_dispatch_ttl)
+        for node_id in started:
+            deadlines[lease_member(execution_id, node_id)] = (
+                now + settings.node_lease_ttl
+            )
+        pipe.zadd(NODE_LEASES_KEY, deadlines)
+        if settings.node_metrics:
+            timings = dict.fromkeys(node_ids, encode_timing(now))
+    elif members and status in (NodeStatus.COMPLETED, NodeStatus.FAILED):
+        pipe.zrem(NODE_LEASES_KEY, *members)
+    timings = {node_id: timing for node_id, timing in (timings or {}).items() if timing}
+    if timings:
+        pipe.hset(node_timings_key(execution_id), mapping=timings)
+    pipe.execute()
+
+
+def renew_leases(members: list[str]) -> None:
+    """Push the deadline of still-held leases (``ZADD XX``) a full TTL out."""
+    deadline = time.time() + settings.node_lease_ttl
+    get_redis().zadd(NODE_LEASES_KEY, dict.fromkeys(members, deadline), xx=True)
+
+
+def extend_lease(execution_id: str, node_id: str, deadline: float) -> None:
+    get_redis().zadd(NODE_LEASES_KEY, {lease_member(execution_id, node_id): deadline})
+
+
+def release_lease(execution_id: str, node_id: str) -> None:
+    get_redis().zrem(NODE_LEASES_KEY, lease_member(execution_id, node_id))
+
+
+def claim_expired_leases(
+    now: float, limit: int, claim_until: float
+) -> list[tuple[str, str]]:
+    """Claim leases that expired by ``now``; returns (execution, node) pairs."""
+    members = _script(CLAIM_LEASES_SCRIPT)(
+        keys=[NODE_LEASES_KEY], args=[now, limit, claim_until]
+    )
+    return [parse_lease_member(member) for member in members or []]
+
+
+def increment_attempts(execution_id: str, node_id: str) -> int:
+    """Count a re-dispatch of a node and return how many it has had."""
+    return get_redis().hincrby(node_attempts_key(execution_id), node_id, 1)
 
 
 def record_error(execution_id: str, message: str) -> None:
@@ -134,27 +1153,117 @@ def acquire_dispatch_lock(
 def list_node_statuses(
     execution_id: str, definition: WorkflowDefinition
 ) -> dict[str, NodeStatus]:
-    redis_client = get_redis()
-    pipe = redis_client.pipeline()
-    for node in definition.dag.nodes:
-        pipe.get(node_status_key(execution_id, node.id))
-    raw_statuses = pipe.execute()
+    node_ids = [node.id for node in definition.dag.nodes]
+    raw_statuses = _read_node_values("status", execution_id, node_ids)
     return {
-        node.id: NodeStatus(raw) if raw else NodeStatus.PENDING
-        for node, raw in zip(definition.dag.nodes, raw_statuses)
+        node_id: NodeStatus(raw) if raw else NodeStatus.PENDING
+        for node_id, raw in zip(node_ids, raw_statuses)
     }
 
 
 def get_all_outputs(
     execution_id: str, definition: WorkflowDefinition
 ) -> dict[str, Any]:
-    redis_client = get_redis()
-    pipe = redis_client.pipeline()
+    node_ids = [node.id for node in definition.dag.nodes]
+    raw_outputs = _read_node_values(
+        "output", execution_id, node_ids, get_payload_redis()
+    )
+    decoded = _decode_outputs(execution_id, node_ids, raw_outputs)
+    return {
+        node_id: output
+        for node_id, output, raw in zip(node_ids, decoded, raw_outputs)
+        if raw
+    }
+
+
+def execution_keys(execution_id: str, definition: WorkflowDefinition) -> list[str]:
+    """All keys holding state for an execution under the configured layout."""
+    keys = [
+        workflow_definition_key(execution_id),
+        workflow_status_key(execution_id),
+        params_key(execution_id),
+        errors_key(execution_id),
+        completed_count_key(execution_id),
+        node_attempts_key(execution_id),
+        node_timings_key(execution_id),
+    ]
+    # Split outputs keep their fields in per-node hashes under either layout.
+    keys.extend(
+        node_output_fields_key(execution_id, node.id) for node in definition.dag.nodes
+    )
+    if _hashed():
+        keys.extend(
+            [
+                node_statuses_key(execution_id),
+                node_outputs_key(execution_id),
+                remaining_parents_hash_key(execution_id),
+            ]
+        )
+        return keys
     for node in definition.dag.nodes:
-        pipe.get(node_output_key(execution_id, node.id))
-    raw_outputs = pipe.execute()
-    outputs: dict[str, Any] = {}
-    for node, raw in zip(definition.dag.nodes, raw_outputs):
-        if raw:
-            outputs[node.id] = json.loads(raw)
-    return outputs
+        keys.extend(
+            [
+                node_status_key(execution_id, node.id),
+                node_output_key(execution_id, node.id),
+                remaining_parents_key(execution_id, node.id),
+            ]
+        )
+    return keys
+
+
+def delete_execution_state(execution_id: str, definition: WorkflowDefinition) -> None:
+    get_redis().delete(*execution_keys(execution_id, definition))
+
+
+def expire_execution_state(
+    execution_id: str, definition: WorkflowDefinition, ttl_seconds: int
+) -> None:
+    pipe = get_redis().pipeline()
+    for key in execution_keys(execution_id, definition):
+        pipe.expire(key, ttl_seconds)
+    pipe.execute()
+
+
+def finished_executions(finished_before: float, limit: int) -> list[tuple[str, float]]:
+    """Oldest (execution, finish time) pairs that finished by ``finished_before``."""
+    return get_redis().zrangebyscore(
+        FINISHED_EXECUTIONS_KEY,
+        "-inf",
+        finished_before,
+        start=0,
+        num=limit,
+        withscores=True,
+    )
+
+
+def forget_finished_execution(execution_id: str) -> None:
+    get_redis().zrem(FINISHED_EXECUTIONS_KEY, execution_id)
+
+
+def migrate_execution_to_hash(
+    execution_id: str, definition: WorkflowDefinition
+) -> None:
+    """Fold an execution's per-node string keys into the per-execution hashes.
+
+    Run on executions that are not currently being worked on; completions that
+    race with the migration may land in the old keys.
+    """
+    node_ids = [node.id for node in definition.dag.nodes]
+    for kind, (per_node_key, hash_key) in _NODE_KEYS.items():
+        # Outputs are serialized bytes; only the payload client reads them intact.
+        redis_client = get_payload_redis() if kind == "output" else get_redis()
+        read = redis_client.pipeline()
+        for node_id in node_ids:
+            read.get(per_node_key(execution_id, node_id))
+        values = read.execute()
+        mapping = {
+            node_id: value
+            for node_id, value in zip(node_ids, values)
+            if value is not None
+        }
+        write = redis_client.pipeline()
+        if mapping:
+            write.hset(hash_key(execution_id), mapping=mapping)
+        for node_id in node_ids:
+            write.delete(per_node_key(execution_id, node_id))
+        write.execute()
@@ -2,34 +2,235 @@ from __future__ import annotations
 
 from typing import Any
 
-from app import state
+from celery.signals import worker_process_shutdown, worker_shutdown
+
+from app import limits, state
+from app.async_worker import node_runner
+from app.blobstore import is_blob_reference
 from app.celery_app import celery_app
-from app.graph import validate_workflow
-from app.handlers import execute_handler
+from app.config import settings
+from app.graph import WorkflowGraph
+from app.handlers import execute_handler, execute_handler_async, is_async_handler
+from app.leases import lease_heartbeat
+from app.metrics import NodeTimer, recorder
 from app.models import NodeStatus
-from app.orchestrator import on_node_failure, on_node_success
+from app.orchestrator import (
+    complete_chain,
+    fused_chain,
+    load_workflow_graph,
+    on_node_failure,
+    on_node_success,
+    resolve_chain_config,
+)
 
 
 @celery_app.task(name="app.tasks.execute_node")
 def execute_node(
     execution_id: str, node_id: str, handler: str, config: dict[str, Any]
 ) -> dict[str, Any]:
-    definition = state.get_workflow_definition(execution_id)
-    if not definition:
-        return {}
-    graph = validate_workflow(definition)
-
-    current_status = state.get_node_status(execution_id, node_id)
-    if current_status == NodeStatus.COMPLETED:
-        output = state.get_node_output(execution_id, node_id) or {}
-        return output
-    if current_status == NodeStatus.FAILED:
-        return {}
-
-    try:
-        output = execute_handler(execution_id, node_id, handler, config, graph)
-        on_node_success(execution_id, node_id, output, graph)
-        return output
-    except Exception as exc:  # pragma: no cover - defensive
-        on_node_failure(execution_id, node_id, str(exc))
-        return {}
+    timer = NodeTimer()
+    with timer.engine():
+        graph = load_workflow_graph(execution_id)
+        if graph is None:
+            return {}
+
+        current_status, timer.enqueued = state.start_node_run(execution_id, node_id)
+        if current_status == NodeStatus.COMPLETED:
+            output = state.get_node_output(execution_id, node_id) or {}
+            return output
+        if current_status == NodeStatus.FAILED:
+            return {}
+
+        chain = fused_chain(graph, node_id)
+        slot = limits.acquire(execution_id, node_id, handler, config)
+        if slot is limits.DEFERRED:
+            # Promoted and published again once its scope has room.
+            return {}
+        if chain is not None:
+            handlers = [graph.nodes[member].handler for member in chain]
+            if settings.worker_mode == "asyncio" and any(
+                is_async_handler(name) for name in handlers
+            ):
+                node_runner.submit(
+                    _execute_chain_async(execution_id, chain, config, graph, timer)
+                )
+                return {}
+        elif settings.worker_mode == "asyncio" and is_async_handler(handler):
+            # The output is recorded in Redis when the handler finishes.
+            node_runner.submit(
+                _execute_async(
+                    execution_id, node_id, handler, config, graph, timer, slot
+                )
+            )
+            return {}
+
+    if chain is not None:
+        with lease_heartbeat.hold(execution_id, node_id):
+            return _execute_chain(execution_id, chain, config, graph, timer)
+
+    with lease_heartbeat.hold(execution_id, node_id):
+        try:
+            with timer.run(node_id, handler):
+                output = execute_handler(execution_id, node_id, handler, config, graph)
+            return _record_success(execution_id, node_id, graph, output, timer, slot)
+        except Exception as exc:
+            _record_failure(execution_id, node_id, str(exc), timer, slot)
+            return {}
+
+
+async def _execute_async(
+    execution_id: str,
+    node_id: str,
+    handler: str,
+    config: dict[str, Any],
+    graph: WorkflowGraph,
+    timer: NodeTimer,
+    slot: limits.Slot | None = None,
+) -> None:
+    with lease_heartbeat.hold(execution_id, node_id):
+        try:
+            with timer.run(node_id, handler):
+                output = await execute_handler_async(
+                    execution_id, node_id, handler, config, graph
+                )
+            await node_runner.offload(
+                _record_success, execution_id, node_id, graph, output, timer, slot
+            )
+        except Exception as exc:
+            await node_runner.offload(
+                _record_failure, execution_id, node_id, str(exc), timer, slot
+            )
+
+
+def _execute_chain(
+    execution_id: str,
+    chain: list[str],
+    config: dict[str, Any],
+    graph: WorkflowGraph,
+    timer: NodeTimer,
+) -> dict[str, Any]:
+    """Run a fused chain here; statuses and outputs are written at the end."""
+    outputs: list[tuple[str, Any]] = []
+    params: dict[str, Any] | None = None
+    for node_id in chain:
+        try:
+            if outputs:
+                with timer.engine():
+                    if params is None:
+                        params = state.get_params(execution_id)
+                    config = resolve_chain_config(
+                        execution_id, node_id, graph, params, outputs[-1][1]
+                    )
+            handler = graph.nodes[node_id].handler
+            with timer.run(node_id, handler):
+                output = execute_handler(execution_id, node_id, handler, config, graph)
+        except Exception as exc:
+            _complete_chain(execution_id, graph, outputs, timer, (node_id, str(exc)))
+            return {}
+        outputs.append((node_id, output))
+    _complete_chain(execution_id, graph, outputs, timer)
+    return {"chain": chain}
+
+
+async def _execute_chain_async(
+    execution_id: str,
+    chain: list[str],
+    config: dict[str, Any],
+    graph: WorkflowGraph,
+    timer: NodeTimer,
+) -> None:
+    with lease_heartbeat.hold(execution_id, chain[0]):
+        await _run_chain_async(execution_id, chain, config, graph, timer)
+
+
+async def _run_chain_async(
+    execution_id: str,
+    chain: list[str],
+    config: dict[str, Any],
+    graph: WorkflowGraph,
+    timer: NodeTimer,
+) -> None:
+    outputs: list[tuple[str, Any]] = []
+    params: dict[str, Any] | None = None
+    for node_id in chain:
+        try:
+            if outputs:
+                if params is None:
+                    params = await node_runner.offload(state.get_params, execution_id)
+                config = resolve_chain_config(
+                    execution_id, node_id, graph, params, outputs[-1][1]
+                )
+            handler = graph.nodes[node_id].handler
+            with timer.run(node_id, handler):
+                output = await execute_handler_async(
+                    execution_id, node_id, handler, config, graph
+                )
+        except Exception as exc:
+            await node_runner.offload(
+                _complete_chain,
+                execution_id,
+                graph,
+                outputs,
+                timer,
+                (node_id, str(exc)),
+            )
+            return
+        outputs.append((node_id, output))
+    await node_runner.offload(_complete_chain, execution_id, graph, outputs, timer)
+
+
+def _complete_chain(
+    execution_id: str,
+    graph: WorkflowGraph,
+    outputs: list[tuple[str, Any]],
+    timer: NodeTimer,
+    failure: tuple[str, str] | None = None,
+) -> None:
+    with timer.engine():
+        complete_chain(execution_id, graph, outputs, failure, timer.timings())
+    timer.report()
+
+
+def _record_success(
+    execution_id: str,
+    node_id: str,
+    graph: WorkflowGraph,
+    output: Any,
+    timer: NodeTimer,
+    slot: limits.Slot | None = None,
+) -> dict[str, Any]:
+    with timer.engine():
+        limits.release(slot)
+        payload, fields = state.encode_output(output)
+        timing = timer.timings().get(node_id, "")
+        on_node_success(execution_id, node_id, payload, graph, fields, timing=timing)
+    timer.report()
+    # Keep offloaded outputs out of the Celery result backend.
+    if is_blob_reference(payload):
+        return {"blob": payload[1:].decode()}
+    return output
+
+
+def _record_failure(
+    execution_id: str,
+    node_id: str,
+    error: str,
+    timer: NodeTimer,
+    slot: limits.Slot | None = None,
+) -> None:
+    with timer.engine():
+        limits.release(slot)
+        on_node_failure(execution_id, node_id, error, timer.timings().get(node_id, ""))
+    timer.report()
+
+
+@worker_shutdown.connect
+def _drain_async_nodes(**_: Any) -> None:
+    if settings.worker_mode == "asyncio":
+        node_runner.drain(settings.async_drain_timeout)
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def _flush_metrics(**_: Any) -> None:
+    recorder.flush()
@@ -0,0 +1,166 @@
+"""Chrome trace-event timelines and critical-path analysis of executions.
+
+``build_trace`` turns the node timings recorded by ``app.metrics`` into trace
+events that chrome://tracing and ui.perfetto.dev open as they are. Each node
+gets a queued slice and a run slice, and nodes are packed onto as few rows as
+their overlap allows.
+
+The analysis weighs every node with its queue wait plus run time and runs a
+critical-path pass over the graph. A node's slack is how much longer it could
+have taken without delaying the execution. The critical path is a zero-slack
+chain from a root to the last node to finish, so shortening any node on it
+shortens the run, while speeding up a node with slack does not. Nodes that have
+not finished weigh nothing.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import Any
+
+from app.graph import CompactGraph, WorkflowGraph
+from app.models import (
+    NodeStatus,
+    NodeTrace,
+    WorkflowStatus,
+    WorkflowTraceResponse,
+)
+
+PID = 1
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1e3, 3)
+
+
+def _us(seconds: float) -> float:
+    return round(seconds * 1e6, 1)
+
+
+def critical_path(
+    compact: CompactGraph, durations: list[float], earliest: list[float]
+) -> list[int]:
+    """Walk back from the last node to finish through its latest parent."""
+    if not durations:
+        return []
+    finish = [start + duration for start, duration in zip(earliest, durations)]
+    node = max(range(len(finish)), key=finish.__getitem__)
+    path = [node]
+    while parents := compact.parent_indices(node):
+        node = max(parents, key=finish.__getitem__)
+        path.append(node)
+    return path[::-1]
+
+
+def build_trace(
+    execution_id: str,
+    graph: WorkflowGraph,
+    status: WorkflowStatus,
+    node_statuses: dict[str, NodeStatus],
+    timings: dict[str, list[float]],
+) -> WorkflowTraceResponse:
+    compact = graph.compact
+    runs = {
+        node_id: timing
+        for node_id, timing in timings.items()
+        if len(timing) == 3 and node_id in compact.index
+    }
+    durations = [
+        runs[node_id][2] - runs[node_id][0] if node_id in runs else 0.0
+        for node_id in compact.ids
+    ]
+    earliest, latest = compact.schedule(durations)
+    path = critical_path(compact, durations, earliest)
+    on_path = set(path)
+
+    nodes: dict[str, NodeTrace] = {}
+    for index, node_id in enumerate(compact.ids):
+        run = runs.get(node_id)
+        nodes[node_id] = NodeTrace(
+            handler=graph.nodes[node_id].handler,
+            status=node_statuses.get(node_id, NodeStatus.PENDING),
+            wait_ms=_ms(run[1] - run[0]) if run else None,
+            run_ms=_ms(run[2] - run[1]) if run else None,
+            earliest_start_ms=_ms(earliest[index]),
+            latest_start_ms=_ms(latest[index]),
+            slack_ms=_ms(max(0.0, latest[index] - earliest[index])),
+            critical=index in on_path,
+        )
+    return WorkflowTraceResponse(
+        execution_id=execution_id,
+        status=status,
+        duration_ms=_ms(
+            max((start + d for start, d in zip(earliest, durations)), default=0.0)
+        ),
+        critical_path=[compact.ids[index] for index in path],
+        nodes=nodes,
+        trace_events=trace_events(
+            f"{graph.definition.name} {execution_id}", runs, nodes
+        ),
+    )
+
+
+def trace_events(
+    title: str, runs: dict[str, list[float]], nodes: dict[str, NodeTrace]
+) -> list[dict[str, Any]]:
+    """Complete ("X") events in microseconds from the first enqueue.
+
+    A node takes the lowest row that is free when it is enqueued.
+    """
+    events: list[dict[str, Any]] = [
+        {"ph": "M", "name": "process_name", "pid": PID, "args": {"name": title}}
+    ]
+    ordered = sorted(runs.items(), key=lambda item: (item[1][0], item[0]))
+    if not ordered:
+        return events
+    origin = ordered[0][1][0]
+    busy: list[tuple[float, int]] = []
+    free: list[int] = []
+    rows = 0
+    for node_id, (enqueued, started, finished) in ordered:
+        while busy and busy[0][0] <= enqueued:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        if free:
+            row = heapq.heappop(free)
+        else:
+            row, rows = rows, rows + 1
+            events.append(
+                {
+                    "ph": "M",
+                    "name": "thread_name",
+                    "pid": PID,
+                    "tid": row,
+                    "args": {"name": f"row {row}"},
+                }
+            )
+        heapq.heappush(busy, (finished, row))
+        node = nodes[node_id]
+        if started > enqueued:
+            events.append(
+                {
+                    "name": f"{node_id} (queued)",
+                    "cat": "queue",
+                    "ph": "X",
+                    "pid": PID,
+                    "tid": row,
+                    "ts": _us(enqueued - origin),
+                    "dur": _us(started - enqueued),
+                }
+            )
+        events.append(
+            {
+                "name": node_id,
+                "cat": node.handler,
+                "ph": "X",
+                "pid": PID,
+                "tid": row,
+                "ts": _us(started - origin),
+                "dur": _us(finished - started),
+                "args": {
+                    "status": node.status.value,
+                    "slack_ms": node.slack_ms,
+                    "critical": node.critical,
+                },
+            }
+        )
+    return events
@@ -1,46 +1,143 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Mapping
 from typing import Any
 
 
 TEMPLATE_PATTERN = re.compile(r"{{\s*([a-zA-Z0-9_\-\.]+)\s*}}")
 
+# A template reference split once at compile time: ("params", ("user", "id")).
+TemplatePath = tuple[str, tuple[str, ...]]
 
-def resolve_templates(value: Any, context: dict[str, Any]) -> Any:
+
+class TemplatePlan:
+    """A node config compiled once into the slots that need filling per dispatch.
+
+    Lookup paths are split once. ``resolve`` fills the slots and returns fresh
+    containers throughout, so callers may mutate the result without changing
+    the plan (static subtrees are copied, not re-scanned for templates).
+    """
+
+    __slots__ = ("template", "references", "_slots", "_parts", "_path")
+
+    def __init__(self, template: Any) -> None:
+        self.template = template
+        self._slots: dict[Any, TemplatePlan] = {}
+        self._parts: list[str | TemplatePath] | None = None
+        self._path: TemplatePath | None = None
+        self.references: frozenset[TemplatePath] = frozenset()
+        self._compile()
+
+    def _compile(self) -> None:
+        value = self.template
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, list):
+            items = enumerate(value)
+        elif isinstance(value, str):
+            self._compile_string(value)
+            return
+        else:
+            return
+        references: set[TemplatePath] = set()
+        for key, item in items:
+            plan = TemplatePlan(item)
+            if not plan.static:
+                self._slots[key] = plan
+                references.update(plan.references)
+        self.references = frozenset(references)
+
+    def _compile_string(self, value: str) -> None:
+        full_match = TEMPLATE_PATTERN.fullmatch(value.strip())
+        if full_match:
+            self._path = _split(full_match.group(1))
+            self.references = frozenset([self._path])
+            return
+        parts: list[str | TemplatePath] = []
+        position = 0
+        for match in TEMPLATE_PATTERN.finditer(value):
+            parts.append(value[position : match.start()])
+            parts.append(_split(match.group(1)))
+            position = match.end()
+        if position:
+            parts.append(value[position:])
+            self._parts = parts
+            self.references = frozenset(p for p in parts if isinstance(p, tuple))
+
+    @property
+    def static(self) -> bool:
+        return not self.references
+
+    @property
+    def roots(self) -> frozenset[str]:
+        """Context keys (``params`` or parent node ids) the config reads."""
+        return frozenset(root for root, _ in self.references)
+
+    def fields(self, root: str) -> set[tuple[str, ...]]:
+        """Field paths read from one context key; ``()`` means the whole value."""
+        return {path for ref_root, path in self.references if ref_root == root}
+
+    def resolve(self, context: Mapping[str, Any]) -> Any:
+        if self.static:
+            return _copy(self.template)
+        if self._path is not None:
+            return _lookup(self._path, context)
+        if self._parts is not None:
+            return "".join(
+                part if isinstance(part, str) else str(_lookup(part, context))
+                for part in self._parts
+            )
+        slots = self._slots
+        if isinstance(self.template, dict):
+            return {
+                key: slots[key].resolve(context) if key in slots else _copy(item)
+                for key, item in self.template.items()
+            }
+        return [
+            slots[index].resolve(context) if index in slots else _copy(item)
+            for index, item in enumerate(self.template)
+        ]
+
+
+def compile_templates(value: Any) -> TemplatePlan:
+    return TemplatePlan(value)
+
+
+def resolve_templates(value: Any, context: Mapping[str, Any]) -> Any:
     """Recursively resolve template strings in configs using parent outputs/params."""
+    return TemplatePlan(value).resolve(context)
+
+
+def _copy(value: Any) -> Any:
+    """Copy the containers of a JSON-like value; everything else is immutable."""
     if isinstance(value, dict):
-        return {k: resolve_templates(v, context) for k, v in value.items()}
+        return {
+            key: _copy(item) if isinstance(item, (dict, list)) else item
+            for key, item in value.items()
+        }
     if isinstance(value, list):
-        return [resolve_templates(item, context) for item in value]
-    if isinstance(value, str):
-        trimmed = value.strip()
-        full_match = TEMPLATE_PATTERN.fullmatch(trimmed)
-        if full_match:
-            match_key = full_match.group(1)
-            replacement = _lookup_template(match_key, context)
-            if replacement is None:
-                raise ValueError(f"Missing data for template {match_key}")
-            return replacement
-
-        def replacer(match: re.Match[str]) -> str:
-            match_key = match.group(1)
-            replacement = _lookup_template(match_key, context)
-            if replacement is None:
-                raise ValueError(f"Missing data for template {match_key}")
-            return str(replacement)
-
-        return TEMPLATE_PATTERN.sub(replacer, value)
+        return [
+            _copy(item) if isinstance(item, (dict, list)) else item for item in value
+        ]
     return value
 
 
-def _lookup_template(key: str, context: dict[str, Any]) -> Any:
-    parts = key.split(".")
-    root = parts[0]
+def _split(key: str) -> TemplatePath:
+    root, *rest = key.split(".")
+    return root, tuple(rest)
+
+
+def _lookup(path: TemplatePath, context: Mapping[str, Any]) -> Any:
+    root, parts = path
     cursor: Any = context.get(root)
-    for part in parts[1:]:
+    for part in parts:
         if isinstance(cursor, dict) and part in cursor:
             cursor = cursor[part]
         else:
-            return None
+            cursor = None
+            break
+    if cursor is None:
+        dotted = ".".join((root, *parts))
+        raise ValueError(f"Missing data for template {dotted}")
     return cursor
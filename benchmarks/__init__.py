@@ -0,0 +1 @@
+"""Orchestration benchmarks; run modules with ``python -m benchmarks.<name>``."""
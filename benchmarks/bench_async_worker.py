@@ -0,0 +1,122 @@
+"""Nodes/sec of I/O-bound handlers: prefork slots vs the asyncio worker mode.
+
+Runs ``--executions`` workflows of input -> ``--width`` ``call_external_service``
+nodes -> output through ``app.tasks.execute_node`` with an in-memory broker. The
+handler latency is fixed at ``--latency`` seconds.
+
+- prefork: ``--concurrency`` threads consume the queue and block in each
+  handler, like prefork processes do.
+- asyncio: one consumer (``--pool=solo``) hands async handlers to the
+  per-process event loop.
+
+    python -m benchmarks.bench_async_worker [--redis-url redis://localhost:6379/15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+from app import async_worker, handlers, orchestrator, state, tasks
+from app.config import settings
+from app.graph import validate_workflow
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
+from benchmarks.fakes import fake_redis_clients
+
+
+def workflow(width: int) -> WorkflowDefinition:
+    nodes = [NodeDefinition(id="input", handler="input")]
+    nodes.extend(
+        NodeDefinition(
+            id=f"io{i}", handler="call_external_service", dependencies=["input"]
+        )
+        for i in range(width)
+    )
+    nodes.append(
+        NodeDefinition(
+            id="output", handler="output", dependencies=[f"io{i}" for i in range(width)]
+        )
+    )
+    return WorkflowDefinition(name="bench_async_worker", dag=DAGDefinition(nodes=nodes))
+
+
+def run(mode: str, args: argparse.Namespace) -> dict:
+    settings.worker_mode = mode
+    broker: queue.Queue = queue.Queue()
+    orchestrator.celery_app = SimpleNamespace(
+        send_task=lambda name, args, **_: broker.put(args)
+    )
+    definition = workflow(args.width)
+    graph = validate_workflow(definition)
+    execution_ids = [f"{mode}-{i}" for i in range(args.executions)]
+
+    started = time.perf_counter()
+    for execution_id in execution_ids:
+        state.set_workflow_definition(execution_id, definition)
+        orchestrator.start_workflow(execution_id, definition, graph, {})
+
+    done = threading.Event()
+
+    def consume() -> None:
+        while not done.is_set():
+            try:
+                task_args = broker.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            tasks.execute_node.run(*task_args)
+
+    consumers = args.concurrency if mode == "prefork" else 1
+    threads = [threading.Thread(target=consume, daemon=True) for _ in range(consumers)]
+    for thread in threads:
+        thread.start()
+    while not all(
+        state.get_workflow_status(execution_id) == WorkflowStatus.COMPLETED
+        for execution_id in execution_ids
+    ):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    done.set()
+
+    nodes = args.executions * len(graph.nodes)
+    return {
+        "mode": mode,
+        "consumers": consumers,
+        "nodes": nodes,
+        "seconds": round(elapsed, 3),
+        "nodes_per_sec": round(nodes / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url")
+    parser.add_argument("--executions", type=int, default=20)
+    parser.add_argument("--width", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.redis_url:
+        settings.redis_url = args.redis_url
+    else:
+        state._redis_client, state._payload_client = fake_redis_clients()
+    settings.publish_events = False
+    handlers.random = SimpleNamespace(uniform=lambda low, high: args.latency)
+    tasks.node_runner = async_worker.AsyncNodeRunner(args.max_in_flight)
+
+    results = [run(mode, args) for mode in ("prefork", "asyncio")]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Per-completion cost of `on_node_success` as the DAG grows.
+
+Runs a root -> N leaves fan-out and completes every leaf, reporting mean wall time
+and Redis round trips per completion. Both should stay flat as N grows.
+
+    python -m benchmarks.bench_completion [--redis-url redis://localhost:6379/15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from app import orchestrator, state
+from app.graph import validate_workflow
+from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition
+from benchmarks.fakes import fake_redis_clients
+
+
+class RoundTripCounter:
+    """Proxy that counts client calls and pipeline executions as round trips."""
+
+    def __init__(self, client) -> None:  # noqa: ANN001
+        self._client = client
+        self.round_trips = 0
+
+    def __getattr__(self, name: str):  # noqa: ANN204
+        attr = getattr(self._client, name)
+        if name == "pipeline":
+            return lambda *args, **kwargs: _CountingPipeline(
+                self, attr(*args, **kwargs)
+            )
+        if name == "register_script":
+            return lambda source: _CountingScript(self, attr(source))
+        if callable(attr):
+
+            def call(*args, **kwargs):  # noqa: ANN002, ANN003, ANN202
+                self.round_trips += 1
+                return attr(*args, **kwargs)
+
+            return call
+        return attr
+
+
+class _CountingPipeline:
+    def __init__(self, counter: RoundTripCounter, pipe) -> None:  # noqa: ANN001
+        self._counter = counter
+        self._pipe = pipe
+
+    def __getattr__(self, name: str):  # noqa: ANN204
+        return getattr(self._pipe, name)
+
+    def execute(self):  # noqa: ANN201
+        self._counter.round_trips += 1
+        return self._pipe.execute()
+
+
+class _CountingScript:
+    def __init__(self, counter: RoundTripCounter, script) -> None:  # noqa: ANN001
+        self._counter = counter
+        self._script = script
+        self.registered_client = counter
+
+    def __call__(self, keys=(), args=(), client=None):  # noqa: ANN001, ANN204
+        if client is None:
+            self._counter.round_trips += 1
+        return self._script(keys=keys, args=args, client=client)
+
+
+def fan_out_workflow(width: int) -> WorkflowDefinition:
+    nodes = [NodeDefinition(id="root", handler="input")]
+    nodes.extend(
+        NodeDefinition(id=f"leaf_{i}", handler="output", dependencies=["root"])
+        for i in range(width)
+    )
+    return WorkflowDefinition(name=f"fan_out_{width}", dag=DAGDefinition(nodes=nodes))
+
+
+def run(width: int) -> dict[str, float]:
+    workflow = fan_out_workflow(width)
+    graph = validate_workflow(workflow)
+    execution_id = f"bench-completion-{width}"
+    state.set_workflow_definition(execution_id, workflow)
+    orchestrator.start_workflow(execution_id, workflow, graph, params={})
+    orchestrator.on_node_success(execution_id, "root", {}, graph)
+
+    counter = state.get_redis()
+    counter.round_trips = 0
+    started = time.perf_counter()
+    for i in range(width):
+        orchestrator.on_node_success(execution_id, f"leaf_{i}", {}, graph)
+    elapsed = time.perf_counter() - started
+    assert state.get_workflow_status(execution_id).value == "COMPLETED"
+    return {
+        "nodes": width + 1,
+        "us_per_completion": elapsed / width * 1e6,
+        "round_trips_per_completion": counter.round_trips / width,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", help="benchmark a real server (flushes db)")
+    parser.add_argument("--sizes", default="100,1000,5000")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+
+        client = redis.from_url(args.redis_url, decode_responses=True)
+        client.flushdb()
+        state._payload_client = redis.from_url(args.redis_url)
+    else:
+        client, state._payload_client = fake_redis_clients()
+    state._redis_client = RoundTripCounter(client)
+    orchestrator.celery_app = type(
+        "NoBroker", (), {"send_task": staticmethod(lambda *_, **__: None)}
+    )
+
+    print(f"{'nodes':>8} {'us/completion':>14} {'round trips':>12}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        result = run(size)
+        print(
+            f"{result['nodes']:>8} {result['us_per_completion']:>14.1f}"
+            f" {result['round_trips_per_completion']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Validation time and adjacency memory of 10k-100k node DAGs.
+
+For each size and shape (a single chain, and a layered DAG of width 100 where
+every node has up to three parents in the previous layer), reports:
+
+- ``validate_ms``: ``validate_workflow`` wall time, including template plans
+  and chain detection.
+- ``csr_kib``: bytes held by the ``CompactGraph`` arrays.
+- ``dict_kib``: bytes of the equivalent dict-of-lists adjacency, parents and
+  in-degree maps that the graph used to hold.
+
+    python -m benchmarks.bench_graph [--sizes 10000 50000 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+
+from app.graph import validate_workflow
+from app.models import WorkflowDefinition
+from benchmarks.generators import chain, layered
+
+
+def dict_bytes(mapping: dict[str, list[str] | int]) -> int:
+    total = sys.getsizeof(mapping)
+    for value in mapping.values():
+        total += sys.getsizeof(value)
+    return total
+
+
+def measure(shape: str, definition: WorkflowDefinition) -> dict:
+    started = time.perf_counter()
+    graph = validate_workflow(definition)
+    elapsed = time.perf_counter() - started
+
+    compact = graph.compact
+    csr = sum(
+        sys.getsizeof(getattr(compact, name))
+        for name in ("child_offsets", "children", "parent_offsets", "parents")
+    )
+    adjacency = {node_id: graph.adjacency[node_id] for node_id in graph.nodes}
+    parents = {node_id: graph.parents[node_id] for node_id in graph.nodes}
+    in_degree = {node_id: len(deps) for node_id, deps in parents.items()}
+    legacy = dict_bytes(adjacency) + dict_bytes(parents) + dict_bytes(in_degree)
+    return {
+        "shape": shape,
+        "nodes": len(graph.nodes),
+        "edges": len(compact.parents),
+        "max_depth": max(compact.depth),
+        "validate_ms": round(elapsed * 1e3, 1),
+        "csr_kib": round(csr / 1024, 1),
+        "dict_kib": round(legacy / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000]
+    )
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.append(measure("chain", chain(size)))
+        results.append(measure("layered", layered(size)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""End-to-end latency of input -> ``--chain`` call_external_service nodes -> output
+with every node published, with inline ``input``/``output`` nodes, and with the
+straight-line chain fused into one task.
+
+Each published task pays ``--hop-ms`` before it runs, which stands in for the
+broker round trip and worker pickup. Handler latency is zero, so the difference
+is the cost of the hops that inline execution and chain fusion remove.
+
+    python -m benchmarks.bench_inline [--redis-url redis://localhost:6379/15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+
+from app import handlers, orchestrator, state, tasks
+from app.config import settings
+from app.graph import validate_workflow
+from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition, WorkflowStatus
+from benchmarks.fakes import fake_redis_clients
+from benchmarks.suite import percentile
+
+
+def workflow(length: int) -> WorkflowDefinition:
+    nodes = [NodeDefinition(id="input", handler="input")]
+    previous = "input"
+    for index in range(length):
+        nodes.append(
+            NodeDefinition(
+                id=f"fetch{index}",
+                handler="call_external_service",
+                dependencies=[previous],
+            )
+        )
+        previous = f"fetch{index}"
+    nodes.append(NodeDefinition(id="output", handler="output", dependencies=[previous]))
+    return WorkflowDefinition(name="bench_inline", dag=DAGDefinition(nodes=nodes))
+
+
+def run(max_depth: int, fuse: bool, args: argparse.Namespace) -> dict:
+    settings.inline_max_depth = max_depth
+    settings.fuse_chains = fuse
+    broker: queue.Queue = queue.Queue()
+    published = 0
+
+    def send_task(name, args, **_):  # noqa: ANN001, ANN202
+        nonlocal published
+        published += 1
+        broker.put(args)
+
+    orchestrator.celery_app = SimpleNamespace(send_task=send_task)
+
+    def consume() -> None:
+        while True:
+            task_args = broker.get()
+            time.sleep(args.hop_ms / 1e3)
+            tasks.execute_node.run(*task_args)
+
+    threading.Thread(target=consume, daemon=True).start()
+    definition = workflow(args.chain)
+    graph = validate_workflow(definition)
+    latencies = []
+    for index in range(args.executions):
+        execution_id = f"inline-{max_depth}-{fuse}-{index}"
+        state.set_workflow_definition(execution_id, definition)
+        started = time.perf_counter()
+        orchestrator.start_workflow(execution_id, definition, graph, {"i": index})
+        while state.get_workflow_status(execution_id) != WorkflowStatus.COMPLETED:
+            time.sleep(0.0005)
+        latencies.append(time.perf_counter() - started)
+
+    return {
+        "inline_max_depth": max_depth,
+        "fuse_chains": fuse,
+        "tasks_per_execution": published / args.executions,
+        "mean_ms": round(statistics.mean(latencies) * 1e3, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1e3, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url")
+    parser.add_argument("--executions", type=int, default=200)
+    parser.add_argument("--hop-ms", type=float, default=5.0)
+    parser.add_argument("--chain", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.redis_url:
+        settings.redis_url = args.redis_url
+    else:
+        state._redis_client, state._payload_client = fake_redis_clients()
+    settings.publish_events = False
+    settings.worker_mode = "prefork"
+    handlers.random = SimpleNamespace(uniform=lambda low, high: 0)
+
+    results = [
+        run(max_depth, fuse, args)
+        for max_depth, fuse in ((0, False), (16, False), (16, True))
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Makespan of layered DAGs on a fixed worker pool, by dispatch priority.
+
+A discrete-event simulation: ``K`` workers take the most urgent message from
+one priority queue (ties in publish order) and hold it for the node's
+simulated run time. When that time elapses the node goes through the real
+``app.tasks.execute_node``, which records it and publishes its children with
+the priority ``DISPATCH_PRIORITY`` gives them. Handlers return immediately, so
+only the simulated clock advances.
+
+Nodes of a layered DAG get one of three handlers (mean 1, 4 and 16 simulated
+seconds, each node jittered by up to 50%). ``duration`` mode reads those means
+from seeded handler-duration histograms, as a worker fleet would have recorded
+them. For each worker count, reports the makespan under ``off`` (FIFO),
+``depth`` and ``duration``, and the two lower bounds: the critical path and
+total work divided by the workers.
+
+    python -m benchmarks.bench_priority [--size 1000] [--workers 16 32 48 64]
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import random
+from collections import deque
+from types import SimpleNamespace
+from typing import Any
+
+from app import leases, metrics, orchestrator, state, tasks
+from app.celery_app import message_priority
+from app.config import settings
+from app.graph import validate_workflow
+from app.handlers import register_handler
+from app.models import WorkflowDefinition, WorkflowStatus
+from benchmarks.fakes import fake_redis_clients
+from benchmarks.generators import layered
+
+MEAN_SECONDS = {"sim_short": 1.0, "sim_medium": 4.0, "sim_long": 16.0}
+MODES = ("off", "depth", "duration")
+
+
+def _sim_handler(
+    execution_id: str, node_id: str, config: dict[str, Any], graph
+) -> dict[str, str]:
+    return {"node": node_id}
+
+
+for _name in MEAN_SECONDS:
+    register_handler(_name)(_sim_handler)
+
+
+def workload(
+    size: int, width: int, max_parents: int, seed: int
+) -> tuple[WorkflowDefinition, dict[str, float]]:
+    """A layered DAG with random handlers and each node's simulated run time."""
+    rng = random.Random(seed)
+    base = layered(size, width=width, max_parents=max_parents, seed=seed)
+    nodes, durations = [], {}
+    for node in base.dag.nodes:
+        handler = rng.choice(list(MEAN_SECONDS))
+        nodes.append(node.model_copy(update={"handler": handler}))
+        durations[node.id] = MEAN_SECONDS[handler] * rng.uniform(0.5, 1.5)
+    dag = base.dag.model_copy(update={"nodes": nodes})
+    return base.model_copy(update={"dag": dag}), durations
+
+
+def simulate(
+    runs: list[tuple[float, str, WorkflowDefinition, dict[str, float]]],
+    workers: int,
+) -> dict[str, float]:
+    """Run ``(start, execution_id, definition, durations)`` executions together.
+
+    Returns each execution's simulated finish time.
+    """
+    # Lower Celery numbers are served first on Redis and last on AMQP.
+    sign = 1 if message_priority(9) < message_priority(0) else -1
+    queued: list[tuple[int, int, list]] = []
+    seq = 0
+
+    def send_task(task: str, args: list, priority: int = 0, **_: Any) -> None:
+        nonlocal seq
+        seq += 1
+        heapq.heappush(queued, (sign * priority, seq, args))
+
+    orchestrator.celery_app = SimpleNamespace(send_task=send_task)
+    arrivals = deque(sorted(runs, key=lambda run: run[0]))
+    durations: dict[str, dict[str, float]] = {}
+    finished: dict[str, float] = {}
+    now = 0.0
+    running: list[tuple[float, int, list]] = []
+    while arrivals or queued or running:
+        while arrivals and arrivals[0][0] <= now:
+            _, execution_id, definition, durations[execution_id] = arrivals.popleft()
+            state.set_workflow_definition(execution_id, definition)
+            orchestrator.start_workflow(
+                execution_id, definition, validate_workflow(definition), {}
+            )
+        while queued and len(running) < workers:
+            _, order, args = heapq.heappop(queued)
+            run_time = durations[args[0]][args[1]]
+            heapq.heappush(running, (now + run_time, order, args))
+        if not running or (arrivals and arrivals[0][0] < running[0][0]):
+            now = arrivals[0][0]
+            continue
+        now, _, args = heapq.heappop(running)
+        tasks.execute_node.run(*args)
+        if state.get_workflow_status(args[0]) == WorkflowStatus.COMPLETED:
+            finished.setdefault(args[0], now)
+
+    for _, execution_id, _, _ in runs:
+        if execution_id not in finished:
+            status = state.get_workflow_status(execution_id)
+            raise RuntimeError(f"{execution_id} ended {status}")
+    return finished
+
+
+def seed_history() -> None:
+    """Handler-duration histograms as if each handler had run 20 times."""
+    settings.node_metrics = True
+    for handler, mean in MEAN_SECONDS.items():
+        for _ in range(20):
+            metrics.recorder.observe(metrics.HANDLER_DURATION, handler, mean)
+    metrics.recorder.flush()
+    # The zero-latency handlers would drag the means down while simulating.
+    settings.node_metrics = False
+    metrics._handler_means = (float("-inf"), {})
+
+
+def setup() -> None:
+    """Point the engine at fakeredis with broker-bound, unfused nodes."""
+    state._redis_client, state._payload_client = fake_redis_clients()
+    settings.worker_mode = "prefork"
+    settings.fuse_chains = False
+    leases.lease_heartbeat.interval = 3600
+    seed_history()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--max-parents", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[16, 32, 48, 64])
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+    setup()
+
+    results = []
+    for workers in args.workers:
+        makespans: dict[str, float] = dict.fromkeys(MODES, 0.0)
+        critical_path = work = 0.0
+        for seed in range(args.seeds):
+            definition, durations = workload(
+                args.size, args.width, args.max_parents, seed
+            )
+            graph = validate_workflow(definition)
+            levels = graph.compact.bottom_levels(
+                [durations[node_id] for node_id in graph.compact.ids]
+            )
+            critical_path += max(levels)
+            work += sum(durations.values()) / workers
+            for mode in MODES:
+                settings.dispatch_priority = mode
+                execution_id = f"{mode}-{workers}-{seed}"
+                finished = simulate(
+                    [(0.0, execution_id, definition, durations)], workers
+                )
+                makespans[mode] += finished[execution_id]
+        off = makespans["off"]
+        results.append(
+            {
+                "workers": workers,
+                "nodes": args.size,
+                "seeds": args.seeds,
+                **{
+                    f"makespan_{mode}_s": round(total / args.seeds, 1)
+                    for mode, total in makespans.items()
+                },
+                **{
+                    f"reduction_{mode}_pct": round((1 - makespans[mode] / off) * 100, 1)
+                    for mode in MODES[1:]
+                },
+                "critical_path_s": round(critical_path / args.seeds, 1),
+                "work_per_worker_s": round(work / args.seeds, 1),
+            }
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
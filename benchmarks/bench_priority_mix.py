@@ -0,0 +1,83 @@
+"""Latency of concurrent executions of different sizes, by dispatch priority.
+
+Runs the ``bench_priority`` simulation with many executions sharing one worker
+pool: a few large layered DAGs start at time zero and smaller ones arrive at
+random over ``--window`` simulated seconds. Priorities only help if their
+levels mean the same thing in every execution, so this checks that the nodes of
+small executions (short remaining paths) are not starved by, and do not starve,
+the large ones. For each mode, reports every size's mean and p95 latency
+(arrival to completion) and the time the last execution finished.
+
+    python -m benchmarks.bench_priority_mix [--workers 32] [--mix 1000:2 100:10 10:40]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+
+from app.config import settings
+from benchmarks.bench_priority import MODES, setup, simulate, workload
+from benchmarks.suite import percentile
+
+
+def mix(
+    sizes: list[tuple[int, int]], window: float, seed: int
+) -> list[tuple[float, str, int, tuple]]:
+    """``(arrival, name, size, workload)`` for each execution; the largest start first."""
+    rng = random.Random(seed)
+    largest = max(size for size, _ in sizes)
+    runs = []
+    for size, count in sizes:
+        for i in range(count):
+            arrival = 0.0 if size == largest else rng.uniform(0, window)
+            definition, durations = workload(
+                size, max(2, size // 10), 2, rng.randrange(1 << 30)
+            )
+            runs.append((arrival, f"{size}-{i}", size, (definition, durations)))
+    return runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        default=["1000:2", "100:10", "10:40"],
+        help="SIZE:COUNT pairs",
+    )
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--window", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sizes = [tuple(map(int, pair.split(":"))) for pair in args.mix]
+    setup()
+
+    runs = mix(sizes, args.window, args.seed)
+    results = []
+    for mode in MODES:
+        settings.dispatch_priority = mode
+        finished = simulate(
+            [
+                (arrival, f"{mode}-{name}", definition, durations)
+                for arrival, name, _, (definition, durations) in runs
+            ],
+            args.workers,
+        )
+        row: dict[str, object] = {"mode": mode, "workers": args.workers}
+        for size, _ in sizes:
+            latencies = [
+                finished[f"{mode}-{name}"] - arrival
+                for arrival, name, run_size, _ in runs
+                if run_size == size
+            ]
+            row[f"mean_{size}_s"] = round(sum(latencies) / len(latencies), 1)
+            row[f"p95_{size}_s"] = round(percentile(latencies, 0.95), 1)
+        row["makespan_s"] = round(max(finished.values()), 1)
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Encode/decode cost of the configured serializers on an LLM-sized output.
+
+python -m benchmarks.bench_serializers [--kb 300] [--rounds 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from app.serialization import _SERIALIZERS, get_serializer
+
+
+def llm_output(size_kb: int) -> dict:
+    paragraph = "The quick brown fox jumps over the lazy dog. " * 20
+    chunks = max(1, size_kb * 1024 // len(paragraph))
+    return {
+        "text": paragraph * chunks,
+        "choices": [{"index": i, "text": paragraph, "score": i / 7} for i in range(8)],
+        "usage": {"prompt_tokens": 812, "completion_tokens": 4096},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kb", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    payload = llm_output(args.kb)
+
+    print(f"{'serializer':>10} {'bytes':>10} {'dumps ms':>10} {'loads ms':>10}")
+    for name in _SERIALIZERS:
+        try:
+            serializer = get_serializer(name)
+        except RuntimeError as exc:
+            print(f"{name:>10} skipped: {exc}")
+            continue
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            raw = serializer.dumps(payload)
+        dumps_ms = (time.perf_counter() - started) / args.rounds * 1e3
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            serializer.loads(raw)
+        loads_ms = (time.perf_counter() - started) / args.rounds * 1e3
+        print(f"{name:>10} {len(raw):>10} {dumps_ms:>10.3f} {loads_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Per-dispatch config resolution time, compiled plans versus a full scan.
+
+``scan`` is the recursive resolver dispatch used before template plans: every
+call walks the whole config and regex-matches every string. ``plan`` is
+``TemplatePlan.resolve`` on a plan compiled once, which fills the slots and
+copies the static subtrees. For each config shape, reports microseconds per
+resolve (best of ``--repeat`` runs) and the speedup.
+
+    python -m benchmarks.bench_templates [--iterations 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import timeit
+from collections.abc import Mapping
+from typing import Any
+
+from app.utils import TEMPLATE_PATTERN, compile_templates
+
+CONTEXT = {
+    "params": {"q": "search", "limit": 10},
+    "fetch": {"data": {"id": 7, "items": list(range(20))}, "url": "https://x"},
+}
+
+
+def configs() -> dict[str, dict[str, Any]]:
+    body = {f"field_{i}": {"value": i, "label": f"Field {i}"} for i in range(30)}
+    return {
+        "static_body_30_keys": {
+            "body": body,
+            "headers": {"accept": "application/json"},
+            "user": "{{ fetch.data.id }}",
+            "q": "{{ params.q }}",
+        },
+        "all_templates_10": {
+            f"slot_{i}": "{{ fetch.data.id }}" if i % 2 else "q={{ params.q }}"
+            for i in range(10)
+        },
+        "prompt_string": {
+            "prompt": "Summarise {{ fetch.url }} for {{ params.q }}",
+            "model": "small",
+            "temperature": 0.2,
+        },
+    }
+
+
+def scan_resolve(value: Any, context: Mapping[str, Any]) -> Any:
+    if isinstance(value, dict):
+        return {k: scan_resolve(v, context) for k, v in value.items()}
+    if isinstance(value, list):
+        return [scan_resolve(item, context) for item in value]
+    if isinstance(value, str):
+        full_match = TEMPLATE_PATTERN.fullmatch(value.strip())
+        if full_match:
+            return _lookup(full_match.group(1), context)
+        return TEMPLATE_PATTERN.sub(
+            lambda match: str(_lookup(match.group(1), context)), value
+        )
+    return value
+
+
+def _lookup(key: str, context: Mapping[str, Any]) -> Any:
+    root, *parts = key.split(".")
+    cursor: Any = context.get(root)
+    for part in parts:
+        cursor = cursor[part]
+    return cursor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    def best(function: Any) -> float:
+        runs = timeit.repeat(function, number=args.iterations, repeat=args.repeat)
+        return min(runs) / args.iterations
+
+    results = []
+    for name, config in configs().items():
+        plan = compile_templates(config)
+        assert plan.resolve(CONTEXT) == scan_resolve(config, CONTEXT)
+        scan = best(lambda: scan_resolve(config, CONTEXT))
+        planned = best(lambda: plan.resolve(CONTEXT))
+        results.append(
+            {
+                "config": name,
+                "scan_us": round(scan * 1e6, 2),
+                "plan_us": round(planned * 1e6, 2),
+                "speedup": round(scan / planned, 1),
+            }
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
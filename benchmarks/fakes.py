@@ -0,0 +1,25 @@
+"""In-memory Redis for benchmarks run without a real server.
+
+Uses fakeredis with Lua support from ``requirements-dev.txt``, so the engine's
+scripts run as they would on Redis.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+
+def fake_redis_clients() -> tuple[Any, Any]:
+    """A decoding state client and a bytes payload client on one fake server."""
+    try:
+        import fakeredis
+    except ImportError as exc:
+        raise SystemExit(
+            "Benchmarks without --redis-url need fakeredis[lua]: "
+            "pip install -r requirements-dev.txt"
+        ) from exc
+    server = fakeredis.FakeServer()
+    return (
+        fakeredis.FakeRedis(server=server, decode_responses=True),
+        fakeredis.FakeRedis(server=server),
+    )
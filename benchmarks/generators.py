@@ -0,0 +1,78 @@
+"""Deterministic synthetic DAGs for the benchmarks.
+
+Every generator takes a ``handler`` for all nodes and, where randomness is
+involved, a ``seed``, so the same arguments always produce the same definition.
+"""
+
+from __future__ import annotations
+
+import random
+
+from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition
+
+
+def _workflow(name: str, nodes: list[NodeDefinition]) -> WorkflowDefinition:
+    return WorkflowDefinition(name=name, dag=DAGDefinition(nodes=nodes))
+
+
+def fan_out(width: int, handler: str = "output") -> WorkflowDefinition:
+    """One root with ``width`` children, joined again by a single sink."""
+    nodes = [NodeDefinition(id="root", handler=handler)]
+    leaves = [f"leaf{i}" for i in range(width)]
+    nodes.extend(
+        NodeDefinition(id=leaf, handler=handler, dependencies=["root"])
+        for leaf in leaves
+    )
+    nodes.append(NodeDefinition(id="sink", handler=handler, dependencies=leaves))
+    return _workflow(f"fan_out_{width}", nodes)
+
+
+def chain(length: int, handler: str = "output") -> WorkflowDefinition:
+    nodes = [NodeDefinition(id="n0", handler=handler)]
+    nodes.extend(
+        NodeDefinition(id=f"n{i}", handler=handler, dependencies=[f"n{i - 1}"])
+        for i in range(1, length)
+    )
+    return _workflow(f"chain_{length}", nodes)
+
+
+def diamond(width: int, depth: int, handler: str = "output") -> WorkflowDefinition:
+    """A lattice of ``depth`` rows of ``width`` nodes between a root and a sink.
+
+    Node ``(r, c)`` depends on ``(r - 1, c)`` and ``(r - 1, c + 1)``, so every
+    row is a band of overlapping diamonds with two-parent fan-ins.
+    """
+    nodes = [NodeDefinition(id="root", handler=handler)]
+    previous = ["root"]
+    for row in range(depth):
+        current = [f"r{row}c{col}" for col in range(width)]
+        for col, node_id in enumerate(current):
+            parents = previous if row == 0 else previous[col : col + 2]
+            nodes.append(
+                NodeDefinition(id=node_id, handler=handler, dependencies=parents[:2])
+            )
+        previous = current
+    nodes.append(NodeDefinition(id="sink", handler=handler, dependencies=previous))
+    return _workflow(f"diamond_{width}x{depth}", nodes)
+
+
+def layered(
+    size: int,
+    width: int = 100,
+    max_parents: int = 3,
+    seed: int = 7,
+    handler: str = "output",
+) -> WorkflowDefinition:
+    """``size`` nodes in layers of ``width``; each picks up to ``max_parents``
+    random parents from the layer above."""
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(size):
+        previous = range(max(0, (i // width - 1) * width), (i // width) * width)
+        parents = rng.sample(previous, min(max_parents, len(previous)))
+        nodes.append(
+            NodeDefinition(
+                id=f"n{i}", handler=handler, dependencies=[f"n{p}" for p in parents]
+            )
+        )
+    return _workflow(f"layered_{size}", nodes)
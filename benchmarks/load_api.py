@@ -0,0 +1,81 @@
+"""Status-polling load test against a running API.
+
+Creates one workflow, then keeps ``--concurrency`` clients polling
+``GET /workflows/{id}`` for ``--duration`` seconds and reports requests/sec and
+latency percentiles. Run it against a build before and after a change:
+
+    uvicorn app.main:app --workers 1 &
+    python -m benchmarks.load_api --url http://localhost:8000 --nodes 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def workflow(nodes: int) -> dict:
+    dag = [{"id": "input", "handler": "input", "dependencies": []}]
+    dag.extend(
+        {"id": f"n{i}", "handler": "output", "dependencies": ["input"]}
+        for i in range(nodes - 1)
+    )
+    return {"name": "load_api", "dag": {"nodes": dag}}
+
+
+async def poll(
+    client: httpx.AsyncClient, path: str, deadline: float, latencies: list[float]
+) -> int:
+    errors = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+        except httpx.TransportError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+    return errors
+
+
+async def run(url: str, concurrency: int, duration: float, nodes: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        created = await client.post("/workflows", json=workflow(nodes))
+        created.raise_for_status()
+        path = f"/workflows/{created.json()['execution_id']}"
+
+        latencies: list[float] = []
+        deadline = time.perf_counter() + duration
+        errors = await asyncio.gather(
+            *(poll(client, path, deadline, latencies) for _ in range(concurrency))
+        )
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": len(latencies) / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1e3,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--nodes", type=int, default=50)
+    args = parser.parse_args()
+    result = asyncio.run(run(args.url, args.concurrency, args.duration, args.nodes))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
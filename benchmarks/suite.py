@@ -0,0 +1,278 @@
+"""Engine overhead on synthetic DAGs, with machine-readable results.
+
+Runs wide fan-out, deep chain, diamond lattice and random layered DAGs end to
+end through ``start_workflow`` and ``app.tasks.execute_node``. A zero-latency,
+deterministic ``bench_noop`` handler runs every node, and an in-process FIFO
+stands in for the broker, so all measured time is orchestration. For each
+scenario it reports:
+
+- end-to-end latency per execution (p50/p95/max)
+- throughput and per-node overhead
+- Redis commands and round trips per node (a pipeline or script call inside one
+  counts once as a round trip, and each queued command counts as a command)
+- tasks published per execution
+
+Results (plus commit, settings and backend) are printed as JSON or written with
+``--output``; ``--baseline`` compares against an earlier file.
+
+    python -m benchmarks.suite [--redis-url redis://localhost:6379/15] \\
+        [--output results.json] [--baseline previous.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+
+from app import leases, orchestrator, state, tasks
+from app.config import settings
+from app.graph import validate_workflow
+from app.handlers import register_handler
+from app.models import WorkflowDefinition, WorkflowStatus
+from benchmarks.fakes import fake_redis_clients
+from benchmarks.generators import chain, diamond, fan_out, layered
+
+HANDLER = "bench_noop"
+
+SCENARIOS: dict[str, Callable[[], WorkflowDefinition]] = {
+    "fan_out_1000": lambda: fan_out(1000, HANDLER),
+    "chain_200": lambda: chain(200, HANDLER),
+    "diamond_20x20": lambda: diamond(20, 20, HANDLER),
+    "layered_2000": lambda: layered(2000, width=50, handler=HANDLER),
+}
+
+# Metrics compared by --baseline; lower is better for all of them except
+# throughput.
+COMPARED = (
+    "latency_p50_ms",
+    "overhead_us_per_node",
+    "throughput_nodes_per_s",
+    "commands_per_node",
+    "round_trips_per_node",
+)
+
+
+@register_handler(HANDLER)
+def _bench_noop(
+    execution_id: str, node_id: str, config: dict[str, Any], graph
+) -> dict[str, str]:
+    return {"node": node_id}
+
+
+class CommandCounter:
+    """Client proxy that counts commands and round trips."""
+
+    def __init__(self, client: Any, counts: SimpleNamespace) -> None:
+        self._client = client
+        self.counts = counts
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name == "pipeline":
+            return lambda *args, **kwargs: _CountingPipeline(
+                self.counts, attr(*args, **kwargs)
+            )
+        if name == "register_script":
+            return lambda source: _CountingScript(self, attr(source))
+        if not callable(attr):
+            return attr
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            self.counts.commands += 1
+            self.counts.round_trips += 1
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class _CountingPipeline:
+    def __init__(self, counts: SimpleNamespace, pipe: Any) -> None:
+        self.counts = counts
+        self._pipe = pipe
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._pipe, name)
+
+        def queue(*args: Any, **kwargs: Any) -> _CountingPipeline:
+            self.counts.commands += 1
+            attr(*args, **kwargs)
+            return self
+
+        return queue
+
+    def execute(self) -> list[Any]:
+        self.counts.round_trips += 1
+        return self._pipe.execute()
+
+
+class _CountingScript:
+    def __init__(self, registered_client: CommandCounter, script: Any) -> None:
+        self.registered_client = registered_client
+        self._script = script
+
+    def __call__(self, keys: Any = (), args: Any = (), client: Any = None) -> Any:
+        counts = self.registered_client.counts
+        counts.commands += 1
+        if isinstance(client, _CountingPipeline):
+            client = client._pipe
+        else:
+            counts.round_trips += 1
+            if isinstance(client, CommandCounter):
+                client = client._client
+        return self._script(keys=keys, args=args, client=client)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, so it never falls below a lower percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def run_scenario(
+    name: str, definition: WorkflowDefinition, executions: int, counts: SimpleNamespace
+) -> dict[str, Any]:
+    graph = validate_workflow(definition)
+    broker: deque = deque()
+    orchestrator.celery_app = SimpleNamespace(
+        send_task=lambda task, args, **_: broker.append(args)
+    )
+    latencies: list[float] = []
+    published = commands = round_trips = 0
+    for index in range(executions):
+        execution_id = f"{name}-{index}"
+        state.set_workflow_definition(execution_id, definition)
+        counts.commands = counts.round_trips = 0
+        started = time.perf_counter()
+        orchestrator.start_workflow(execution_id, definition, graph, {"i": index})
+        while broker:
+            published += 1
+            tasks.execute_node.run(*broker.popleft())
+        latencies.append(time.perf_counter() - started)
+        commands += counts.commands
+        round_trips += counts.round_trips
+        status = state.get_workflow_status(execution_id)
+        if status != WorkflowStatus.COMPLETED:
+            raise RuntimeError(f"{execution_id} ended {status}")
+
+    node_runs = len(graph.nodes) * executions
+    total = sum(latencies)
+    return {
+        "scenario": name,
+        "nodes": len(graph.nodes),
+        "edges": len(graph.compact.parents),
+        "executions": executions,
+        "tasks_per_execution": published / executions,
+        "latency_p50_ms": round(statistics.median(latencies) * 1e3, 3),
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1e3, 3),
+        "latency_max_ms": round(max(latencies) * 1e3, 3),
+        "overhead_us_per_node": round(total / node_runs * 1e6, 2),
+        "throughput_nodes_per_s": round(node_runs / total, 1),
+        "commands_per_node": round(commands / node_runs, 3),
+        "round_trips_per_node": round(round_trips / node_runs, 3),
+    }
+
+
+def metadata(backend: str) -> dict[str, Any]:
+    def git(*args: str) -> str | None:
+        try:
+            return subprocess.run(
+                ["git", *args], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": backend,
+        "settings": {
+            name: getattr(settings, name)
+            for name in (
+                "state_layout",
+                "serializer",
+                "fuse_chains",
+                "inline_max_depth",
+                "publish_events",
+                "output_field_threshold",
+            )
+        },
+    }
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any]) -> None:
+    previous = {result["scenario"]: result for result in baseline["results"]}
+    print(f"{'scenario':<16} {'metric':<24} {'baseline':>12} {'current':>12}  change")
+    for result in current["results"]:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        for metric in COMPARED:
+            old, new = before[metric], result[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            print(
+                f"{result['scenario']:<16} {metric:<24} {old:>12} {new:>12}"
+                f"  {change:+.1f}%"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", help="benchmark a real server (flushes db)")
+    parser.add_argument("--executions", type=int, default=5)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--baseline", help="compare with an earlier results file")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+
+        client = redis.from_url(args.redis_url, decode_responses=True)
+        client.flushdb()
+        payload_client = redis.from_url(args.redis_url)
+        backend = "redis"
+    else:
+        client, payload_client = fake_redis_clients()
+        backend = "fakeredis"
+    counts = SimpleNamespace(commands=0, round_trips=0)
+    state._redis_client = CommandCounter(client, counts)
+    state._payload_client = CommandCounter(payload_client, counts)
+    settings.worker_mode = "prefork"
+    # Keep background lease renewals out of the command counts.
+    leases.lease_heartbeat.interval = 3600
+
+    report = {
+        "metadata": metadata(backend),
+        "results": [
+            run_scenario(name, SCENARIOS[name](), args.executions, counts)
+            for name in args.scenarios
+        ],
+    }
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline) as handle:
+            compare(json.load(handle), report)
+
+
+if __name__ == "__main__":
+    main()
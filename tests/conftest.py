@@ -3,66 +3,33 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import fakeredis
 import pytest
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from app import state  # noqa: E402
-
-
-class FakePipeline:
-    def __init__(self, store: dict):
-        self.store = store
-        self.commands = []
-
-    def set(self, key, value, nx=False, ex=None):  # noqa: ANN001
-        if nx and key in self.store:
-            self.commands.append(False)
-            return self
-        self.store[key] = value
-        self.commands.append(True)
-        return self
-
-    def delete(self, key):  # noqa: ANN001
-        self.store.pop(key, None)
-        self.commands.append(True)
-        return self
-
-    def get(self, key):  # noqa: ANN001
-        value = self.store.get(key)
-        self.commands.append(value)
-        return self
-
-    def execute(self):
-        output = list(self.commands)
-        self.commands = []
-        return output
-
-
-class FakeRedis:
-    def __init__(self):
-        self.store = {}
-
-    def set(self, key, value, nx=False, ex=None):  # noqa: ANN001
-        if nx and key in self.store:
-            return False
-        self.store[key] = value
-        return True
-
-    def get(self, key):  # noqa: ANN001
-        return self.store.get(key)
-
-    def delete(self, key):  # noqa: ANN001
-        self.store.pop(key, None)
-
-    def pipeline(self):
-        return FakePipeline(self.store)
+from app import async_state, metrics, state  # noqa: E402
+from app.graph import graph_cache  # noqa: E402
 
 
 @pytest.fixture(autouse=True)
 def fake_redis(monkeypatch):
-    client = FakeRedis()
+    """fakeredis with Lua support (lupa), so the engine's real scripts run.
+
+    Yields the decoding client; outputs and params go through a bytes client on
+    the same server, as with ``get_payload_redis()`` against Redis.
+    """
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
     state._redis_client = client
+    state._payload_client = fakeredis.FakeRedis(server=server)
+    async_state._redis_client = fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=True
+    )
+    async_state._payload_client = fakeredis.FakeAsyncRedis(server=server)
+    graph_cache.clear()
+    monkeypatch.setattr(metrics.recorder, "_pending", {})
+    monkeypatch.setattr(metrics.recorder, "_graph_cache_flushed", {"hit": 0, "miss": 0})
     yield client
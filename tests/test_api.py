@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+
+import pytest
 from fastapi.testclient import TestClient
 
 from app import state
 from app.main import app
-from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition, WorkflowStatus
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    NodeStatus,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
 
 
 def sample_workflow() -> WorkflowDefinition:
@@ -15,8 +24,14 @@ def sample_workflow() -> WorkflowDefinition:
     return WorkflowDefinition(name="api_test", dag=DAGDefinition(nodes=nodes))
 
 
-def test_create_and_trigger_workflow(monkeypatch):
-    client = TestClient(app)
+@pytest.fixture
+def client():
+    # One event loop for the whole test, as in a running server.
+    with TestClient(app) as client:
+        yield client
+
+
+def test_create_and_trigger_workflow(client, monkeypatch):
     wf = sample_workflow()
 
     # Create workflow
@@ -41,8 +56,7 @@ def test_create_and_trigger_workflow(monkeypatch):
     assert triggered["params"] == {"x": 1}
 
 
-def test_results_endpoint_reflects_state():
-    client = TestClient(app)
+def test_results_endpoint_reflects_state(client):
     wf = sample_workflow()
     response = client.post("/workflows", json=wf.model_dump())
     execution_id = response.json()["execution_id"]
@@ -58,3 +72,74 @@ def test_results_endpoint_reflects_state():
     data = res.json()
     assert data["status"] == "COMPLETED"
     assert data["results"]["input"] == {"hello": "world"}
+
+
+def test_status_endpoint_reads_node_statuses(client):
+    response = client.post("/workflows", json=sample_workflow().model_dump())
+    execution_id = response.json()["execution_id"]
+    state.init_workflow_state(execution_id, sample_workflow(), {})
+    state.complete_node(execution_id, "input", {"x": 1}, ["output"], 2)
+
+    res = client.get(f"/workflows/{execution_id}")
+    assert res.status_code == 200
+    assert res.json()["status"] == "RUNNING"
+    assert res.json()["node_statuses"] == {"input": "COMPLETED", "output": "PENDING"}
+    assert client.get("/workflows/unknown").status_code == 404
+
+
+def test_batch_endpoint_creates_and_starts_executions(client, monkeypatch):
+    sent: list[tuple[str, str, dict]] = []
+
+    class FakeCelery:
+        @staticmethod
+        @contextmanager
+        def producer_or_acquire():
+            yield "producer"
+
+        @staticmethod
+        def send_task(
+            name, args, producer=None, queue=None, priority=None
+        ):  # noqa: ANN001
+            assert producer == "producer"
+            assert queue == "cpu"
+            assert 0 <= priority <= 9
+            sent.append((args[0], args[1], args[3]))
+
+    monkeypatch.setattr("app.orchestrator.celery_app", FakeCelery)
+    wf = sample_workflow()
+    wf.dag.nodes[0].config = {"user": "{{ params.user }}"}
+
+    res = client.post(
+        "/workflows/batch",
+        json={
+            "definition": wf.model_dump(),
+            "params": [{"user": 1}, {"user": 2}, {}],
+        },
+    )
+    assert res.status_code == 200
+    ok_1, ok_2, broken = res.json()["execution_ids"]
+    assert sent == [(ok_1, "input", {"user": 1}), (ok_2, "input", {"user": 2})]
+    assert state.get_workflow_status(ok_1) == WorkflowStatus.RUNNING
+    assert state.get_node_status(ok_1, "input") == NodeStatus.RUNNING
+    assert state.get_params(ok_2) == {"user": 2}
+    assert state.get_workflow_status(broken) == WorkflowStatus.FAILED
+    assert client.get(f"/workflows/{ok_1}").json()["node_statuses"] == {
+        "input": "RUNNING",
+        "output": "PENDING",
+    }
+
+
+def test_registered_definition_executions(client):
+    wf = sample_workflow()
+    definition_id = client.post("/definitions", json=wf.model_dump()).json()[
+        "definition_id"
+    ]
+    assert client.get(f"/definitions/{definition_id}").json() == wf.model_dump()
+
+    created = client.post(f"/definitions/{definition_id}/executions")
+    assert created.status_code == 200
+    execution_id = created.json()["execution_id"]
+    assert state.get_definition_pointer(execution_id) == f"ref:{definition_id}"
+    status = client.get(f"/workflows/{execution_id}").json()
+    assert status["node_statuses"] == {"input": "PENDING", "output": "PENDING"}
+    assert client.post("/definitions/unknown/executions").status_code == 404
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import time
+
+from fastapi.testclient import TestClient
+
+from app import blobstore, state
+from app.archive import retire_finished_executions, sweep_orphaned_blobs
+from app.config import settings
+from app.main import app
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
+
+
+def finished_execution(execution_id: str) -> WorkflowDefinition:
+    nodes = [
+        NodeDefinition(id="input", handler="input"),
+        NodeDefinition(id="output", handler="output", dependencies=["input"]),
+    ]
+    wf = WorkflowDefinition(name="archive", dag=DAGDefinition(nodes=nodes))
+    state.set_workflow_definition(execution_id, wf)
+    state.init_workflow_state(execution_id, wf, {"x": 1})
+    state.complete_node(execution_id, "input", {"x": 1}, ["output"], 2)
+    state.complete_node(execution_id, "output", {"final": 1}, [], 2)
+    return wf
+
+
+def test_finished_executions_get_retention_ttl(fake_redis):
+    wf = finished_execution("done")
+    state.set_workflow_definition("live", wf)
+    state.init_workflow_state("live", wf, {})
+    assert [eid for eid, _ in state.finished_executions(time.time(), 10)] == ["done"]
+
+    assert retire_finished_executions(time.time()) == 0
+    assert retire_finished_executions(time.time() + settings.archive_delay) == 1
+    assert fake_redis.ttl(state.params_key("done")) == settings.execution_ttl
+    assert fake_redis.ttl(state.params_key("live")) == -1
+    assert state.finished_executions(time.time() + 3600, 10) == []
+
+
+def test_archived_executions_leave_redis_and_stay_readable(
+    monkeypatch, fake_redis, tmp_path
+):
+    monkeypatch.setattr(settings, "archive_path", str(tmp_path / "archive.db"))
+    finished_execution("done")
+    retire_finished_executions(time.time() + settings.archive_delay)
+    assert fake_redis.keys("wf:done:*") == []
+
+    with TestClient(app) as client:
+        status = client.get("/workflows/done").json()
+        assert status["status"] == WorkflowStatus.COMPLETED.value
+        assert status["node_statuses"] == {"input": "COMPLETED", "output": "COMPLETED"}
+        results = client.get("/workflows/done/results").json()
+        assert results["results"] == {"input": {"x": 1}, "output": {"final": 1}}
+        assert client.get("/workflows/missing").status_code == 404
+
+
+def test_retired_executions_release_shared_blobs(monkeypatch, fake_redis, tmp_path):
+    monkeypatch.setattr(settings, "archive_path", str(tmp_path / "archive.db"))
+    monkeypatch.setattr(settings, "blob_store_path", str(tmp_path / "blobs"))
+    monkeypatch.setattr(settings, "blob_offload_threshold", 64)
+    monkeypatch.setattr(blobstore, "_blob_store", None)
+    big = {"text": "x" * 1000}
+    digest = blobstore.blob_digest(state.encode_payload(big))
+    path = tmp_path / "blobs" / digest[:2] / digest
+    wf = finished_execution("first")
+    finished_execution("second")
+    for execution_id in ("first", "second"):
+        state.store_node_output(execution_id, "input", big)
+    assert fake_redis.hget(state.BLOB_REFS_KEY, digest) == "2"
+
+    now = time.time() + settings.archive_delay
+    state.forget_finished_execution("second")
+    retire_finished_executions(now)
+    assert fake_redis.hget(state.BLOB_REFS_KEY, digest) == "1"
+    assert sweep_orphaned_blobs(now + settings.blob_grace_period) == 0
+
+    # A straggler finishing after retirement writes nothing back.
+    state.complete_node("first", "output", big, [], len(wf.dag.nodes))
+    assert fake_redis.keys("wf:first:*") == []
+
+    fake_redis.zadd(state.FINISHED_EXECUTIONS_KEY, {"second": 0})
+    retire_finished_executions(now)
+    assert fake_redis.hget(state.BLOB_REFS_KEY, digest) is None
+    assert path.exists()
+    assert sweep_orphaned_blobs(now) == 0
+    assert sweep_orphaned_blobs(now + settings.blob_grace_period) == 1
+    assert not path.exists()
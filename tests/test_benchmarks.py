@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+import statistics
+
+from benchmarks.suite import percentile
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(100, 0, -1)]
+    assert percentile(values, 0.95) == 95.0
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 1.0) == 100.0
+    assert percentile([3.0], 0.95) == 3.0
+    # Two runs: the old floor index picked the fastest, below the median.
+    assert percentile([1.0, 10.0], 0.95) == 10.0 >= statistics.median([1.0, 10.0])
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app import blobstore, state
+from app.config import settings
+from app.models import DAGDefinition, NodeDefinition, NodeStatus, WorkflowDefinition
+from app.tasks import execute_node
+
+
+@pytest.fixture
+def blob_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "blob_store_path", str(tmp_path))
+    monkeypatch.setattr(settings, "blob_offload_threshold", 64)
+    monkeypatch.setattr(blobstore, "_blob_store", None)
+    return tmp_path
+
+
+def test_large_output_is_offloaded_and_read_transparently(blob_dir, fake_redis):
+    big = {"text": "x" * 1000}
+    state.store_node_output("exec", "a", big)
+    state.store_node_output("exec", "small", {"v": 1})
+
+    raw = fake_redis.get(state.node_output_key("exec", "a"))
+    assert blobstore.is_blob_reference(raw)
+    assert len(raw) < 100
+    assert len(list(blob_dir.rglob("*"))) == 2  # shard dir + blob
+    assert state.get_node_output("exec", "a") == big
+    assert not blobstore.is_blob_reference(
+        fake_redis.get(state.node_output_key("exec", "small"))
+    )
+
+
+def test_blob_store_is_content_addressed(blob_dir):
+    store = blobstore.get_blob_store()
+    digest = store.put(b"payload")
+    assert store.put(b"payload") == digest
+    assert store.get(digest) == b"payload"
+
+    # Storing a blob again marks it reused, so a sweep started earlier keeps it.
+    assert not store.delete(digest, older_than=time.time() - 60)
+    assert store.delete(digest)
+    assert not (blob_dir / digest[:2] / digest).exists()
+
+
+def test_zstd_blobs_need_zstandard_to_write_and_read(monkeypatch):
+    monkeypatch.setattr(blobstore, "zstandard", None)
+    for call in (
+        lambda: blobstore.compress(b"payload", "zstd"),
+        lambda: blobstore.decompress(b"s\x28\xb5\x2f\xfd"),
+    ):
+        with pytest.raises(RuntimeError, match="zstandard"):
+            call()
+    with pytest.raises(TypeError):
+        blobstore.BlobStore()
+
+
+def test_dispatch_inputs_only_decode_referenced_parents(blob_dir, monkeypatch):
+    state.store_node_output("exec", "a", {"text": "a" * 1000})
+    state.store_node_output("exec", "b", {"text": "b" * 1000})
+    fetched: list[str] = []
+    original_get = blobstore.LocalBlobStore.get
+    monkeypatch.setattr(
+        blobstore.LocalBlobStore,
+        "get",
+        lambda self, digest: fetched.append(digest) or original_get(self, digest),
+    )
+
+    _, outputs = state.get_dispatch_inputs("exec", ["a", "b"])
+    assert outputs["a"]["text"].startswith("a")
+    assert len(fetched) == 1
+
+
+def test_execute_node_keeps_offloaded_output_out_of_result(blob_dir, monkeypatch):
+    nodes = [NodeDefinition(id="input", handler="input", dependencies=[])]
+    wf = WorkflowDefinition(name="blob", dag=DAGDefinition(nodes=nodes))
+    state.set_workflow_definition("exec", wf)
+    state.init_workflow_state("exec", wf, {"text": "y" * 1000})
+
+    result = execute_node("exec", "input", "input", {})
+    assert set(result) == {"blob"}
+    assert state.get_node_status("exec", "input") == NodeStatus.COMPLETED
+    assert state.get_node_output("exec", "input") == {"text": "y" * 1000}
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from app import events, state
+from app.models import DAGDefinition, NodeDefinition, NodeStatus, WorkflowDefinition
+
+
+def sample_workflow() -> WorkflowDefinition:
+    nodes = [
+        NodeDefinition(id="input", handler="input", dependencies=[]),
+        NodeDefinition(id="output", handler="output", dependencies=["input"]),
+    ]
+    return WorkflowDefinition(name="events_test", dag=DAGDefinition(nodes=nodes))
+
+
+def test_state_transitions_are_published(fake_redis):
+    pubsub = fake_redis.pubsub()
+    pubsub.subscribe(state.events_channel("exec"))
+    state.init_workflow_state("exec", sample_workflow(), {})
+    state.set_node_status("exec", "input", NodeStatus.RUNNING)
+    state.complete_node("exec", "input", {}, ["output"], 2)
+
+    messages = [
+        json.loads(message["data"])
+        for message in iter(lambda: pubsub.get_message(timeout=0.1), None)
+        if message["type"] == "message"
+    ]
+    assert messages == [
+        {"type": "workflow", "status": "RUNNING"},
+        {"type": "node", "node_id": "input", "status": "RUNNING"},
+        {"type": "node", "node_id": "input", "status": "COMPLETED"},
+    ]
+
+
+def test_stream_execution_yields_snapshot_then_transitions(monkeypatch):
+    monkeypatch.setattr(events, "hub", events.EventHub())
+    wf = sample_workflow()
+    state.set_workflow_definition("exec", wf)
+    state.init_workflow_state("exec", wf, {})
+
+    async def scenario() -> list[dict]:
+        watchers = [events.stream_execution("exec") for _ in range(2)]
+        received = [[await watcher.__anext__()] for watcher in watchers]
+        state.complete_node("exec", "input", {}, ["output"], 2)
+        state.complete_node("exec", "output", {}, [], 2)
+        for watcher, seen in zip(watchers, received):
+            seen.extend([event async for event in watcher])
+        assert received[0] == received[1]
+        assert events.hub._subscribers == {}
+        return received[0]
+
+    received = asyncio.run(scenario())
+    assert received[0]["type"] == "snapshot"
+    assert received[0]["node_statuses"] == {"input": "PENDING", "output": "PENDING"}
+    assert [event.get("node_id") or event["status"] for event in received[1:]] == [
+        "input",
+        "output",
+        "COMPLETED",
+    ]
+
+
+def test_reader_resubscribes_every_channel_after_a_connection_error(monkeypatch):
+    monkeypatch.setattr(events, "RECONNECT_DELAY", 0.01)
+    hub = events.EventHub()
+
+    async def scenario() -> list[dict]:
+        queues = [await hub.subscribe(execution_id) for execution_id in ("a", "b")]
+        broken = hub._pubsub
+
+        async def fail(**_: object) -> None:
+            raise ConnectionError("connection reset")
+
+        broken.get_message = fail
+        while hub._pubsub is None or hub._pubsub is broken:
+            await asyncio.sleep(0.01)
+        assert set(hub._pubsub.channels) == {
+            state.events_channel("a"),
+            state.events_channel("b"),
+        }
+        assert broken.connection is None
+
+        state.set_node_status("b", "n", NodeStatus.RUNNING)
+        event = await asyncio.wait_for(queues[1].get(), 1)
+        for execution_id, queue in zip(("a", "b"), queues):
+            await hub.unsubscribe(execution_id, queue)
+        await hub._reader
+        return event
+
+    event = asyncio.run(scenario())
+    assert event == {"type": "node", "node_id": "n", "status": "RUNNING"}
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+
 import pytest
 
-from app.graph import validate_workflow
+from app import async_state, state
+from app.graph import PRIORITY_LEVELS, GraphCache, graph_cache, validate_workflow
 from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition
+from app.orchestrator import load_workflow_graph
 
 
 def _workflow_from_nodes(nodes):
@@ -31,3 +35,153 @@ def test_missing_dependency_rejected():
     workflow = _workflow_from_nodes(nodes)
     with pytest.raises(ValueError):
         validate_workflow(workflow)
+
+
+def test_graph_cache_evicts_least_recently_used():
+    cache = GraphCache(maxsize=2)
+    graph = validate_workflow(
+        _workflow_from_nodes([NodeDefinition(id="a", handler="input")])
+    )
+    cache.put("d1", graph)
+    cache.put("d2", graph)
+    assert cache.get("d1") is graph
+    cache.put("d3", graph)
+    assert cache.get("d2") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_load_workflow_graph_reuses_cache_and_follows_redefinition():
+    nodes = [NodeDefinition(id="a", handler="input")]
+    state.set_workflow_definition("exec", _workflow_from_nodes(nodes))
+
+    first = load_workflow_graph("exec")
+    assert load_workflow_graph("exec") is first
+    assert graph_cache.stats()["hits"] == 1
+
+    nodes.append(NodeDefinition(id="b", handler="output", dependencies=["a"]))
+    state.set_workflow_definition("exec", _workflow_from_nodes(nodes))
+    refreshed = load_workflow_graph("exec")
+    assert refreshed is not first
+    assert set(refreshed.nodes) == {"a", "b"}
+    assert load_workflow_graph("missing") is None
+
+
+def test_executions_share_registered_definition():
+    workflow = _workflow_from_nodes([NodeDefinition(id="a", handler="input")])
+    first_id = state.set_workflow_definition("e1", workflow)
+    assert state.set_workflow_definition("e2", workflow) == first_id
+    assert state.get_definition_pointer("e1") == f"ref:{first_id}"
+    assert state.get_workflow_definition("e2") == workflow
+    registered = state.get_redis().keys("*definitions*")
+    assert registered == [state.registered_definition_key(first_id)]
+
+    graph = load_workflow_graph("e1")
+    assert load_workflow_graph("e2") is graph
+
+
+def test_legacy_inline_definition_still_loads():
+    workflow = _workflow_from_nodes([NodeDefinition(id="a", handler="input")])
+    state.get_redis().set(
+        state.workflow_definition_key("legacy"), workflow.model_dump_json()
+    )
+    assert state.get_workflow_definition("legacy") == workflow
+    assert set(load_workflow_graph("legacy").nodes) == {"a"}
+
+
+def test_async_load_workflow_graph_matches_sync_loader(fake_redis):
+    workflow = _workflow_from_nodes([NodeDefinition(id="a", handler="input")])
+    state.set_workflow_definition("registered", workflow)
+    fake_redis.set(state.workflow_definition_key("inline"), workflow.model_dump_json())
+
+    async def load(*execution_ids: str) -> list:
+        return [await async_state.load_workflow_graph(eid) for eid in execution_ids]
+
+    registered, inline, missing = asyncio.run(load("registered", "inline", "missing"))
+    assert registered is load_workflow_graph("registered")
+    assert inline is load_workflow_graph("inline")
+    assert missing is None
+
+
+def test_fusible_chains_detected():
+    nodes = [
+        NodeDefinition(id="a", handler="input"),
+        NodeDefinition(id="b", handler="output", dependencies=["a"]),
+        NodeDefinition(id="c", handler="output", dependencies=["b"]),
+        NodeDefinition(id="d", handler="output", dependencies=["c"]),
+        NodeDefinition(id="e", handler="output", dependencies=["c"]),
+        NodeDefinition(id="f", handler="output", dependencies=["e", "d"]),
+        NodeDefinition(id="g", handler="output", dependencies=["f"]),
+    ]
+    graph = validate_workflow(_workflow_from_nodes(nodes))
+    assert graph.chains == {"a": ["a", "b", "c"], "f": ["f", "g"]}
+
+
+def test_long_chain_validates_iteratively_with_order_and_depth():
+    nodes = [NodeDefinition(id="n0", handler="input")]
+    nodes.extend(
+        NodeDefinition(id=f"n{i}", handler="output", dependencies=[f"n{i - 1}"])
+        for i in range(1, 5000)
+    )
+    graph = validate_workflow(_workflow_from_nodes(nodes))
+    assert graph.topological_order[:2] == ["n0", "n1"]
+    assert graph.depth("n4999") == 4999
+    assert graph.roots == ["n0"]
+    assert graph.adjacency["n0"] == ["n1"]
+    assert graph.parents.get("n0", []) == []
+
+
+def test_cycle_error_names_a_node_on_the_cycle():
+    nodes = [
+        NodeDefinition(id="root", handler="input"),
+        NodeDefinition(id="a", handler="output", dependencies=["root", "c"]),
+        NodeDefinition(id="b", handler="output", dependencies=["a"]),
+        NodeDefinition(id="c", handler="output", dependencies=["b"]),
+        NodeDefinition(id="d", handler="output", dependencies=["c"]),
+    ]
+    with pytest.raises(ValueError, match="Cycle detected involving node [abc]$"):
+        validate_workflow(_workflow_from_nodes(nodes))
+
+
+def _branches() -> WorkflowDefinition:
+    # "long" heads three nodes on its way to the sink, "short" only one.
+    return _workflow_from_nodes(
+        [
+            NodeDefinition(id="a", handler="input"),
+            NodeDefinition(id="long", handler="output", dependencies=["a"]),
+            NodeDefinition(id="long2", handler="output", dependencies=["long"]),
+            NodeDefinition(id="short", handler="llm_generate", dependencies=["a"]),
+            NodeDefinition(
+                id="sink", handler="output", dependencies=["long2", "short"]
+            ),
+        ]
+    )
+
+
+def test_priorities_follow_longest_downstream_path():
+    graph = validate_workflow(_branches())
+    assert graph.priorities["a"] >= graph.priorities["long"]
+    assert graph.priorities["long"] > graph.priorities["short"]
+    assert graph.priorities["sink"] == min(graph.priorities.values())
+
+
+def test_priorities_compare_across_graph_sizes():
+    small = validate_workflow(_branches())
+    chain = [NodeDefinition(id="n0", handler="input")]
+    chain += [
+        NodeDefinition(id=f"n{i}", handler="output", dependencies=[f"n{i - 1}"])
+        for i in range(1, 200)
+    ]
+    large = validate_workflow(_workflow_from_nodes(chain))
+    # Sinks, and nodes with equally long paths ahead, rank the same in both.
+    assert large.priorities["n199"] == small.priorities["sink"]
+    assert large.priorities["n197"] == small.priorities["long"]
+    assert large.priorities["n0"] == PRIORITY_LEVELS - 1 > small.priorities["a"]
+
+
+def test_weighted_priorities_favour_slow_handlers_and_cache_by_identity():
+    graph = validate_workflow(_branches())
+    seconds = {"output": 1.0, "llm_generate": 10.0}
+    weighted = graph.weighted_priorities(seconds)
+    assert weighted["short"] > weighted["long"]
+    assert graph.weighted_priorities(seconds) is weighted
+    assert graph.weighted_priorities({}) == graph.priorities
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-from app.handlers import execute_handler
+import asyncio
+
+import pytest
+
+from app.handlers import execute_handler, get_handler, register_handler
+from app.orchestrator import HARD_TIME_LIMIT_GRACE, _task_options
 
 
 def test_call_external_service_mock(monkeypatch):
@@ -18,3 +23,39 @@ def test_call_external_service_mock(monkeypatch):
     assert output["status"] == "ok"
     assert output["url"] == "http://example.test"
     assert output["data"]["mock"] is True
+
+
+def test_registered_handlers_declare_queues_and_timeouts():
+    assert get_handler("input").queue == "cpu"
+    assert get_handler("llm_generate").queue == "llm"
+    assert get_handler("call_external_service").timeout == 30
+    with pytest.raises(ValueError):
+        get_handler("missing")
+    with pytest.raises(ValueError):
+        register_handler("bad", queue="gpu")
+
+
+def test_custom_handler_routing_and_timeout(monkeypatch):
+    monkeypatch.setattr("app.handlers.HANDLERS", {})
+
+    @register_handler("slow_io", queue="io", timeout=0.01, connections=10)
+    async def slow_io(execution_id, node_id, config, graph):  # noqa: ANN001
+        await asyncio.sleep(1)
+
+    assert get_handler("slow_io").hints == {"connections": 10}
+    assert _task_options("slow_io") == {
+        "queue": "io",
+        "soft_time_limit": 0.01,
+        "time_limit": 0.01 + HARD_TIME_LIMIT_GRACE,
+    }
+    assert _task_options("unknown") == {}
+    # A fused chain gets the summed timeouts even if some members set none.
+    register_handler("untimed", queue="cpu")(lambda *_: None)
+    assert _task_options("untimed", "slow_io", "slow_io") == {
+        "queue": "io",
+        "soft_time_limit": 0.02,
+        "time_limit": 0.02 + HARD_TIME_LIMIT_GRACE,
+    }
+    assert _task_options("untimed") == {"queue": "cpu"}
+    with pytest.raises(asyncio.TimeoutError):
+        execute_handler("exec", "node", "slow_io", {}, graph=None)
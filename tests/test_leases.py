@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app import state
+from app.celery_app import message_priority
+from app.config import settings
+from app.graph import validate_workflow
+from app.leases import lease_heartbeat, reap_expired_leases
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    NodeStatus,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
+from app.orchestrator import HARD_TIME_LIMIT_GRACE, on_node_success, start_workflow
+
+
+@pytest.fixture
+def published(monkeypatch):
+    monkeypatch.setattr(settings, "inline_max_depth", 0)
+    sent: list[tuple[str, dict]] = []
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app",
+        type(
+            "obj",
+            (),
+            {
+                "send_task": staticmethod(
+                    lambda name, args, **options: sent.append((args[1], options))
+                )
+            },
+        ),
+    )
+    return sent
+
+
+def started_workflow(execution_id: str):  # noqa: ANN201
+    nodes = [
+        NodeDefinition(id="input", handler="input"),
+        NodeDefinition(
+            id="fetch", handler="call_external_service", dependencies=["input"]
+        ),
+    ]
+    workflow = WorkflowDefinition(name="leases", dag=DAGDefinition(nodes=nodes))
+    graph = validate_workflow(workflow)
+    state.set_workflow_definition(execution_id, workflow)
+    start_workflow(execution_id, workflow, graph, params={})
+    return graph
+
+
+def lease_deadline(fake_redis, execution_id: str, node_id: str):  # noqa: ANN001, ANN201
+    return fake_redis.zscore(
+        state.NODE_LEASES_KEY, state.lease_member(execution_id, node_id)
+    )
+
+
+def test_running_nodes_hold_leases_until_completion(published, fake_redis):
+    graph = started_workflow("lease-1")
+    assert lease_deadline(fake_redis, "lease-1", "input") > time.time()
+
+    on_node_success("lease-1", "input", {}, graph)
+    assert lease_deadline(fake_redis, "lease-1", "input") is None
+    state.start_node_run("lease-1", "fetch")
+    before = lease_deadline(fake_redis, "lease-1", "fetch")
+
+    with lease_heartbeat.hold("lease-1", "fetch"):
+        time.sleep(0.01)
+        lease_heartbeat.beat()
+    assert lease_deadline(fake_redis, "lease-1", "fetch") > before
+
+
+def test_queued_nodes_outlast_the_running_lease(published, fake_redis):
+    started_workflow("lease-q")
+    queued = lease_deadline(fake_redis, "lease-q", "input")
+    assert queued >= time.time() + settings.node_dispatch_ttl - 1
+    assert reap_expired_leases(time.time() + settings.node_lease_ttl + 1) == 0
+
+    # A worker taking the node shortens the lease to the heartbeat TTL.
+    assert state.start_node_run("lease-q", "input")[0] == NodeStatus.RUNNING
+    assert lease_deadline(fake_redis, "lease-q", "input") < queued
+    assert reap_expired_leases(time.time() + settings.node_lease_ttl + 1) == 1
+
+    # Finished nodes are not given a lease back.
+    state.set_node_status("lease-q", "input", NodeStatus.COMPLETED)
+    state.start_node_run("lease-q", "input")
+    assert lease_deadline(fake_redis, "lease-q", "input") is None
+
+
+def test_reaper_redispatches_with_backoff_then_fails(published, fake_redis):
+    graph = started_workflow("lease-2")
+    # "input" heads the fused input -> fetch chain, limited by fetch's timeout.
+    options = {
+        "queue": "io",
+        "soft_time_limit": 30,
+        "time_limit": 30 + HARD_TIME_LIMIT_GRACE,
+        "priority": message_priority(graph.priorities["input"]),
+    }
+    published.clear()
+    now = time.time() + settings.node_dispatch_ttl + 1
+
+    assert reap_expired_leases(now) == 1
+    assert published == [
+        (
+            "input",
+            {**options, "countdown": 1.0},
+        )
+    ]
+    assert lease_deadline(fake_redis, "lease-2", "input") == (
+        now + 1.0 + settings.node_dispatch_ttl
+    )
+    assert reap_expired_leases(now) == 0
+
+    now += settings.node_dispatch_ttl + 100
+    reap_expired_leases(now)
+    assert published[-1] == (
+        "input",
+        {**options, "countdown": 2.0},
+    )
+    now += settings.node_dispatch_ttl + 100
+    reap_expired_leases(now)
+    assert len(published) == 2
+    assert state.get_node_status("lease-2", "input") == NodeStatus.FAILED
+    assert state.get_workflow_status("lease-2") == WorkflowStatus.FAILED
+    assert lease_deadline(fake_redis, "lease-2", "input") is None
+
+
+def test_reaper_drops_leases_of_finished_nodes(published, fake_redis):
+    started_workflow("lease-3")
+    state.set_workflow_status("lease-3", WorkflowStatus.FAILED)
+    published.clear()
+
+    assert reap_expired_leases(time.time() + settings.node_dispatch_ttl + 1) == 1
+    assert published == []
+    assert lease_deadline(fake_redis, "lease-3", "input") is None
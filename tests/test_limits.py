@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app import handlers, limits, state
+from app.graph import validate_workflow
+from app.handlers import handler_limits, parse_handler_limits, register_handler
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    NodeStatus,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
+from app.orchestrator import fused_chain, start_workflow
+from app.tasks import execute_node
+
+
+@register_handler("limited_fetch", queue="io", max_in_flight=2)
+def _limited_fetch(execution_id, node_id, config, graph):  # noqa: ANN001, ANN201
+    return {"node": node_id}
+
+
+@register_handler("throttled_fetch", queue="io", rate_limit=1, per_host=True)
+def _throttled_fetch(execution_id, node_id, config, graph):  # noqa: ANN001, ANN201
+    return {"node": node_id}
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    published: list[list] = []
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app.send_task",
+        lambda name, args, **_: published.append(args),
+    )
+    return published
+
+
+def fan_out(
+    execution_id: str, handler: str, width: int, config: dict | None = None
+) -> None:
+    nodes = [NodeDefinition(id="input", handler="input")]
+    nodes += [
+        NodeDefinition(
+            id=f"n{i}", handler=handler, dependencies=["input"], config=config or {}
+        )
+        for i in range(width)
+    ]
+    wf = WorkflowDefinition(name="limits", dag=DAGDefinition(nodes=nodes))
+    state.set_workflow_definition(execution_id, wf)
+    start_workflow(execution_id, wf, validate_workflow(wf), {})
+
+
+def test_max_in_flight_defers_nodes_and_hands_slots_over(fake_redis, sent):
+    fan_out("capped", "limited_fetch", 3)
+    first, second, third = sent
+    assert limits.acquire(*first) and limits.acquire(*second)
+
+    # The third node is deferred: the worker returns without running it.
+    assert execute_node(*third) == {}
+    assert state.get_node_status("capped", "n2") == NodeStatus.RUNNING
+    member = state.lease_member("capped", "n2")
+    assert fake_redis.zscore(state.NODE_LEASES_KEY, member) is None
+    assert fake_redis.zcard("wf:limit:limited_fetch:deferred") == 1
+
+    # Finishing a node hands its slot to the deferred one and publishes it.
+    sent.clear()
+    execute_node(*first)
+    assert sent == [third]
+    assert fake_redis.zscore(state.NODE_LEASES_KEY, member) is not None
+    assert fake_redis.zcard("wf:limit:limited_fetch:running") == 2
+    assert fake_redis.zscore(limits.LIMITS_DUE_KEY, "limited_fetch") is None
+
+    execute_node(*third)
+    execute_node(*second)
+    assert state.get_workflow_status("capped") == WorkflowStatus.COMPLETED
+    assert fake_redis.zcard("wf:limit:limited_fetch:running") == 0
+
+
+def test_newcomers_queue_behind_due_deferred_nodes(fake_redis, sent):
+    fan_out("first", "limited_fetch", 3)
+    first, second, third = sent
+    assert limits.acquire(*first) and limits.acquire(*second)
+    assert execute_node(*third) == {}
+
+    # A slot frees without a handoff (its holder died); a newcomer must not
+    # take it ahead of the node that has waited longer.
+    running = "wf:limit:limited_fetch:running"
+    fake_redis.zrem(running, state.lease_member("first", "n0"))
+    sent.clear()
+    fan_out("late", "limited_fetch", 1)
+    newcomer = sent.pop()
+    assert execute_node(*newcomer) == {}
+    assert sent == [third]
+    assert fake_redis.zscore(running, state.lease_member("first", "n2")) is not None
+    deferred = fake_redis.zrange("wf:limit:limited_fetch:deferred", 0, -1)
+    assert deferred == [state.lease_member("late", "n0")]
+
+
+def test_handler_limits_are_validated_when_parsed():
+    assert parse_handler_limits("") == {}
+    for raw in ("{", "[]", '{"a": 1}', '{"a": {"rate": 1}}', '{"a": {"burst": 0}}'):
+        with pytest.raises(ValueError, match="HANDLER_LIMITS"):
+            parse_handler_limits(raw)
+
+
+def test_rate_limit_is_per_host_and_promoted_when_tokens_are_due(
+    fake_redis, sent, monkeypatch
+):
+    clock = [1000.0]
+    monkeypatch.setattr(limits.time, "time", lambda: clock[0])
+    fan_out("rated", "throttled_fetch", 2, {"url": "https://a.example/x"})
+    fan_out("other", "throttled_fetch", 1, {"url": "https://b.example/x"})
+    a0, a1, b0 = sent
+    sent.clear()
+
+    execute_node(*a0)
+    execute_node(*b0)
+    assert execute_node(*a1) == {}
+    assert state.get_workflow_status("other") == WorkflowStatus.COMPLETED
+    # Each host has its own bucket; a.example's next token is due in a second.
+    assert fake_redis.zscore(limits.LIMITS_DUE_KEY, "throttled_fetch@a.example") == 1001
+
+    assert limits.promote_due() == 0
+    clock[0] = 1001.0
+    assert limits.promote_due() == 1
+    assert sent == [a1]
+    execute_node(*a1)
+    assert state.get_workflow_status("rated") == WorkflowStatus.COMPLETED
+
+
+def test_limits_skip_unlimited_handlers_and_unfuse_chains(monkeypatch, fake_redis):
+    assert limits.acquire("x", "n", "call_external_service", {}) is None
+    assert fake_redis.keys("wf:limit*") == []
+
+    monkeypatch.setattr(
+        handlers,
+        "_limit_overrides",
+        parse_handler_limits(
+            json.dumps({"call_external_service": {"max_in_flight": 5}})
+        ),
+    )
+    assert handler_limits("call_external_service").max_in_flight == 5
+    chain = [
+        NodeDefinition(id="fetch", handler="call_external_service"),
+        NodeDefinition(
+            id="generate",
+            handler="llm_generate",
+            dependencies=["fetch"],
+            config={"prompt": "{{ fetch.url }}"},
+        ),
+    ]
+    graph = validate_workflow(
+        WorkflowDefinition(name="chain", dag=DAGDefinition(nodes=chain))
+    )
+    assert graph.chains and fused_chain(graph, "fetch") is None
+
+    with pytest.raises(ValueError):
+        register_handler("inline_limited", inline=True, max_in_flight=1)
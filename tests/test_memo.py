@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from app import handlers, memo, state
+from app.config import settings
+from app.handlers import (
+    execute_handler,
+    execute_handler_async,
+    get_handler,
+    parse_handler_cache_ttls,
+    register_handler,
+)
+
+
+def counting_handler(monkeypatch, **options):  # noqa: ANN001, ANN003, ANN201
+    monkeypatch.setattr("app.handlers.HANDLERS", {})
+    calls: list[dict] = []
+    options.setdefault("cache_ttl", 60)
+
+    @register_handler("embed", **options)
+    def embed(execution_id, node_id, config, graph):  # noqa: ANN001
+        calls.append(config)
+        return {"vector": [len(config["text"])]}
+
+    return calls
+
+
+def test_results_are_shared_across_executions_per_version(monkeypatch, fake_redis):
+    calls = counting_handler(monkeypatch)
+    assert execute_handler("exec-1", "a", "embed", {"text": "hi"}, None) == {
+        "vector": [2]
+    }
+    assert execute_handler("exec-2", "b", "embed", {"text": "hi"}, None) == {
+        "vector": [2]
+    }
+    assert asyncio.run(
+        execute_handler_async("exec-3", "c", "embed", {"text": "hi"}, None)
+    )
+    execute_handler("exec-4", "d", "embed", {"text": "bye"}, None)
+    assert len(calls) == 2
+    assert fake_redis.ttl(memo.memo_key("embed", "1", {"text": "hi"})) == 60
+
+    counting_handler(monkeypatch, version="2")
+    execute_handler("exec-5", "e", "embed", {"text": "hi"}, None)
+    assert memo.memo_stats()["embed"] == {
+        "hits": 2,
+        "coalesced": 0,
+        "misses": 3,
+        "hit_rate": 0.4,
+    }
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch, fake_redis):
+    counting_handler(monkeypatch)
+    keys = [memo.memo_key("embed", "1", {"text": text}) for text in "abc"]
+    size = len(memo.encode({"vector": [1]}))
+    monkeypatch.setattr(settings, "memo_max_bytes", 2 * size)
+
+    execute_handler("exec", "a", "embed", {"text": "a"}, None)
+    execute_handler("exec", "b", "embed", {"text": "b"}, None)
+    execute_handler("exec", "a", "embed", {"text": "a"}, None)
+    execute_handler("exec", "c", "embed", {"text": "c"}, None)
+
+    assert fake_redis.get(keys[0]) is not None
+    assert fake_redis.get(keys[1]) is None
+    assert fake_redis.get(keys[2]) is not None
+    assert fake_redis.get(memo.MEMO_BYTES_KEY) == str(2 * size)
+
+
+def test_concurrent_miss_waits_for_the_lock_holder(monkeypatch, fake_redis):
+    calls = counting_handler(monkeypatch)
+    monkeypatch.setattr(memo, "_POLL_SECONDS", 0.001)
+    key = memo.memo_key("embed", "1", {"text": "hi"})
+    token = memo._acquire(key)
+    assert token
+
+    def finish() -> None:
+        memo.store(key, {"vector": [9]}, 60)
+        memo._release(key, token)
+
+    timer = threading.Timer(0.02, finish)
+    timer.start()
+    assert execute_handler("exec", "a", "embed", {"text": "hi"}, None) == {
+        "vector": [9]
+    }
+    timer.join()
+    assert calls == []
+    assert memo.memo_stats()["embed"]["coalesced"] == 1
+
+
+def test_entries_stay_inline_and_count_their_full_size(monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "blob_offload_threshold", 8)
+    key = memo.memo_key("embed", "1", {"text": "big"})
+    memo.store(key, {"vector": list(range(100))}, 60)
+    payload = memo.encode({"vector": list(range(100))})
+    assert state.get_payload_redis().get(key) == payload
+    assert fake_redis.get(memo.MEMO_BYTES_KEY) == str(len(payload))
+
+    # A result larger than the whole budget is not cached at all.
+    monkeypatch.setattr(settings, "memo_max_bytes", len(payload) - 1)
+    other = memo.memo_key("embed", "1", {"text": "other"})
+    memo.store(other, {"vector": list(range(100))}, 60)
+    assert fake_redis.get(other) is None
+
+
+def test_expired_lock_holder_cannot_release_the_next_one(fake_redis):
+    key = memo.memo_key("embed", "1", {"text": "hi"})
+    stale = memo._acquire(key)
+    fake_redis.delete(memo._lock_key(key))  # the lock expired
+    current = memo._acquire(key)
+    assert current and current != stale
+
+    memo._release(key, stale)
+    assert memo._acquire(key) is None
+    memo._release(key, current)
+    assert memo._acquire(key)
+
+
+def test_handlers_opt_in_to_memoization_through_config(monkeypatch, fake_redis):
+    assert get_handler("llm_generate").cache_ttl is None
+    calls = counting_handler(monkeypatch, cache_ttl=None)
+    execute_handler("exec-1", "a", "embed", {"text": "hi"}, None)
+    execute_handler("exec-2", "a", "embed", {"text": "hi"}, None)
+    assert len(calls) == 2
+
+    overrides = parse_handler_cache_ttls('{"embed": 30}')
+    monkeypatch.setattr(handlers, "_cache_ttl_overrides", overrides)
+    execute_handler("exec-3", "a", "embed", {"text": "hi"}, None)
+    execute_handler("exec-4", "a", "embed", {"text": "hi"}, None)
+    assert len(calls) == 3
+    assert fake_redis.ttl(memo.memo_key("embed", "1", {"text": "hi"})) == 30
+
+    assert parse_handler_cache_ttls("") == {}
+    for raw in ("{", "[]", '{"a": 0}', '{"a": "60"}', '{"a": true}'):
+        with pytest.raises(ValueError, match="HANDLER_CACHE_TTL"):
+            parse_handler_cache_ttls(raw)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app import state
+from app.config import settings
+from app.graph import validate_workflow
+from app.main import app
+from app.metrics import GRAPH_CACHE_LOOKUPS, HANDLER_DURATION, ROUND_TRIPS, recorder
+from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition
+from app.orchestrator import load_workflow_graph, start_workflow
+from app.tasks import execute_node
+
+
+def start(monkeypatch, execution_id: str, nodes: list[NodeDefinition]) -> list:
+    monkeypatch.setattr("random.uniform", lambda a, b: 0)
+    sent: list[list] = []
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app.send_task",
+        lambda name, args, **_: sent.append(args),
+    )
+    wf = WorkflowDefinition(name="metrics", dag=DAGDefinition(nodes=nodes))
+    state.set_workflow_definition(execution_id, wf)
+    start_workflow(execution_id, wf, validate_workflow(wf), {"url": "http://x"})
+    return sent
+
+
+def test_worker_records_node_timings_and_histograms(monkeypatch):
+    monkeypatch.setattr(settings, "fuse_chains", False)
+    sent = start(
+        monkeypatch,
+        "timed",
+        [
+            NodeDefinition(id="fetch", handler="call_external_service"),
+            NodeDefinition(id="output", handler="output", dependencies=["fetch"]),
+        ],
+    )
+    (enqueued,) = state.get_node_timings("timed")["fetch"]
+
+    execute_node(*sent.pop())
+    timings = state.get_node_timings("timed")
+    assert timings["fetch"][0] == enqueued
+    assert enqueued <= timings["fetch"][1] <= timings["fetch"][2]
+    # The inline output node ran in the worker without waiting in a queue.
+    assert timings["output"][0] == timings["output"][1]
+
+    body = TestClient(app).get("/metrics").text
+    label = 'handler="call_external_service"'
+    assert f"workflow_node_queue_wait_seconds_count{{{label}}} 1" in body
+    assert f"workflow_node_orchestration_seconds_count{{{label}}} 1" in body
+    assert 'workflow_node_handler_seconds_count{handler="output"} 1' in body
+
+
+def test_fused_chain_members_get_their_own_timings(monkeypatch):
+    sent = start(
+        monkeypatch,
+        "chained",
+        [
+            NodeDefinition(id="fetch", handler="call_external_service"),
+            NodeDefinition(
+                id="generate",
+                handler="llm_generate",
+                dependencies=["fetch"],
+                config={"prompt": "{{ fetch.url }}"},
+            ),
+        ],
+    )
+    execute_node(*sent.pop())
+    timings = state.get_node_timings("chained")
+    assert timings["generate"][0] == timings["generate"][1] >= timings["fetch"][2]
+    recorder.flush()
+    counts = state.get_redis().hgetall("wf:metrics")
+    assert counts[f"{HANDLER_DURATION}|llm_generate|sum"]
+    # Only the task's head is charged with its orchestration.
+    assert not any(field.startswith(f"{ROUND_TRIPS}|llm_") for field in counts)
+
+
+def test_histograms_render_cumulative_buckets(monkeypatch):
+    monkeypatch.setattr(settings, "node_metrics", True)
+    for trips in (1, 3, 3, 99):
+        recorder.observe(ROUND_TRIPS, "fetch", trips)
+
+    body = TestClient(app).get("/metrics").text
+    assert 'workflow_node_redis_round_trips_bucket{handler="fetch",le="1"} 1' in body
+    assert 'workflow_node_redis_round_trips_bucket{handler="fetch",le="3"} 3' in body
+    assert 'workflow_node_redis_round_trips_bucket{handler="fetch",le="50"} 3' in body
+    assert 'workflow_node_redis_round_trips_bucket{handler="fetch",le="+Inf"} 4' in body
+    assert 'workflow_node_redis_round_trips_sum{handler="fetch"} 106.0' in body
+
+    monkeypatch.setattr(settings, "node_metrics", False)
+    recorder.observe(ROUND_TRIPS, "fetch", 1)
+    assert recorder._pending == {}
+
+
+def test_graph_cache_lookups_are_published(monkeypatch):
+    wf = WorkflowDefinition(
+        name="cached",
+        dag=DAGDefinition(nodes=[NodeDefinition(id="a", handler="input")]),
+    )
+    state.set_workflow_definition("cached", wf)
+    for _ in range(3):
+        load_workflow_graph("cached")
+
+    body = TestClient(app).get("/metrics").text
+    assert 'workflow_graph_cache_lookups_total{outcome="hit"} 2' in body
+    assert 'workflow_graph_cache_lookups_total{outcome="miss"} 1' in body
+    # Later flushes only add lookups made since the previous one.
+    load_workflow_graph("cached")
+    recorder.flush()
+    lookups = state.get_redis().hget("wf:metrics", f"{GRAPH_CACHE_LOOKUPS}|hit")
+    assert lookups == "3"
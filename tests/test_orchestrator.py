@@ -3,14 +3,26 @@ from __future__ import annotations
 import pytest
 
 from app import state
+from app.config import settings
 from app.graph import validate_workflow
-from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
 from app.orchestrator import (
     dispatch_node_once,
     start_workflow,
     on_node_success,
 )
-from app.utils import resolve_templates
+from app.utils import compile_templates, resolve_templates
+
+
+@pytest.fixture(autouse=True)
+def publish_every_node(monkeypatch):
+    # These tests follow nodes through the broker; inline runs are tested apart.
+    monkeypatch.setattr(settings, "inline_max_depth", 0)
 
 
 def sample_workflow() -> WorkflowDefinition:
@@ -31,7 +43,7 @@ def test_fan_in_dispatch_order(monkeypatch):
 
     dispatched: list[str] = []
 
-    def fake_send_task(name, args, kwargs=None):  # noqa: ANN001
+    def fake_send_task(name, args, kwargs=None, **options):  # noqa: ANN001, ANN003
         node = args[1]
         dispatched.append(node)
 
@@ -63,7 +75,7 @@ def test_dispatch_node_once_is_idempotent(monkeypatch):
 
     calls: list[str] = []
 
-    def fake_send_task(name, args, kwargs=None):  # noqa: ANN001
+    def fake_send_task(name, args, kwargs=None, **options):  # noqa: ANN001, ANN003
         calls.append(args[1])
 
     monkeypatch.setattr(
@@ -85,3 +97,154 @@ def test_template_resolution_success_and_failure():
 
     with pytest.raises(ValueError):
         resolve_templates({"missing": "{{ no.key }}"}, context)
+
+
+def test_template_plan_copies_static_subtrees_and_reports_references():
+    static = {"headers": {"accept": "json"}, "tags": ["a", "b"]}
+    config = {**static, "user": "{{ get_user.data.id }}", "q": ["{{ params.q }}!"]}
+    plan = compile_templates(config)
+    assert plan.roots == {"get_user", "params"}
+    assert plan.fields("get_user") == {("data", "id")}
+
+    resolved = plan.resolve({"get_user": {"data": {"id": 7}}, "params": {"q": "x"}})
+    assert resolved == {**static, "user": 7, "q": ["x!"]}
+
+    # Handlers may mutate their config without changing the plan.
+    resolved["headers"]["accept"] = "xml"
+    copy = compile_templates(static).resolve({})
+    copy["tags"].append("c")
+    assert plan.resolve({"get_user": {"data": {"id": 7}}, "params": {"q": "x"}}) == {
+        **static,
+        "user": 7,
+        "q": ["x!"],
+    }
+    assert (
+        compile_templates(static).resolve({})
+        == static
+        == {
+            "headers": {"accept": "json"},
+            "tags": ["a", "b"],
+        }
+    )
+
+
+def test_redelivered_completion_does_not_double_count(monkeypatch):
+    workflow = sample_workflow()
+    graph = validate_workflow(workflow)
+    execution_id = "exec-3"
+    state.set_workflow_definition(execution_id, workflow)
+
+    dispatched: list[str] = []
+
+    def fake_send_task(name, args, kwargs=None, **options):  # noqa: ANN001, ANN003
+        dispatched.append(args[1])
+
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app",
+        type("obj", (), {"send_task": staticmethod(fake_send_task)}),
+    )
+
+    start_workflow(execution_id, workflow, graph, params={})
+    on_node_success(execution_id, "input", {}, graph)
+    on_node_success(execution_id, "b", {"ok": True}, graph)
+    on_node_success(execution_id, "b", {"ok": True}, graph)
+    assert "d" not in dispatched
+    assert state.get_redis().get(state.remaining_parents_key(execution_id, "d")) == "1"
+
+    on_node_success(execution_id, "c", {"ok": True}, graph)
+    assert dispatched.count("d") == 1
+    assert state.get_redis().get(state.dispatch_lock_key(execution_id, "d")) is None
+
+
+def test_workflow_completes_when_counter_reaches_node_count(monkeypatch):
+    workflow = sample_workflow()
+    graph = validate_workflow(workflow)
+    execution_id = "exec-4"
+    state.set_workflow_definition(execution_id, workflow)
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app",
+        type("obj", (), {"send_task": staticmethod(lambda *_, **__: None)}),
+    )
+
+    start_workflow(execution_id, workflow, graph, params={})
+    for node_id in ["input", "b", "c"]:
+        on_node_success(execution_id, node_id, {}, graph)
+    assert state.get_workflow_status(execution_id) == WorkflowStatus.RUNNING
+
+    on_node_success(execution_id, "d", {}, graph)
+    assert state.get_workflow_status(execution_id) == WorkflowStatus.COMPLETED
+
+
+def test_executions_started_without_counters_still_fan_in(monkeypatch, fake_redis):
+    workflow = sample_workflow()
+    graph = validate_workflow(workflow)
+    execution_id = "exec-legacy"
+    state.set_workflow_definition(execution_id, workflow)
+    dispatched: list[str] = []
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app",
+        type(
+            "obj",
+            (),
+            {
+                "send_task": staticmethod(
+                    lambda name, args, **_: dispatched.append(args[1])
+                )
+            },
+        ),
+    )
+    start_workflow(execution_id, workflow, graph, params={})
+    # As left by an engine version that predates the counters.
+    fake_redis.delete(
+        state.completed_count_key(execution_id),
+        *(state.remaining_parents_key(execution_id, node) for node in graph.nodes),
+    )
+
+    on_node_success(execution_id, "input", {}, graph)
+    on_node_success(execution_id, "b", {}, graph)
+    assert dispatched == ["input", "b", "c"]
+    on_node_success(execution_id, "c", {}, graph)
+    on_node_success(execution_id, "c", {}, graph)
+    assert dispatched.count("d") == 1
+    on_node_success(execution_id, "d", {}, graph)
+    assert state.get_workflow_status(execution_id) == WorkflowStatus.COMPLETED
+    assert fake_redis.get(state.completed_count_key(execution_id)) is None
+
+
+@pytest.mark.parametrize("max_depth, published", [(16, ["b"]), (1, ["b", "c"])])
+def test_inline_nodes_run_without_broker_hop(monkeypatch, max_depth, published):
+    nodes = [
+        NodeDefinition(id="input", handler="input"),
+        NodeDefinition(id="b", handler="call_external_service", dependencies=["input"]),
+        NodeDefinition(id="c", handler="output", dependencies=["input"]),
+        NodeDefinition(id="d", handler="output", dependencies=["c"]),
+    ]
+    workflow = WorkflowDefinition(name="inline", dag=DAGDefinition(nodes=nodes))
+    graph = validate_workflow(workflow)
+    state.set_workflow_definition("exec-5", workflow)
+    monkeypatch.setattr(settings, "inline_max_depth", max_depth)
+    monkeypatch.setattr(settings, "fuse_chains", False)
+    dispatched: list[str] = []
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app",
+        type(
+            "obj",
+            (),
+            {
+                "send_task": staticmethod(
+                    lambda name, args, **_: dispatched.append(args[1])
+                )
+            },
+        ),
+    )
+
+    start_workflow("exec-5", workflow, graph, params={"x": 1})
+    assert dispatched == published
+    assert state.get_node_output("exec-5", "input") == {"x": 1}
+    if max_depth > 1:
+        assert state.get_node_output("exec-5", "d") == {
+            "final": {"c": {"final": {"input": {"x": 1}}}}
+        }
+    on_node_success("exec-5", "b", {}, graph)
+    if max_depth > 1:
+        assert state.get_workflow_status("exec-5") == WorkflowStatus.COMPLETED
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pytest
+
+from app import state
+from app.config import settings
+from app.serialization import Serializer, decode, encode, get_serializer
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_round_trip_with_format_marker(monkeypatch, name):
+    if name != "json":
+        pytest.importorskip(name)
+    monkeypatch.setattr(settings, "serializer", name)
+    payload = {"text": "héllo", "items": [1, 2.5, None, True], "nested": {"k": "v"}}
+
+    raw = encode(payload)
+    assert raw[:1] == get_serializer().marker
+    assert decode(raw) == payload
+
+
+def test_decode_reads_unmarked_legacy_json():
+    assert decode('{"legacy": [1, 2]}') == {"legacy": [1, 2]}
+
+
+def test_state_reads_outputs_written_with_another_serializer(monkeypatch):
+    pytest.importorskip("msgpack")
+    state.store_node_output("exec", "a", {"from": "json"})
+    monkeypatch.setattr(settings, "serializer", "msgpack")
+    state.store_node_output("exec", "b", {"from": "msgpack"})
+
+    assert state.get_node_output("exec", "a") == {"from": "json"}
+    assert state.get_node_output("exec", "b") == {"from": "msgpack"}
+
+
+def test_unknown_serializer_rejected():
+    with pytest.raises(ValueError):
+        get_serializer("pickle")
+
+
+def test_serializers_must_implement_dumps_and_loads():
+    class Partial(Serializer):
+        def dumps(self, value):  # noqa: ANN001, ANN201
+            return b""
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import pytest
+import redis.asyncio as aioredis
+
+from app import async_state, state
+from app.config import settings
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    NodeStatus,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
+
+
+def sample_workflow() -> WorkflowDefinition:
+    nodes = [
+        NodeDefinition(id="a", handler="input", dependencies=[]),
+        NodeDefinition(id="b", handler="output", dependencies=["a"]),
+    ]
+    return WorkflowDefinition(name="state_test", dag=DAGDefinition(nodes=nodes))
+
+
+@pytest.mark.parametrize("layout", ["keys", "hash"])
+def test_complete_node_round_trip(monkeypatch, layout):
+    monkeypatch.setattr(settings, "state_layout", layout)
+    wf = sample_workflow()
+    state.init_workflow_state("exec", wf, {"x": 1})
+
+    assert state.complete_node("exec", "a", {"v": 1}, ["b"], 2) == ["b"]
+    assert state.complete_node("exec", "a", {"v": 1}, ["b"], 2) == []
+    assert state.get_node_output("exec", "a") == {"v": 1}
+    assert state.list_node_statuses("exec", wf) == {
+        "a": NodeStatus.COMPLETED,
+        "b": NodeStatus.PENDING,
+    }
+
+    state.complete_node("exec", "b", {"v": 2}, [], 2)
+    assert state.get_workflow_status("exec") == WorkflowStatus.COMPLETED
+    assert state.get_all_outputs("exec", wf) == {"a": {"v": 1}, "b": {"v": 2}}
+
+
+def test_hash_layout_keeps_node_state_in_per_execution_hashes(monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "state_layout", "hash")
+    wf = sample_workflow()
+    state.set_workflow_definition("exec", wf)
+    state.init_workflow_state("exec", wf, {})
+    state.store_node_output("exec", "a", {"v": 1})
+
+    assert [key for key in fake_redis.keys("*:node:*") if "lock" not in key] == []
+    assert fake_redis.hgetall(state.node_statuses_key("exec")) == {
+        "a": "PENDING",
+        "b": "PENDING",
+    }
+
+    state.expire_execution_state("exec", wf, 60)
+    assert fake_redis.ttl(state.node_outputs_key("exec")) == 60
+    state.delete_execution_state("exec", wf)
+    assert fake_redis.keys("wf:exec:*") == []
+
+
+def test_hash_layout_reads_and_migrates_legacy_keys(monkeypatch, fake_redis):
+    wf = sample_workflow()
+    state.init_workflow_state("exec", wf, {})
+    state.store_node_output("exec", "a", {"v": 1})
+    state.set_node_status("exec", "a", NodeStatus.COMPLETED)
+
+    monkeypatch.setattr(settings, "state_layout", "hash")
+    assert state.get_node_output("exec", "a") == {"v": 1}
+    assert state.get_node_status("exec", "a") == NodeStatus.COMPLETED
+
+    state.migrate_execution_to_hash("exec", wf)
+    assert not fake_redis.exists(state.node_output_key("exec", "a"))
+    assert state.list_node_statuses("exec", wf)["a"] == NodeStatus.COMPLETED
+    assert state.complete_node("exec", "b", {}, [], 2) == []
+    assert state.get_workflow_status("exec") == WorkflowStatus.RUNNING
+
+
+@pytest.mark.parametrize("serializer", ["json", "msgpack"])
+def test_migration_keeps_serialized_outputs(monkeypatch, fake_redis, serializer):
+    monkeypatch.setattr(settings, "serializer", serializer)
+    wf = sample_workflow()
+    output = {"text": "naïve café", "values": [1.5, -2, None]}
+    state.init_workflow_state("exec", wf, {})
+    state.store_node_output("exec", "a", output)
+    state.set_node_status("exec", "a", NodeStatus.COMPLETED)
+
+    monkeypatch.setattr(settings, "state_layout", "hash")
+    state.migrate_execution_to_hash("exec", wf)
+    assert not fake_redis.exists(state.node_output_key("exec", "a"))
+    assert state.get_node_output("exec", "a") == output
+    assert state.get_node_status("exec", "a") == NodeStatus.COMPLETED
+
+
+def test_hash_layout_reads_per_node_keys_only_for_legacy_executions(
+    monkeypatch, fake_redis
+):
+    wf = sample_workflow()
+    state.init_workflow_state("legacy", wf, {})
+    state.store_node_output("legacy", "a", {"v": 1})
+    monkeypatch.setattr(settings, "state_layout", "hash")
+    state.init_workflow_state("fresh", wf, {})
+    legacy_reads: list[tuple[str, list[str]]] = []
+    queue_legacy_reads = state._queue_legacy_node_reads
+    monkeypatch.setattr(
+        state,
+        "_queue_legacy_node_reads",
+        lambda pipe, kind, execution_id, node_ids: (
+            legacy_reads.append((execution_id, node_ids)),
+            queue_legacy_reads(pipe, kind, execution_id, node_ids),
+        ),
+    )
+
+    # Outputs not written yet are not looked up in per-node keys.
+    assert state.get_node_output("fresh", "a") is None
+    assert state.get_all_outputs("fresh", wf) == {}
+    assert legacy_reads == []
+
+    # A legacy execution that got hash writes after the switch reads both.
+    state.set_node_status("legacy", "b", NodeStatus.RUNNING)
+    statuses = state.list_node_statuses("legacy", wf)
+    assert statuses == {"a": NodeStatus.PENDING, "b": NodeStatus.RUNNING}
+    assert state.get_node_output("legacy", "a") == {"v": 1}
+    assert legacy_reads == [("legacy", ["a"]), ("legacy", ["a"])]
+
+
+@pytest.mark.parametrize("layout", ["keys", "hash"])
+def test_dispatch_inputs_read_only_referenced_fields(monkeypatch, layout):
+    monkeypatch.setattr(settings, "state_layout", layout)
+    monkeypatch.setattr(settings, "output_field_threshold", 32)
+    state.init_workflow_state("exec", sample_workflow(), {"x": 1})
+    big = {"data": {"id": 7}, "blob": "x" * 100}
+    state.complete_node("exec", "a", big, ["b"], 2)
+
+    params, outputs = state.get_dispatch_inputs("exec", ["a"], {"a": ["data"]})
+    assert params == {"x": 1}
+    assert outputs["a"] == {"data": {"id": 7}}
+    _, whole = state.get_dispatch_inputs("exec", ["a"])
+    assert whole["a"] == big
+    # Split outputs are stored once: the output value only names the fields.
+    (raw,) = state._read_node_values("output", "exec", ["a"], state.get_payload_redis())
+    assert state.is_split_output(raw) and b"x" * 100 not in raw
+    assert state.get_node_output("exec", "a") == big
+    assert state.get_all_outputs("exec", sample_workflow())["a"] == big
+    # Outputs below the threshold are not split and are returned whole.
+    state.complete_node("exec", "b", {"data": 1, "other": 2}, [], 2)
+    _, small = state.get_dispatch_inputs("exec", ["b"], {"b": ["data"]})
+    assert small["b"] == {"data": 1, "other": 2}
+    assert state.get_node_outputs("exec", ["a", "b"])["a"] == big
+
+
+def test_clients_wait_for_a_free_pooled_connection(monkeypatch):
+    monkeypatch.setattr(settings, "redis_pool_size", 7)
+    monkeypatch.setattr(settings, "redis_pool_timeout", 2.5)
+    monkeypatch.setattr(state, "_redis_client", None)
+    monkeypatch.setattr(async_state, "_redis_client", None)
+    for pool, blocking in [
+        (state.get_redis().connection_pool, state.redis.BlockingConnectionPool),
+        (async_state.get_redis().connection_pool, aioredis.BlockingConnectionPool),
+    ]:
+        assert isinstance(pool, blocking)
+        assert (pool.max_connections, pool.timeout) == (7, 2.5)
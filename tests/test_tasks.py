@@ -2,7 +2,15 @@ from __future__ import annotations
 
 
 from app import state
-from app.models import DAGDefinition, NodeDefinition, WorkflowDefinition, NodeStatus
+from app.async_worker import node_runner
+from app.config import settings
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    NodeStatus,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
 from app.tasks import execute_node
 
 
@@ -46,3 +54,85 @@ def test_execute_node_failure_marks_failed(monkeypatch):
     result = execute_node(execution_id, "input", "input", {})
     assert result == {}
     assert state.get_node_status(execution_id, "input") == NodeStatus.FAILED
+
+
+def test_asyncio_mode_runs_async_handler_on_loop(monkeypatch):
+    nodes = [
+        NodeDefinition(id="fetch", handler="call_external_service"),
+        NodeDefinition(id="output", handler="output", dependencies=["fetch"]),
+    ]
+    wf = WorkflowDefinition(name="async_test", dag=DAGDefinition(nodes=nodes))
+    execution_id = "async-exec"
+    state.set_workflow_definition(execution_id, wf)
+    state.init_workflow_state(execution_id, wf, {})
+    monkeypatch.setattr(settings, "worker_mode", "asyncio")
+    monkeypatch.setattr(settings, "inline_max_depth", 0)
+    monkeypatch.setattr(settings, "fuse_chains", False)
+    monkeypatch.setattr("random.uniform", lambda a, b: 0)
+    sent = []
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app.send_task",
+        lambda name, args, **_: sent.append(args[1]),
+    )
+
+    assert execute_node(execution_id, "fetch", "call_external_service", {}) == {}
+    assert node_runner.drain(timeout=5)
+    assert state.get_node_status(execution_id, "fetch") == NodeStatus.COMPLETED
+    assert state.get_node_output(execution_id, "fetch")["status"] == "ok"
+    assert sent == ["output"]
+
+
+def chain_workflow() -> WorkflowDefinition:
+    nodes = [
+        NodeDefinition(id="input", handler="input"),
+        NodeDefinition(
+            id="fetch",
+            handler="call_external_service",
+            dependencies=["input"],
+            config={"url": "{{ params.url }}"},
+        ),
+        NodeDefinition(
+            id="generate",
+            handler="llm_generate",
+            dependencies=["fetch"],
+            config={"prompt": "{{ fetch.url }}"},
+        ),
+        NodeDefinition(id="a", handler="output", dependencies=["generate"]),
+        NodeDefinition(id="b", handler="output", dependencies=["generate"]),
+    ]
+    return WorkflowDefinition(name="chain_test", dag=DAGDefinition(nodes=nodes))
+
+
+def test_fused_chain_runs_in_one_task(monkeypatch):
+    wf = chain_workflow()
+    execution_id = "chain-exec"
+    state.set_workflow_definition(execution_id, wf)
+    state.init_workflow_state(execution_id, wf, {"url": "http://x"})
+    monkeypatch.setattr("random.uniform", lambda a, b: 0)
+    sent = []
+    monkeypatch.setattr(
+        "app.orchestrator.celery_app.send_task",
+        lambda name, args, **options: sent.append((args[1], options["queue"])),
+    )
+
+    execute_node(execution_id, "input", "input", {})
+    assert state.get_node_output(execution_id, "generate") == {
+        "text": "mock_response: http://x"
+    }
+    assert state.get_node_status(execution_id, "fetch") == NodeStatus.COMPLETED
+    # The inline output nodes ran right after the chain; nothing was published.
+    assert sent == []
+    assert state.get_workflow_status(execution_id) == WorkflowStatus.COMPLETED
+
+
+def test_fused_chain_attributes_failure_to_failing_node(monkeypatch):
+    wf = chain_workflow()
+    execution_id = "chain-fail"
+    state.set_workflow_definition(execution_id, wf)
+    state.init_workflow_state(execution_id, wf, {})
+
+    execute_node(execution_id, "input", "input", {})
+    assert state.get_node_status(execution_id, "input") == NodeStatus.COMPLETED
+    assert state.get_node_status(execution_id, "fetch") == NodeStatus.FAILED
+    assert state.get_node_status(execution_id, "generate") == NodeStatus.PENDING
+    assert "fetch" in state.get_error(execution_id)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+
+from fastapi.testclient import TestClient
+
+from app import state
+from app.archive import retire_finished_executions
+from app.config import settings
+from app.graph import validate_workflow
+from app.main import app
+from app.models import (
+    DAGDefinition,
+    NodeDefinition,
+    NodeStatus,
+    WorkflowDefinition,
+    WorkflowStatus,
+)
+from app.trace import build_trace
+
+
+def diamond() -> WorkflowDefinition:
+    nodes = [
+        NodeDefinition(id="a", handler="input"),
+        NodeDefinition(id="slow", handler="llm_generate", dependencies=["a"]),
+        NodeDefinition(id="fast", handler="call_external_service", dependencies=["a"]),
+        NodeDefinition(id="d", handler="output", dependencies=["slow", "fast"]),
+    ]
+    return WorkflowDefinition(name="diamond", dag=DAGDefinition(nodes=nodes))
+
+
+# Enqueued, started and finished seconds; "fast" waited 1 s in the queue.
+TIMINGS = {
+    "a": [100.0, 100.0, 101.0],
+    "slow": [101.0, 101.0, 105.0],
+    "fast": [101.0, 102.0, 103.0],
+    "d": [105.0, 105.0, 105.5],
+}
+
+
+def test_critical_path_and_slack_follow_the_slowest_branch():
+    graph = validate_workflow(diamond())
+    statuses = dict.fromkeys(graph.nodes, NodeStatus.COMPLETED)
+    trace = build_trace("x", graph, WorkflowStatus.COMPLETED, statuses, TIMINGS)
+
+    assert trace.critical_path == ["a", "slow", "d"]
+    assert trace.duration_ms == 5500.0
+    fast = trace.nodes["fast"]
+    assert (fast.wait_ms, fast.run_ms, fast.slack_ms) == (1000.0, 1000.0, 2000.0)
+    assert not fast.critical and trace.nodes["slow"].slack_ms == 0.0
+
+    runs = {e["name"]: e for e in trace.trace_events if e["ph"] == "X"}
+    assert runs["fast (queued)"]["ts"] == 1_000_000.0
+    assert runs["fast"]["dur"] == 1_000_000.0
+    # Overlapping branches land on separate rows; "d" reuses a freed one.
+    assert runs["slow"]["tid"] != runs["fast"]["tid"]
+    assert runs["d"]["tid"] in (runs["slow"]["tid"], runs["fast"]["tid"])
+
+
+def test_trace_endpoint_serves_live_and_archived_executions(monkeypatch, tmp_path):
+    wf = diamond()
+    state.set_workflow_definition("traced", wf)
+    state.init_workflow_state("traced", wf, {})
+    graph = validate_workflow(wf)
+    for node_id in graph.topological_order:
+        state.complete_node(
+            "traced",
+            node_id,
+            {},
+            graph.adjacency[node_id],
+            len(graph.nodes),
+            timing=state.encode_timing(*TIMINGS[node_id]),
+        )
+
+    with TestClient(app) as client:
+        live = client.get("/workflows/traced/trace").json()
+        assert live["critical_path"] == ["a", "slow", "d"]
+        assert live["displayTimeUnit"] == "ms"
+        names = {e["name"] for e in live["traceEvents"] if e["ph"] == "X"}
+        assert names >= set(TIMINGS)
+
+        monkeypatch.setattr(settings, "archive_path", str(tmp_path / "archive.db"))
+        retire_finished_executions(time.time() + settings.archive_delay)
+        assert client.get("/workflows/traced/trace").json() == live
+        assert client.get("/workflows/missing/trace").status_code == 404